@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+Adaptive IOR sweep: pick the next batch of configurations worth running.
+
+A Gaussian-process model of log10 throughput (the tag) is fitted to the
+runs completed so far, joined from parsed Darshan tables and their config
+CSVs, and every configuration of the space not yet run is scored:
+  ei    expected improvement over the best throughput seen (default)
+  ucb   upper confidence bound, mean + beta * std
+  std   predictive uncertainty alone (pure exploration, for mapping the
+        surface rather than finding its peak)
+The batch is chosen greedily. After each pick, the posterior covariance
+of the best-scored candidates is conditioned on that pick, so one batch
+does not pile up around a single uncertain region. Repeats of a
+configuration are averaged into one weighted training point. Parameters
+are encoded as log2 sizes and counts scaled to [0, 1], plus a one-hot
+api. The kernel length scale and noise are chosen by marginal
+likelihood. With too few runs to fit, the batch is a Latin hypercube
+sample instead.
+The batch is written in the configuration CSV layout with the space's
+global config ids, so it can be submitted and, once parsed, joined like
+any other config CSV. Pass earlier, still pending batches with --exclude.
+Usage:
+  python active_sweep.py ../data/darshan_csv/darshan_parsed_output_6-29-V5.csv \\
+      --configs ../configs/ior_configurations.csv --batch 32 -o ../configs/ior_batch_01.csv
+  python generate_and_submit_slurms.py --csv configs/ior_batch_01.csv
+"""
+import argparse
+import math
+import sys
+
+import numpy as np
+import pandas as pd
+
+from config_space import ConfigSpace
+from doe_sampler import sample
+from ior_dataset import SIZE_PARAMS, find_param_columns, normalize_column, normalize_value
+from repeat_variance import check_job_level, load_runs
+
+ACQUISITIONS = ["ei", "ucb", "std"]
+
+# parameters whose effect scales with their order of magnitude
+LOG_PARAMS = SIZE_PARAMS + ["segmentCount", "numTasks", "LUSTRE_STRIPE_WIDTH"]
+
+# distinct configurations needed before the model is trusted over a space-filling design
+MIN_TRAIN = 8
+
+
+class FeatureEncoder:
+    """Numeric features in [0, 1] for the parameters of a ConfigSpace."""
+
+    def __init__(self, space):
+        self.space = space
+        self._specs = []
+        self._level_features = []
+        for name, levels in zip(space.names, space.levels):
+            canon = [normalize_value(name, v) for v in levels]
+            if all(isinstance(v, int) for v in canon):
+                vals = self._scalar(name, np.array(canon, dtype=np.float64))
+                spec = ("numeric", vals.min(), vals.max())
+            else:
+                spec = ("category", canon)
+            self._specs.append(spec)
+            self._level_features.append(self._encode(len(self._specs) - 1, canon))
+
+    @staticmethod
+    def _scalar(name, values):
+        return np.log2(np.maximum(values, 1)) if name in LOG_PARAMS else values
+
+    def _encode(self, j, canon):
+        spec = self._specs[j]
+        if spec[0] == "category":
+            # one-hot scaled so two different values are at distance 1
+            onehot = np.asarray(canon, dtype=object)[:, None] == np.asarray(spec[1], dtype=object)
+            return onehot.astype(np.float64) / math.sqrt(2)
+        _, lo, hi = spec
+        vals = self._scalar(self.space.names[j], np.asarray(canon, dtype=np.float64))
+        return ((vals - lo) / (hi - lo if hi > lo else 1.0))[:, None]
+
+    def from_digits(self, digits):
+        """Features of configurations given as level positions (rows x parameters)."""
+        return np.hstack([f[digits[:, j]] for j, f in enumerate(self._level_features)])
+
+    def from_table(self, table, columns):
+        """Features of table rows; columns maps each parameter to its column."""
+        blocks = []
+        for j, name in enumerate(self.space.names):
+            if name not in columns:
+                raise KeyError(f"runs have no {name!r} column; pass --configs to join them")
+            blocks.append(self._encode(j, normalize_column(name, table[columns[name]])))
+        return np.hstack(blocks)
+
+
+def space_indices(space, table, columns):
+    """ConfigSpace index of every row of table, or -1 where a value is not a level."""
+    index = np.zeros(len(table), dtype=np.int64)
+    valid = np.ones(len(table), dtype=bool)
+    for name, levels, stride in zip(space.names, space.levels, space.stride):
+        pos = {normalize_value(name, v): k for k, v in enumerate(levels)}
+        digit = pd.Series(normalize_column(name, table[columns[name]])).map(pos)
+        valid &= digit.notna().to_numpy()
+        index += np.nan_to_num(digit.to_numpy(dtype=np.float64)).astype(np.int64) * stride
+    return np.where(valid, index, -1)
+
+
+class GaussianProcess:
+    """Squared-exponential GP regression with per-point noise weights, in NumPy."""
+
+    LENGTH_SCALES = (0.125, 0.25, 0.5, 1.0, 2.0)
+    NOISE_LEVELS = (0.01, 0.05, 0.2, 0.5)
+
+    def _kernel(self, a, b):
+        d2 = (a * a).sum(1)[:, None] + (b * b).sum(1)[None, :] - 2.0 * a @ b.T
+        return np.exp(-np.maximum(d2, 0.0) / (2.0 * self.length_scale ** 2))
+
+    def fit(self, X, y, weight=None):
+        """Fit to features X and targets y; weight[i] repeats shrink point i's noise."""
+        self.X = np.asarray(X, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        weight = np.ones(len(y)) if weight is None else np.asarray(weight, dtype=np.float64)
+        self.y_mean, self.y_std = y.mean(), y.std() or 1.0
+        z = (y - self.y_mean) / self.y_std
+        best = None
+        for ls in self.LENGTH_SCALES:
+            self.length_scale = ls
+            K = self._kernel(self.X, self.X)
+            for noise in self.NOISE_LEVELS:
+                try:
+                    L = np.linalg.cholesky(K + np.diag(noise / weight))
+                except np.linalg.LinAlgError:
+                    continue
+                v = np.linalg.solve(L, z)
+                # log marginal likelihood, up to a constant
+                lml = -0.5 * v @ v - np.log(np.diag(L)).sum()
+                if best is None or lml > best[0]:
+                    best = (lml, ls, noise, L)
+        if best is None:
+            raise ValueError("could not fit the throughput model")
+        _, self.length_scale, self.noise, L = best
+        self._Linv = np.linalg.solve(L, np.eye(len(L)))
+        self._alpha = self._Linv.T @ (self._Linv @ z)
+        self.best = z.max()
+        return self
+
+    def predict(self, X, chunk=4096):
+        """Posterior mean and standard deviation in standardized units."""
+        mean = np.empty(len(X))
+        var = np.empty(len(X))
+        for start in range(0, len(X), chunk):
+            Ks = self._kernel(X[start:start + chunk], self.X)
+            mean[start:start + chunk] = Ks @ self._alpha
+            W = self._Linv @ Ks.T
+            var[start:start + chunk] = 1.0 - (W * W).sum(0)
+        return mean, np.sqrt(np.maximum(var, 0.0))
+
+    def posterior_cov(self, X):
+        W = self._Linv @ self._kernel(self.X, X)
+        return self._kernel(X, X) - W.T @ W
+
+    def to_log(self, mean, std):
+        """Standardized predictions back in target units."""
+        return self.y_mean + self.y_std * mean, self.y_std * std
+
+
+_erf = np.vectorize(math.erf)
+
+
+def acquisition(mean, std, kind="ei", best=0.0, beta=2.0):
+    if kind == "std":
+        return std
+    if kind == "ucb":
+        return mean + beta * std
+    if kind != "ei":
+        raise ValueError(f"unknown acquisition {kind!r}; expected one of {ACQUISITIONS}")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = np.where(std > 0, (mean - best) / std, 0.0)
+    cdf = 0.5 * (1.0 + _erf(z / math.sqrt(2)))
+    pdf = np.exp(-0.5 * z * z) / math.sqrt(2 * math.pi)
+    return np.where(std > 0, (mean - best) * cdf + std * pdf, np.maximum(mean - best, 0.0))
+
+
+def select_batch(gp, X, scores, size, kind="ei", beta=2.0, pool_factor=10, seed=0):
+    """Greedy batch over the pool of best-scored rows of X; returns (positions, scores).
+
+    Each pick conditions the pool's posterior covariance on an observation
+    there (its mean is left as is), which lowers the score of the
+    candidates it explains. Ties (e.g. the prior std far from any run) are
+    broken at random rather than by index.
+    """
+    mean, _ = scores
+    a = acquisition(*scores, kind, gp.best, beta)
+    order = np.random.default_rng(seed).permutation(len(a))
+    pool = order[np.argsort(-a[order], kind="stable")][:max(size * pool_factor, size)]
+    cov = gp.posterior_cov(X[pool])
+    chosen, values = [], []
+    for _ in range(min(size, len(pool))):
+        std = np.sqrt(np.maximum(np.diag(cov), 0.0))
+        a = acquisition(mean[pool], std, kind, gp.best, beta)
+        a[chosen] = -np.inf
+        j = int(np.argmax(a))
+        chosen.append(j)
+        values.append(a[j])
+        cov = cov - np.outer(cov[:, j], cov[j]) / (cov[j, j] + gp.noise)
+    return pool[chosen], np.array(values)
+
+
+def next_batch(runs, space, size, kind="ei", value="tag", log=True, beta=2.0,
+               exclude=(), pool_factor=10, seed=0):
+    """The next size configurations to run, as a config-layout DataFrame, plus a report dict.
+
+    exclude holds space indices already submitted but not yet in runs.
+    """
+    # training points are weighted by their number of runs, so rows must be whole jobs
+    check_job_level(runs, [k for k in ("source", "test_id") if k in runs.columns])
+    columns = find_param_columns(runs.columns, space.names)
+    y = runs[value].to_numpy(dtype=np.float64)
+    keep = np.isfinite(y) & ((y > 0) if log else True)
+    runs, y = runs[keep].reset_index(drop=True), y[keep]
+    if log:
+        y = np.log10(y)
+    encoder = FeatureEncoder(space)
+    X = encoder.from_table(runs, columns) if len(runs) else np.empty((0, 0))
+    done = np.union1d(space_indices(space, runs, columns) if len(runs) else [],
+                      np.asarray(exclude, dtype=np.int64)).astype(np.int64)
+    done = done[done >= 0]
+    candidates = np.setdiff1d(np.arange(len(space)), done)
+    report = {"runs": len(runs), "candidates": len(candidates)}
+
+    uniq, inverse, counts = (np.unique(X, axis=0, return_inverse=True, return_counts=True)
+                             if len(X) else (X, None, None))
+    if len(uniq) < MIN_TRAIN:
+        # not enough to model: spread the batch over what is left instead
+        design = sample(space, "lhs", min(size + len(done), len(space)), seed)
+        picked = design[np.isin(design, candidates)][:size]
+        report["model"] = None
+        return space.frame(picked), report
+
+    inverse = inverse.reshape(-1)
+    y_mean = np.bincount(inverse, weights=y) / counts
+    gp = GaussianProcess().fit(uniq, y_mean, counts)
+    digits = (candidates[:, None] // space.stride) % space.radix
+    Xc = encoder.from_digits(digits)
+    scores = gp.predict(Xc)
+    pos, values = select_batch(gp, Xc, scores, size, kind, beta, pool_factor, seed)
+
+    pred_mean, pred_std = gp.to_log(*scores)
+    batch = space.frame(candidates[pos])
+    report.update({
+        "model": gp, "configs": len(uniq), "batch_mean": pred_mean[pos],
+        "batch_std": pred_std[pos], "batch_score": values,
+        "mean_std": pred_std.mean(), "best_seen": y.max(),
+        "predictions": pd.DataFrame({"index": candidates, "pred_mean": pred_mean,
+                                     "pred_std": pred_std}),
+    })
+    return batch, report
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Choose the next batch of IOR configurations from the runs completed so far"
+    )
+    parser.add_argument("inputs", nargs="*",
+                        help="Completed runs: parsed counters (with --configs) or joined tables")
+    parser.add_argument("--configs", nargs="+", default=None,
+                        help="IOR configuration CSV(s) to join on test_id = testFile")
+    parser.add_argument("--value", default="tag", help="Throughput column to model (default: tag)")
+    parser.add_argument("--no-log", action="store_true", help="Model the value itself, not log10")
+    parser.add_argument("--batch", type=int, default=32, help="Configurations to emit (default: 32)")
+    parser.add_argument("--acquisition", choices=ACQUISITIONS, default="ei")
+    parser.add_argument("--beta", type=float, default=2.0, help="Exploration weight of ucb")
+    parser.add_argument("--exclude", nargs="+", default=[],
+                        help="Config CSVs already submitted whose runs are not parsed yet")
+    parser.add_argument("--pool-factor", type=int, default=10,
+                        help="Batch picks are made among the top batch * this candidates")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", required=True,
+                        help="Batch CSV for generate_and_submit_slurms.py --csv")
+    parser.add_argument("--predictions", default=None,
+                        help="Also write the predicted mean/std of every candidate here")
+    args = parser.parse_args()
+
+    space = ConfigSpace()
+    try:
+        runs = load_runs(args.inputs, args.configs) if args.inputs else pd.DataFrame()
+        exclude = []
+        for path in args.exclude:
+            pending = pd.read_csv(path, dtype=str)
+            exclude.append(space_indices(space, pending, find_param_columns(pending.columns)))
+        exclude = np.concatenate(exclude) if exclude else []
+        if len(runs) and args.value not in runs.columns:
+            raise KeyError(f"runs have no {args.value!r} column")
+        if not len(runs):
+            runs = pd.DataFrame(columns=space.names + [args.value])
+        batch, report = next_batch(runs, space, args.batch, args.acquisition, args.value,
+                                   not args.no_log, args.beta, exclude, args.pool_factor, args.seed)
+    except (KeyError, ValueError) as e:
+        print(f"[ERROR] {e}", file=sys.stderr)
+        sys.exit(1)
+
+    print(f"[INFO] {report['runs']} completed runs, {report['candidates']} candidate configurations")
+    if report["model"] is None:
+        print(f"[INFO] fewer than {MIN_TRAIN} distinct configurations run; "
+              f"batch is a Latin hypercube sample")
+    else:
+        gp = report["model"]
+        print(f"[INFO] model on {report['configs']} configurations: length scale "
+              f"{gp.length_scale}, noise {gp.noise}; mean predictive std "
+              f"{report['mean_std']:.3f}, best seen {report['best_seen']:.3f}")
+        shown = batch[["testFile"] + space.names].copy()
+        shown["pred_mean"] = report["batch_mean"]
+        shown["pred_std"] = report["batch_std"]
+        shown["score"] = report["batch_score"]
+        print(shown.head(10).to_string(index=False))
+        if args.predictions:
+            preds = report["predictions"]
+            out = space.frame(preds["index"].to_numpy())
+            out["pred_mean"] = preds["pred_mean"].to_numpy()
+            out["pred_std"] = preds["pred_std"].to_numpy()
+            out.to_csv(args.predictions, index=False)
+            print(f"[OK] wrote predictions for {len(out)} configurations to {args.predictions}")
+
+    batch.to_csv(args.output, index=False)
+    print(f"[OK] wrote {len(batch)} configurations to {args.output}; submit with "
+          f"generate_and_submit_slurms.py --csv {args.output}")
+
+
+if __name__ == "__main__":
+    main()
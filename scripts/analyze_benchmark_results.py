@@ -7,20 +7,23 @@ This script analyzes the results from multiple benchmark runs and generates comp
 
 import os
 import sys
+import argparse
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 import glob
-import re
-from pathlib import Path
 
-def analyze_benchmark_results(results_dir):
+from dataset_io import TABLE_EXTS, read_table, write_table
+from profiling import NULL_PROFILER, add_profile_args, profiler_from_args
+
+def analyze_benchmark_results(results_dir, output_format="csv", profiler=NULL_PROFILER):
     """Analyze benchmark results from a suite run."""
     
     print(f"Analyzing benchmark results in: {results_dir}")
     
-    # Find all CSV files with counter data
-    csv_files = glob.glob(os.path.join(results_dir, "*_counters_*.csv"))
+    # Find all counter files in any format dataset_io can read
+    csv_files = sorted(f for ext in TABLE_EXTS
+                       for f in glob.glob(os.path.join(results_dir, f"*_counters_*{ext}")))
     
     if not csv_files:
         print("No counter CSV files found in results directory")
@@ -33,7 +36,9 @@ def analyze_benchmark_results(results_dir):
     
     for csv_file in csv_files:
         try:
-            df = pd.read_csv(csv_file)
+            with profiler.stage("read") as st:
+                df = read_table(csv_file)
+                st.update(rows=len(df), bytes_read=os.path.getsize(csv_file))
             
             # Extract configuration and benchmark type from filename
             filename = os.path.basename(csv_file)
@@ -62,18 +67,24 @@ def analyze_benchmark_results(results_dir):
         return
     
     # Combine all data
-    combined_df = pd.concat(all_data, ignore_index=True)
+    with profiler.stage("transform") as st:
+        combined_df = pd.concat(all_data, ignore_index=True)
+        st["rows"] = len(combined_df)
     
     print(f"Combined data shape: {combined_df.shape}")
     print(f"Configurations: {combined_df['config_name'].unique()}")
     print(f"Benchmark types: {combined_df['benchmark_type'].unique()}")
     
     # Generate comparative analysis
-    generate_comparative_analysis(combined_df, results_dir)
+    with profiler.stage("plot") as st:
+        generate_comparative_analysis(combined_df, results_dir)
+        st["rows"] = len(combined_df)
     
     # Save combined data
-    combined_file = os.path.join(results_dir, "combined_benchmark_results.csv")
-    combined_df.to_csv(combined_file, index=False)
+    combined_file = os.path.join(results_dir, f"combined_benchmark_results.{output_format}")
+    with profiler.stage("write") as st:
+        write_table(combined_df, combined_file)
+        st.update(rows=len(combined_df), bytes_written=os.path.getsize(combined_file))
     print(f"Combined results saved to: {combined_file}")
 
 def generate_comparative_analysis(df, results_dir):
@@ -183,17 +194,24 @@ def generate_comparative_analysis(df, results_dir):
         print(summary_df.to_string(index=False))
 
 def main():
-    if len(sys.argv) != 2:
-        print("Usage: python3 analyze_benchmark_results.py <results_directory>")
-        sys.exit(1)
-    
-    results_dir = sys.argv[1]
+    parser = argparse.ArgumentParser(
+        description="Analyze counter files from a benchmark suite run"
+    )
+    parser.add_argument("results_dir", help="Benchmark suite results directory")
+    parser.add_argument("--format", choices=["csv", "parquet", "feather"], default="csv",
+                        help="Format of combined_benchmark_results (default: csv)")
+    add_profile_args(parser)
+    args = parser.parse_args()
+    profiler = profiler_from_args(args)
+    
+    results_dir = args.results_dir
     
     if not os.path.exists(results_dir):
         print(f"Error: Results directory not found: {results_dir}")
         sys.exit(1)
     
-    analyze_benchmark_results(results_dir)
+    analyze_benchmark_results(results_dir, args.format, profiler)
+    profiler.write()
 
 if __name__ == "__main__":
     main()
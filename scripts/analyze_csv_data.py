@@ -3,117 +3,244 @@
 """
 Analyze CSV Data for I/O Counter Coverage
 This script analyzes the provided CSV data to determine how many entries have the required I/O counters.
+Usage:
+  python3 analyze_csv_data.py <csv_file> [--output-dir DIR] [--chunksize N] [--json PATH]
 """
 
-import pandas as pd
+import argparse
+import json
+import os
+import sys
+
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
-from collections import Counter
-import sys
-import os
 
-def analyze_csv_data(csv_file):
-    """Analyze the CSV data for I/O counter coverage."""
+from dataset_io import read_table, iter_table, is_sparse, read_sparse
+
+# Counters that must all be non-zero for an entry to count as complete
+REQUIRED_COUNTERS = [
+    'POSIX_OPENS', 'POSIX_READS', 'POSIX_WRITES', 'POSIX_BYTES_READ',
+    'POSIX_BYTES_WRITTEN', 'POSIX_SEEKS', 'POSIX_STATS'
+]
+
+# Counters whose distribution (min/max/mean/std) is reported
+KEY_COUNTERS = ['nprocs', 'POSIX_OPENS', 'POSIX_READS', 'POSIX_WRITES',
+                'POSIX_BYTES_READ', 'POSIX_BYTES_WRITTEN']
+
+# Default location of plots and summaries: the repository's logs/ directory
+DEFAULT_OUTPUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'logs')
+
+
+class CoverageStats:
+    """Mergeable coverage, completeness and distribution statistics.
+
+    Each chunk is reduced with whole-matrix NumPy operations (a boolean
+    non-zero matrix summed per column and all-reduced per row), and the
+    per-chunk results combine exactly, so a file can be analyzed in one
+    piece or streamed in chunks with the same result. Means and variances
+    are merged with Chan's parallel update.
+    """
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        self.posix_counters = [c for c in self.columns if c.startswith('POSIX_')]
+        self.lustre_counters = [c for c in self.columns if c.startswith('LUSTRE_')]
+        self.required = [c for c in REQUIRED_COUNTERS if c in self.columns]
+        self.key_counters = [c for c in KEY_COUNTERS if c in self.columns]
+        self.rows = 0
+        self.missing = np.zeros(len(self.columns), dtype=np.int64)
+        self.non_zero = np.zeros(len(self.posix_counters), dtype=np.int64)
+        self.complete = 0
+        k = len(self.key_counters)
+        self.count = np.zeros(k, dtype=np.int64)
+        self.mean = np.zeros(k)
+        self.m2 = np.zeros(k)
+        self.min = np.full(k, np.inf)
+        self.max = np.full(k, -np.inf)
+
+    def update(self, df):
+        """Fold one chunk (or the whole file) into the statistics."""
+        self.rows += len(df)
+        self.missing += df[self.columns].isnull().to_numpy().sum(axis=0)
+
+        # NaN != 0 is True, matching how the counters were always compared
+        nz = df[self.posix_counters].to_numpy() != 0
+        self.non_zero += nz.sum(axis=0)
+        self.complete += int(nz[:, [self.posix_counters.index(c) for c in self.required]]
+                             .all(axis=1).sum())
+
+        values = df[self.key_counters].to_numpy(dtype=np.float64)
+        valid = ~np.isnan(values)
+        n = valid.sum(axis=0)
+        total = np.where(valid, values, 0.0).sum(axis=0)
+        mean = np.divide(total, n, out=np.zeros_like(total), where=n > 0)
+        m2 = (np.where(valid, values - mean, 0.0) ** 2).sum(axis=0)
+        self._merge_moments(n, mean, m2,
+                            np.where(valid, values, np.inf).min(axis=0, initial=np.inf),
+                            np.where(valid, values, -np.inf).max(axis=0, initial=-np.inf))
+
+    def update_sparse(self, sp):
+        """Fold a SparseCounters block in, reading only its stored (non-zero) entries."""
+        nrows = len(sp)
+        self.rows += nrows
+        nan = np.isnan(sp.data)
+        nan_per_col = np.bincount(sp.indices[nan], minlength=len(sp.columns))
+        col = {c: i for i, c in enumerate(sp.columns)}
+        self.missing += np.array([
+            nan_per_col[col[c]] if c in col else int((sp.labels[c] == 'nan').sum())
+            for c in self.columns])
+
+        self.non_zero += sp.nonzero_counts()[[col[c] for c in self.posix_counters]]
+        required = sp.column_mask(self.required) & (sp.data != 0)
+        hits = np.bincount(sp.row_ids()[required], minlength=nrows)
+        self.complete += int((hits == len(self.required)).sum())
+
+        # moments of each column: stored entries plus the implicit zeros
+        k = len(self.key_counters)
+        n, mean, m2 = np.zeros(k, dtype=np.int64), np.zeros(k), np.zeros(k)
+        lo, hi = np.full(k, np.inf), np.full(k, -np.inf)
+        for i, counter in enumerate(self.key_counters):
+            stored = sp.data[(sp.indices == col[counter]) & ~nan]
+            n[i] = nrows - nan_per_col[col[counter]]
+            zeros = n[i] - len(stored)
+            if n[i]:
+                mean[i] = stored.sum() / n[i]
+                m2[i] = ((stored - mean[i]) ** 2).sum() + zeros * mean[i] ** 2
+            if len(stored):
+                lo[i], hi[i] = stored.min(), stored.max()
+            if zeros:
+                lo[i], hi[i] = min(lo[i], 0.0), max(hi[i], 0.0)
+        self._merge_moments(n, mean, m2, lo, hi)
+
+    def _merge_moments(self, n, mean, m2, lo, hi):
+        combined = self.count + n
+        delta = mean - self.mean
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self.mean = np.where(combined > 0, self.mean + delta * n / combined, 0.0)
+            self.m2 = self.m2 + m2 + np.where(combined > 0, delta ** 2 * self.count * n / combined, 0.0)
+        self.count = combined
+        self.min = np.fmin(self.min, lo)
+        self.max = np.fmax(self.max, hi)
+
+    def distribution(self):
+        """{counter: {min, max, mean, std}} with pandas' conventions (sample std, NaN if undefined)."""
+        out = {}
+        for i, counter in enumerate(self.key_counters):
+            n = self.count[i]
+            out[counter] = {
+                'min': float(self.min[i]) if n else float('nan'),
+                'max': float(self.max[i]) if n else float('nan'),
+                'mean': float(self.mean[i]) if n else float('nan'),
+                'std': float(np.sqrt(self.m2[i] / (n - 1))) if n > 1 else float('nan'),
+            }
+        return out
+
+    def summary(self):
+        rows = max(self.rows, 1)
+        return {
+            'total_entries': self.rows,
+            'complete_entries': self.complete,
+            'complete_percentage': self.complete / rows * 100,
+            'posix_coverage': {
+                counter: {'non_zero_count': int(nz), 'coverage_percentage': nz / rows * 100}
+                for counter, nz in zip(self.posix_counters, self.non_zero.tolist())
+            },
+            'missing_values': int(self.missing.sum()),
+            'missing_per_column': {c: int(m) for c, m in zip(self.columns, self.missing.tolist()) if m},
+            'required_counters': self.required,
+            'distribution': self.distribution(),
+        }
+
+
+def analyze_csv_data(csv_file, output_dir=DEFAULT_OUTPUT_DIR, chunksize=0, plots=True):
+    """Analyze the CSV data for I/O counter coverage.
+
+    With chunksize the file is streamed and never held in memory as a whole;
+    the statistics are identical, but only the coverage chart (which needs
+    no per-row data) is drawn. A sparse .npz file is analyzed from its
+    non-zero entries without being densified (again only the coverage chart).
+    """
     
     print(f"Loading CSV data from: {csv_file}")
     
     # Load the CSV data
     try:
-        df = pd.read_csv(csv_file)
-        print(f"Successfully loaded {len(df)} rows and {len(df.columns)} columns")
+        if is_sparse(csv_file):
+            sp = read_sparse(csv_file)
+            first, chunks, df = None, iter(()), None
+        elif chunksize > 0:
+            chunks = iter_table(csv_file, chunksize)
+            first = next(chunks)
+            df = None
+        else:
+            df = first = read_table(csv_file)
+            chunks = iter(())
     except Exception as e:
         print(f"Error loading CSV file: {e}")
         return None
     
+    if first is None:
+        stats = CoverageStats(sp.column_order)
+        stats.update_sparse(sp)
+    else:
+        stats = CoverageStats(first.columns)
+        stats.update(first)
+    for chunk in chunks:
+        stats.update(chunk)
+    results = stats.summary()
+    total = results['total_entries']
+    print(f"Successfully loaded {total} rows and {len(stats.columns)} columns")
+    
     # Display basic information about the dataset
     print("\n=== Dataset Overview ===")
-    print(f"Shape: {df.shape}")
-    print(f"Columns: {list(df.columns)}")
+    print(f"Shape: {(total, len(stats.columns))}")
+    print(f"Columns: {stats.columns}")
     
     # Check for missing values
     print("\n=== Missing Values Analysis ===")
-    missing_counts = df.isnull().sum()
-    missing_percentages = (missing_counts / len(df)) * 100
-    
     print("Missing values per column:")
-    for col in df.columns:
-        if missing_counts[col] > 0:
-            print(f"  {col}: {missing_counts[col]} ({missing_percentages[col]:.1f}%)")
-    
-    total_missing = missing_counts.sum()
-    print(f"Total missing values: {total_missing}")
+    for col, count in results['missing_per_column'].items():
+        print(f"  {col}: {count} ({count / max(total, 1) * 100:.1f}%)")
+    print(f"Total missing values: {results['missing_values']}")
     
     # Analyze I/O counter coverage
     print("\n=== I/O Counter Coverage Analysis ===")
-    
-    # Define the key I/O counters from the CSV header
-    posix_counters = [col for col in df.columns if col.startswith('POSIX_')]
-    lustre_counters = [col for col in df.columns if col.startswith('LUSTRE_')]
-    
-    print(f"POSIX counters found: {len(posix_counters)}")
-    print(f"Lustre counters found: {len(lustre_counters)}")
-    
-    # Count entries with non-zero values for each counter type
-    posix_coverage = {}
-    for counter in posix_counters:
-        non_zero_count = (df[counter] != 0).sum()
-        coverage_percentage = (non_zero_count / len(df)) * 100
-        posix_coverage[counter] = {
-            'non_zero_count': non_zero_count,
-            'coverage_percentage': coverage_percentage
-        }
+    print(f"POSIX counters found: {len(stats.posix_counters)}")
+    print(f"Lustre counters found: {len(stats.lustre_counters)}")
     
     # Display coverage statistics
     print("\n=== POSIX Counter Coverage ===")
-    for counter, stats in posix_coverage.items():
-        print(f"{counter}: {stats['non_zero_count']}/{len(df)} ({stats['coverage_percentage']:.1f}%)")
+    for counter, cov in results['posix_coverage'].items():
+        print(f"{counter}: {cov['non_zero_count']}/{total} ({cov['coverage_percentage']:.1f}%)")
     
-    # Analyze entries with complete I/O counter data
+    # Entries with all required counters having non-zero values
     print("\n=== Complete Data Analysis ===")
-    
-    # Count entries with all required counters having non-zero values
-    required_counters = [
-        'POSIX_OPENS', 'POSIX_READS', 'POSIX_WRITES', 'POSIX_BYTES_READ', 
-        'POSIX_BYTES_WRITTEN', 'POSIX_SEEKS', 'POSIX_STATS'
-    ]
-    
-    complete_entries = 0
-    for idx, row in df.iterrows():
-        has_all_counters = all(row[counter] != 0 for counter in required_counters if counter in df.columns)
-        if has_all_counters:
-            complete_entries += 1
-    
-    complete_percentage = (complete_entries / len(df)) * 100
-    print(f"Entries with all required POSIX counters: {complete_entries}/{len(df)} ({complete_percentage:.1f}%)")
+    print(f"Entries with all required POSIX counters: {results['complete_entries']}/{total} "
+          f"({results['complete_percentage']:.1f}%)")
     
     # Analyze data distribution
     print("\n=== Data Distribution Analysis ===")
-    
-    # Basic statistics for key counters
-    key_counters = ['nprocs', 'POSIX_OPENS', 'POSIX_READS', 'POSIX_WRITES', 
-                   'POSIX_BYTES_READ', 'POSIX_BYTES_WRITTEN']
-    
-    for counter in key_counters:
-        if counter in df.columns:
-            print(f"\n{counter}:")
-            print(f"  Min: {df[counter].min():.3f}")
-            print(f"  Max: {df[counter].max():.3f}")
-            print(f"  Mean: {df[counter].mean():.3f}")
-            print(f"  Std: {df[counter].std():.3f}")
+    for counter, dist in results['distribution'].items():
+        print(f"\n{counter}:")
+        print(f"  Min: {dist['min']:.3f}")
+        print(f"  Max: {dist['max']:.3f}")
+        print(f"  Mean: {dist['mean']:.3f}")
+        print(f"  Std: {dist['std']:.3f}")
     
     # Create visualizations
-    create_visualizations(df, posix_counters)
-    
-    return {
-        'total_entries': len(df),
-        'complete_entries': complete_entries,
-        'complete_percentage': complete_percentage,
-        'posix_coverage': posix_coverage,
-        'missing_values': total_missing
-    }
+    if plots:
+        os.makedirs(output_dir, exist_ok=True)
+        if df is not None:
+            create_visualizations(df, stats.posix_counters, output_dir, results)
+        else:
+            print("\n=== Creating Visualizations ===")
+            print("Chunked or sparse input: only the coverage summary chart is drawn")
+            plot_coverage_summary(results, output_dir)
+    
+    return results
 
-def create_visualizations(df, posix_counters):
+def create_visualizations(df, posix_counters, output_dir, results):
     """Create visualizations for the I/O counter data."""
     
     print("\n=== Creating Visualizations ===")
@@ -139,7 +266,7 @@ def create_visualizations(df, posix_counters):
         ax.set_ylabel('POSIX Counters', fontsize=12)
         
         plt.tight_layout()
-        plt.savefig('/home/ubuntu/ior-darshan-repo/logs/io_counter_coverage_heatmap.png', dpi=300, bbox_inches='tight')
+        plt.savefig(os.path.join(output_dir, 'io_counter_coverage_heatmap.png'), dpi=300, bbox_inches='tight')
         plt.close()
         print("✓ Coverage heatmap saved")
     
@@ -162,21 +289,21 @@ def create_visualizations(df, posix_counters):
                 axes[i].grid(True, alpha=0.3)
     
     plt.tight_layout()
-    plt.savefig('/home/ubuntu/ior-darshan-repo/logs/io_counter_distributions.png', dpi=300, bbox_inches='tight')
+    plt.savefig(os.path.join(output_dir, 'io_counter_distributions.png'), dpi=300, bbox_inches='tight')
     plt.close()
     print("✓ Distribution plots saved")
     
     # Figure 3: Coverage summary bar chart
+    plot_coverage_summary(results, output_dir)
+
+def plot_coverage_summary(results, output_dir):
+    """Bar chart of the required counters' coverage, drawn from the summary alone."""
     coverage_data = []
     coverage_labels = []
     
-    key_counters = ['POSIX_OPENS', 'POSIX_READS', 'POSIX_WRITES', 'POSIX_BYTES_READ', 
-                   'POSIX_BYTES_WRITTEN', 'POSIX_SEEKS', 'POSIX_STATS']
-    
-    for counter in key_counters:
-        if counter in df.columns:
-            coverage_pct = ((df[counter] != 0).sum() / len(df)) * 100
-            coverage_data.append(coverage_pct)
+    for counter in REQUIRED_COUNTERS:
+        if counter in results['posix_coverage']:
+            coverage_data.append(results['posix_coverage'][counter]['coverage_percentage'])
             coverage_labels.append(counter.replace('POSIX_', ''))
     
     if coverage_data:
@@ -197,23 +324,32 @@ def create_visualizations(df, posix_counters):
         
         plt.xticks(rotation=45, ha='right')
         plt.tight_layout()
-        plt.savefig('/home/ubuntu/ior-darshan-repo/logs/io_counter_coverage_summary.png', dpi=300, bbox_inches='tight')
+        plt.savefig(os.path.join(output_dir, 'io_counter_coverage_summary.png'), dpi=300, bbox_inches='tight')
         plt.close()
         print("✓ Coverage summary chart saved")
 
 def main():
-    if len(sys.argv) != 2:
-        print("Usage: python3 analyze_csv_data.py <csv_file>")
-        sys.exit(1)
-    
-    csv_file = sys.argv[1]
+    parser = argparse.ArgumentParser(
+        description="Analyze a counters CSV/Parquet/Arrow file for I/O counter coverage"
+    )
+    parser.add_argument("csv_file", help="Counters file to analyze")
+    parser.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR,
+                        help="Where plots and summaries are written (default: the repo's logs/)")
+    parser.add_argument("--json", default=None,
+                        help="Machine-readable summary path (default: OUTPUT_DIR/csv_analysis_summary.json)")
+    parser.add_argument("--chunksize", type=int, default=0,
+                        help="Stream the file in chunks of this many rows (only the coverage chart is drawn)")
+    parser.add_argument("--no-plots", action="store_true", help="Skip the visualizations")
+    args = parser.parse_args()
+    
+    csv_file = args.csv_file
     
     if not os.path.exists(csv_file):
         print(f"Error: CSV file not found: {csv_file}")
         sys.exit(1)
     
     # Analyze the data
-    results = analyze_csv_data(csv_file)
+    results = analyze_csv_data(csv_file, args.output_dir, args.chunksize, not args.no_plots)
     
     if results:
         print("\n=== Summary Report ===")
@@ -223,7 +359,8 @@ def main():
         print(f"Total missing values: {results['missing_values']}")
         
         # Save summary to file
-        summary_file = '/home/ubuntu/ior-darshan-repo/logs/csv_analysis_summary.txt'
+        os.makedirs(args.output_dir, exist_ok=True)
+        summary_file = os.path.join(args.output_dir, 'csv_analysis_summary.txt')
         with open(summary_file, 'w') as f:
             f.write("CSV Data Analysis Summary\n")
             f.write("=" * 50 + "\n\n")
@@ -236,9 +373,14 @@ def main():
             for counter, stats in results['posix_coverage'].items():
                 f.write(f"  {counter}: {stats['coverage_percentage']:.1f}%\n")
         
+        json_file = args.json or os.path.join(args.output_dir, 'csv_analysis_summary.json')
+        with open(json_file, 'w') as f:
+            json.dump(dict(results, source=os.path.abspath(csv_file)), f, indent=2)
+        
         print(f"\nDetailed summary saved to: {summary_file}")
-        print("Visualizations saved to /home/ubuntu/ior-darshan-repo/logs/")
+        print(f"JSON summary saved to: {json_file}")
+        if not args.no_plots:
+            print(f"Visualizations saved to {args.output_dir}/")
 
 if __name__ == "__main__":
     main()
-
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Benchmark the Darshan ingestion pipeline stage by stage.
+
+Runs parse_darshan_dir.parse_file over the committed logs (optionally
+replicated into synthetic scaled copies), then DataFrame assembly,
+log10 and L2 normalization, and CSV/Parquet/Arrow writes. Each stage
+reports wall time, files/s or rows/s, MB/s and how far RSS rose above
+its starting level during the stage (plus the cumulative process peak).
+Results can be saved as a baseline and later runs compared against it;
+any stage slower than the baseline by more than --tolerance fails the run.
+Usage:
+  python benchmark_pipeline.py --save-baseline bench_baseline.json
+  python benchmark_pipeline.py --baseline bench_baseline.json --scale 4
+"""
+import argparse
+import glob
+import json
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from parse_darshan_dir import parse_file, LEVEL_KEYS, OUTPUT_COUNTERS
+from normalize_counters_log import log_normalize
+from normalize_counters_l2 import l2_normalize
+from dataset_io import write_table
+
+DEFAULT_LOG_GLOB = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "..", "logs", "tests", "**", "*.darshan")
+MB = 1024.0 * 1024.0
+
+# stages faster than this in the baseline are too noisy to compare on time
+MIN_COMPARABLE_SECONDS = 0.05
+
+
+# stages whose baseline RSS growth is below this are too noisy to compare on memory
+MIN_COMPARABLE_RSS_MB = 16.0
+
+
+def peak_rss_mb():
+    # ru_maxrss is in KiB on Linux (bytes on macOS)
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (MB if sys.platform == "darwin" else 1024.0)
+
+
+def _proc_status_mb(field):
+    """A kB field of /proc/self/status (VmRSS, VmHWM) in MB, or None off Linux."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    return None
+
+
+def rss_mark():
+    """Memory state at the start of a stage, for rss_growth_mb().
+
+    Where the kernel allows it the peak-RSS counter (VmHWM, and with it
+    ru_maxrss) is reset, so the peak read afterwards belongs to the stage
+    alone rather than to the whole process lifetime.
+    """
+    peak = peak_rss_mb()
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        reset = True
+    except OSError:
+        reset = False
+    return _proc_status_mb("VmRSS"), peak, reset
+
+
+def rss_growth_mb(mark):
+    """(peak RSS during the stage above its starting RSS, peak RSS during the stage).
+
+    Without a resettable peak counter only a rise of the process-lifetime
+    peak is visible, so the growth is a lower bound there.
+    """
+    start, peak0, reset = mark
+    hwm = _proc_status_mb("VmHWM") if reset else None
+    if hwm is not None and start is not None:
+        return max(hwm - start, 0.0), hwm
+    peak = peak_rss_mb()
+    return max(peak - peak0, 0.0), peak
+
+
+def scaled_copies(paths, scale, workdir):
+    """Return paths plus scale-1 renamed copies of each log written under workdir."""
+    if scale <= 1:
+        return list(paths)
+    out = list(paths)
+    for k in range(1, scale):
+        sub = os.path.join(workdir, f"copy{k}")
+        os.makedirs(sub, exist_ok=True)
+        for i, fp in enumerate(paths):
+            dst = os.path.join(sub, f"{i:06d}_{os.path.basename(fp)}")
+            shutil.copyfile(fp, dst)
+            out.append(dst)
+    return out
+
+
+def timed(fn, repeat):
+    """Run fn repeat times; return (best wall seconds, cpu seconds of that run, last result)."""
+    best = None
+    result = None
+    for _ in range(repeat):
+        w0, c0 = time.perf_counter(), time.process_time()
+        result = fn()
+        wall, cpu = time.perf_counter() - w0, time.process_time() - c0
+        if best is None or wall < best[0]:
+            best = (wall, cpu)
+    return best[0], best[1], result
+
+
+def run_benchmark(paths, workdir, repeat=1, parser_cmd=None, formats=("csv", "parquet", "feather")):
+    """Time every pipeline stage over paths; returns {stage: metrics}."""
+    results = {}
+    in_bytes = sum(os.path.getsize(fp) for fp in paths)
+    process_peak = peak_rss_mb()
+    mark = rss_mark()
+
+    def record(stage, wall, cpu, items, unit, nbytes):
+        nonlocal mark, process_peak
+        growth, stage_peak = rss_growth_mb(mark)
+        process_peak = max(process_peak, stage_peak)
+        results[stage] = {
+            "seconds": wall,
+            "cpu_seconds": cpu,
+            unit: items,
+            f"{unit}_per_s": items / wall if wall > 0 else float("inf"),
+            "mb_per_s": nbytes / MB / wall if wall > 0 else float("inf"),
+            "rss_growth_mb": growth,
+            "process_peak_rss_mb": process_peak,
+        }
+        mark = rss_mark()
+
+    wall, cpu, records = timed(
+        lambda: [rec for fp in paths for rec in parse_file(fp, parser_cmd)], repeat)
+    record("parse", wall, cpu, len(paths), "files", in_bytes)
+
+    cols = LEVEL_KEYS["rank"] + OUTPUT_COUNTERS + ["tag", "test_id"]
+    wall, cpu, df = timed(lambda: pd.DataFrame(records)[cols], repeat)
+    frame_bytes = df.memory_usage(deep=True).sum()
+    record("dataframe", wall, cpu, len(df), "rows", frame_bytes)
+
+    def normalize():
+        out = df.copy()
+        log_normalize(out)
+        return l2_normalize(out)
+    wall, cpu, _ = timed(normalize, repeat)
+    record("normalize", wall, cpu, len(df), "rows", frame_bytes)
+
+    for fmt in formats:
+        path = os.path.join(workdir, f"bench_output.{fmt}")
+        try:
+            wall, cpu, _ = timed(lambda: write_table(df, path, int_columns=cols[:-2]), repeat)
+        except RuntimeError as e:  # columnar formats without pyarrow
+            print(f"[WARN] skipping {fmt} write: {e}", file=sys.stderr)
+            continue
+        record(f"write_{fmt}", wall, cpu, len(df), "rows", os.path.getsize(path))
+    return results
+
+
+def _rate_key(metrics):
+    return "files_per_s" if "files_per_s" in metrics else "rows_per_s"
+
+
+def compare(results, baseline, tolerance):
+    """Return a list of regression messages for stages slower (or larger) than baseline allows.
+
+    Speed is compared as throughput (files/s or rows/s), so a baseline taken
+    at one --scale still applies to another; RSS growth is compared as is.
+    Baselines written before rss_growth_mb existed are only compared on speed.
+    """
+    regressions = []
+    for stage, base in baseline.get("stages", {}).items():
+        cur = results.get(stage)
+        if cur is None:
+            continue
+        rate = _rate_key(base)
+        if base["seconds"] >= MIN_COMPARABLE_SECONDS and cur[rate] * (1.0 + tolerance) < base[rate]:
+            regressions.append(
+                f"{stage}.{rate}: {cur[rate]:.1f} < {base[rate]:.1f} "
+                f"(-{100 * (1 - cur[rate] / base[rate]):.0f}%, tolerance {100 * tolerance:.0f}%)")
+        base_rss = base.get("rss_growth_mb")
+        if (base_rss is not None and base_rss >= MIN_COMPARABLE_RSS_MB
+                and cur["rss_growth_mb"] > base_rss * (1.0 + tolerance)):
+            regressions.append(
+                f"{stage}.rss_growth_mb: {cur['rss_growth_mb']:.1f} > {base_rss:.1f} "
+                f"(tolerance {100 * tolerance:.0f}%)")
+    return regressions
+
+
+def print_table(results):
+    print(f"{'stage':<15}{'seconds':>10}{'cpu s':>10}{'items/s':>12}{'MB/s':>10}{'+RSS MB':>10}{'peak MB':>10}")
+    for stage, m in results.items():
+        rate = m[_rate_key(m)]
+        print(f"{stage:<15}{m['seconds']:>10.3f}{m['cpu_seconds']:>10.3f}"
+              f"{rate:>12.1f}{m['mb_per_s']:>10.1f}"
+              f"{m['rss_growth_mb']:>10.1f}{m['process_peak_rss_mb']:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Time parsing, DataFrame build, normalization and writes of Darshan logs"
+    )
+    parser.add_argument("--logs", default=DEFAULT_LOG_GLOB,
+                        help="Glob of .darshan files to benchmark (default: logs/tests/**/*.darshan)")
+    parser.add_argument("--limit", type=int, default=0,
+                        help="Only use the first N logs (0 = all)")
+    parser.add_argument("--scale", type=int, default=1,
+                        help="Replicate the logs into N copies in total to test larger inputs")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="Runs per stage; the fastest one is reported")
+    parser.add_argument("--parser-cmd", default=None,
+                        help="Benchmark darshan-parser instead of the in-process reader")
+    parser.add_argument("--output", default=None, help="Write the results as JSON here")
+    parser.add_argument("--save-baseline", default=None,
+                        help="Store the results as a baseline JSON for later comparison")
+    parser.add_argument("--baseline", default=None,
+                        help="Compare against this baseline JSON and exit 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed slowdown relative to the baseline (default 0.25 = 25%%)")
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(args.logs, recursive=True))
+    if args.limit > 0:
+        paths = paths[:args.limit]
+    if not paths:
+        print(f"[ERROR] no logs match {args.logs}", file=sys.stderr)
+        sys.exit(1)
+
+    with tempfile.TemporaryDirectory(prefix="darshan_bench_") as workdir:
+        paths = scaled_copies(paths, args.scale, workdir)
+        print(f"[INFO] benchmarking {len(paths)} logs, best of {args.repeat}")
+        results = run_benchmark(paths, workdir, args.repeat, args.parser_cmd)
+
+    print_table(results)
+    report = {
+        "logs": len(paths),
+        "scale": args.scale,
+        "repeat": args.repeat,
+        "reader": args.parser_cmd or "native",
+        "stages": results,
+    }
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump(report, f, indent=2)
+            print(f"[OK] wrote results to {path}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("reader") != report["reader"]:
+            print(f"[WARN] baseline was measured with the {baseline.get('reader')} reader; "
+                  "comparison may not be meaningful", file=sys.stderr)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("[FAIL] performance regressions against baseline:", file=sys.stderr)
+            for msg in regressions:
+                print(f"  {msg}", file=sys.stderr)
+            sys.exit(1)
+        print(f"[OK] no stage regressed more than {100 * args.tolerance:.0f}% against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
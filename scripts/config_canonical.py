@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Collapse configurations that run the same IOR command, and fan results back out.
+
+generate_and_submit_slurms.py passes only some parameters to IOR, so many
+config rows submit an identical job:
+  setAlignment, LUSTRE_STRIPE_SIZE, LUSTRE_STRIPE_WIDTH
+                        never reach the command line,
+  useStridedDatatype    becomes --mpiio.useStridedDatatype, which only
+                        the MPIIO backend reads,
+  useO_DIRECT           becomes --posix.odirect, which only the POSIX
+                        backend reads.
+canonical_frame() rewrites every row as its effective invocation (sizes
+in bytes, backend options zeroed where the api ignores them), and
+canonicalize() keeps one representative row per distinct invocation plus
+a map from every testFile to the testFile that runs for it. After the
+representatives are parsed, fan_out() copies each run to every
+equivalent testFile, so joins against the full config CSV see all rows.
+Usage:
+  python config_canonical.py dedup ../configs/ior_configurations.csv -o unique.csv --map canonical_map.csv
+  python config_canonical.py fanout parsed.csv --map canonical_map.csv -o parsed_all.csv
+"""
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+from dataset_io import read_table, write_table
+from ior_dataset import CONFIG_KEY, RUN_KEY, normalize_column
+
+# parameters that appear on the mpirun/IOR command line (numTasks also sizes the job)
+INVOCATION_PARAMS = [
+    "api", "transferSize", "blockSize", "segmentCount", "numTasks",
+    "filePerProc", "useStridedDatatype", "useO_DIRECT", "fsync",
+]
+IGNORED_PARAMS = ["setAlignment", "LUSTRE_STRIPE_SIZE", "LUSTRE_STRIPE_WIDTH"]
+
+# backend-specific options and the only api that reads each
+BACKEND_OPTIONS = {"useStridedDatatype": "MPIIO", "useO_DIRECT": "POSIX"}
+
+CANONICAL_KEY = "canonical_testFile"
+
+
+def canonical_frame(configs):
+    """The effective IOR invocation of every config row, one column per INVOCATION_PARAMS."""
+    missing = [c for c in INVOCATION_PARAMS if c not in configs.columns]
+    if missing:
+        raise KeyError(f"configuration columns missing: {missing}")
+    out = pd.DataFrame({c: normalize_column(c, configs[c]) for c in INVOCATION_PARAMS},
+                       index=configs.index)
+    api = out["api"]
+    for flag in ["filePerProc", "useStridedDatatype", "useO_DIRECT", "fsync"]:
+        # the submit script emits a flag only for the value 1
+        out[flag] = (out[flag] == 1).astype(np.int64)
+    for option, backend in BACKEND_OPTIONS.items():
+        out[option] = out[option].where(api == backend, 0)
+    return out
+
+
+def canonicalize(configs):
+    """(representatives, mapping) for a configuration table.
+
+    representatives holds the first row of each distinct invocation;
+    mapping has CONFIG_KEY, CANONICAL_KEY and a group id for every row.
+    """
+    canon = canonical_frame(configs)
+    group, _ = pd.MultiIndex.from_frame(canon).factorize()
+    first = np.unique(group, return_index=True)[1]
+    reps = configs.iloc[np.sort(first)]
+    mapping = pd.DataFrame({
+        CONFIG_KEY: configs[CONFIG_KEY].to_numpy(),
+        CANONICAL_KEY: configs[CONFIG_KEY].to_numpy()[first[group]],
+        "invocation_id": group,
+    })
+    return reps.reset_index(drop=True), mapping
+
+
+def fan_out(runs, mapping):
+    """Copy every run of a representative to all its equivalent testFiles.
+
+    The copies take the member's test_id; the representative that actually
+    ran is kept in CANONICAL_KEY. Runs whose test_id is not a representative
+    pass through unchanged.
+    """
+    runs = runs.copy()
+    runs[RUN_KEY] = runs[RUN_KEY].astype(str)
+    members = mapping[[CANONICAL_KEY, CONFIG_KEY]].rename(columns={CONFIG_KEY: "_member"})
+    out = runs.merge(members, how="left", left_on=RUN_KEY, right_on=CANONICAL_KEY, sort=False)
+    unmapped = out["_member"].isna()
+    out.loc[unmapped, CANONICAL_KEY] = out.loc[unmapped, RUN_KEY]
+    out[RUN_KEY] = out["_member"].fillna(out[RUN_KEY])
+    return out.drop(columns="_member")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Deduplicate configurations by effective IOR invocation and fan results back out"
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("dedup", help="Keep one configuration per distinct IOR invocation")
+    p.add_argument("configs", help="Configuration CSV")
+    p.add_argument("-o", "--output", required=True, help="Representative configurations CSV")
+    p.add_argument("--map", required=True, help="testFile -> canonical testFile mapping CSV")
+
+    p = sub.add_parser("fanout", help="Copy parsed runs of representatives to all equivalent configs")
+    p.add_argument("runs", help="Parsed counters of the representative runs")
+    p.add_argument("--map", required=True, help="Mapping written by dedup")
+    p.add_argument("-o", "--output", required=True)
+    args = parser.parse_args()
+
+    try:
+        if args.command == "dedup":
+            configs = pd.read_csv(args.configs, dtype=str)
+            reps, mapping = canonicalize(configs)
+            reps.to_csv(args.output, index=False)
+            mapping.to_csv(args.map, index=False)
+            print(f"[OK] {len(configs)} configurations run {len(reps)} distinct IOR invocations "
+                  f"({len(configs) - len(reps)} redundant); wrote {args.output} and {args.map}")
+        else:
+            runs = read_table(args.runs)
+            mapping = pd.read_csv(args.map, dtype=str)
+            out = fan_out(runs, mapping)
+            write_table(out, args.output)
+            print(f"[OK] fanned {len(runs)} runs out to {len(out)} rows in {args.output}")
+    except (KeyError, ValueError) as e:
+        print(f"[ERROR] {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Diversity scores and diverse subsets of IOR configuration tables.
+
+Every parameter column is encoded once as integer codes, so both steps
+are array operations over the whole pool:
+  diversity_scores   sum over columns of 1 / (frequency of the row's
+                     value in that column), the score test_script.py
+                     ranks by, from bincount frequency tables.
+  select_diverse     greedy k-center (farthest-point) selection under
+                     Hamming distance: each pick is the configuration
+                     differing in the most parameters from its nearest
+                     already-selected one. Ties, which are the rule with
+                     a dozen discrete parameters, go to the row whose
+                     values are rarest in the selection so far, then to
+                     the higher diversity score, which keeps the
+                     selected levels balanced.
+Usage:
+  python config_diversity.py ../configs/ior_configurations.csv --k 200 -o diverse_200.csv
+  python config_diversity.py ../configs/ior_configurations_targeted.csv --top 10
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from ior_dataset import PARAM_COLUMNS
+
+
+def encode_columns(df, cols=None):
+    """(codes, cardinalities): per-column integer codes (rows x columns) of the values."""
+    cols = PARAM_COLUMNS if cols is None else cols
+    missing = [c for c in cols if c not in df.columns]
+    if missing:
+        raise KeyError(f"columns not in the table: {missing}")
+    codes = np.empty((len(df), len(cols)), dtype=np.int64)
+    sizes = np.empty(len(cols), dtype=np.int64)
+    for j, col in enumerate(cols):
+        codes[:, j], uniques = pd.factorize(df[col], use_na_sentinel=False)
+        sizes[j] = len(uniques)
+    return codes, sizes
+
+
+def diversity_scores(codes, sizes):
+    """Sum over columns of 1 / frequency of each row's value."""
+    score = np.zeros(len(codes))
+    for j, size in enumerate(sizes):
+        inverse = 1.0 / np.bincount(codes[:, j], minlength=size)
+        score += inverse[codes[:, j]]
+    return score
+
+
+def select_diverse(codes, sizes, k, scores=None):
+    """Row positions of a greedy k-center selection of k rows, in pick order.
+
+    The first pick is the highest-scoring row. Stops early when every
+    distinct configuration has been selected.
+    """
+    n = len(codes)
+    if scores is None:
+        scores = diversity_scores(codes, sizes)
+    # counts of each value among the rows selected so far, one table per column
+    selected = [np.zeros(s, dtype=np.int64) for s in sizes]
+    nearest = np.full(n, codes.shape[1] + 1, dtype=np.int64)
+    picks = []
+    pick = int(np.argmax(scores))
+    while len(picks) < min(k, n):
+        picks.append(pick)
+        for j, counts in enumerate(selected):
+            counts[codes[pick, j]] += 1
+        nearest = np.minimum(nearest, (codes != codes[pick]).sum(1))
+        far = nearest.max()
+        if far == 0:
+            break  # only duplicates of selected rows are left
+        cand = np.flatnonzero(nearest == far)
+        overlap = np.zeros(len(cand), dtype=np.int64)
+        for j, counts in enumerate(selected):
+            overlap += counts[codes[cand, j]]
+        # lexsort: last key first; least overlap, then highest score
+        pick = int(cand[np.lexsort((-scores[cand], overlap))[0]])
+    return np.asarray(picks, dtype=np.int64)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Score configurations by diversity and pick a diverse subset"
+    )
+    parser.add_argument("csv_file", help="Configuration CSV")
+    parser.add_argument("--k", type=int, default=None, help="Select this many diverse configurations")
+    parser.add_argument("--columns", nargs="+", default=PARAM_COLUMNS,
+                        help="Parameter columns to compare (default: all IOR parameters)")
+    parser.add_argument("--top", type=int, default=10, help="Print this many top-scored rows")
+    parser.add_argument("-o", "--output", default=None,
+                        help="Write the selection (or, without --k, the scored table) here")
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.csv_file, dtype=str)  # keep ids and values exactly as written
+    try:
+        codes, sizes = encode_columns(df, args.columns)
+    except KeyError as e:
+        print(f"[ERROR] {e}", file=sys.stderr)
+        sys.exit(1)
+    start = time.time()
+    df["diversity_score"] = diversity_scores(codes, sizes)
+    print(f"[INFO] scored {len(df)} configurations in {time.time() - start:.3f}s")
+    print(df.sort_values("diversity_score", ascending=False)
+          [["config_id", "diversity_score"] + args.columns].head(args.top).to_string(index=False))
+
+    out = df
+    if args.k is not None:
+        start = time.time()
+        picks = select_diverse(codes, sizes, args.k, df["diversity_score"].to_numpy())
+        out = df.iloc[picks].drop(columns="diversity_score")
+        cover = sum(len(np.unique(codes[picks, j])) for j in range(len(sizes)))
+        print(f"[INFO] selected {len(picks)} configurations in {time.time() - start:.3f}s, "
+              f"covering {cover} of {int(sizes.sum())} parameter values")
+    if args.output:
+        out.to_csv(args.output, index=False)
+        print(f"[OK] wrote {len(out)} rows to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Lazy view of the IOR configuration space (the full factorial of parameter levels).
+
+A ConfigSpace never materializes the product. Configuration i is decoded
+from i as a mixed-radix number (the last parameter varies fastest, the
+order itertools.product uses), so indexing, the reverse lookup index_of()
+and len() are all O(1). Shards are disjoint index ranges, so N submitters
+can each take shard k of N without coordinating and without writing the
+full factorial anywhere. config_id / testFile follow the historical
+numbering: index i is config i + 1, zero-padded to the width of the total.
+Usage:
+  space = ConfigSpace()                 # the levels of ior_configurations_generator.py
+  cfg = space[12345]                    # {"api": ..., "transferSize": ..., ...}
+  for row in space.rows(*space.shard(2, 8)): ...
+  python config_space.py --shard 2/8 -o shard2.csv
+"""
+import argparse
+import csv
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Parameter levels of the full factorial, in CSV column order
+DEFAULT_LEVELS = {
+    "api":                 ["POSIX", "HDF5"],
+    "transferSize":        ["4K", "64K", "1M"],
+    "blockSize":           ["1M", "4M", "16M"],
+    "segmentCount":        [1, 16, 256],
+    "numTasks":            [4, 16, 64],
+    "filePerProc":         [0, 1],
+    "useStridedDatatype":  [0, 1],
+    "setAlignment":        ["4K", "1M"],
+    "useO_DIRECT":         [0, 1],
+    "fsync":               [0, 1],
+    "LUSTRE_STRIPE_SIZE":  ["1M", "4M"],
+    "LUSTRE_STRIPE_WIDTH": [1, 4],
+}
+ID_COLUMNS = ["config_id", "testFile"]
+
+
+class ConfigSpace:
+    """Indexable, shardable full factorial over named parameter levels."""
+
+    def __init__(self, levels=None):
+        levels = DEFAULT_LEVELS if levels is None else levels
+        self.names = list(levels)
+        self.levels = [list(levels[n]) for n in self.names]
+        self.radix = np.array([len(v) for v in self.levels], dtype=np.int64)
+        if (self.radix == 0).any():
+            raise ValueError("every parameter needs at least one level")
+        # stride[j] = number of configurations per step of parameter j
+        self.stride = np.concatenate([np.cumprod(self.radix[::-1])[::-1][1:], [1]])
+        self.size = int(np.prod(self.radix))
+        self.pad_width = len(str(self.size))
+        self._position = [{v: k for k, v in enumerate(vals)} for vals in self.levels]
+
+    @property
+    def columns(self):
+        return ID_COLUMNS + self.names
+
+    def __len__(self):
+        return self.size
+
+    def _check(self, index):
+        if index < 0:
+            index += self.size
+        if not 0 <= index < self.size:
+            raise IndexError(f"configuration index {index} out of range for {self.size}")
+        return index
+
+    def digits(self, index):
+        """Level position of every parameter for configuration index."""
+        index = self._check(int(index))
+        return [(index // int(s)) % int(r) for s, r in zip(self.stride, self.radix)]
+
+    def __getitem__(self, index):
+        return {n: vals[d] for n, vals, d in zip(self.names, self.levels, self.digits(index))}
+
+    def index_of(self, config):
+        """Inverse of __getitem__: the index of a {name: value} configuration."""
+        try:
+            return sum(pos[config[n]] * int(s)
+                       for n, pos, s in zip(self.names, self._position, self.stride))
+        except KeyError as e:
+            raise KeyError(f"{e.args[0]!r} is not a level of this space") from None
+
+    def config_id(self, index):
+        return str(self._check(int(index)) + 1).zfill(self.pad_width)
+
+    def row(self, index):
+        """CSV row (config_id, testFile, levels...) of configuration index."""
+        cid = self.config_id(index)
+        return [cid, f"test{cid}"] + [vals[d] for vals, d in zip(self.levels, self.digits(index))]
+
+    def rows(self, start=0, stop=None, step=1):
+        """Lazily yield rows for indices range(start, stop, step)."""
+        stop = self.size if stop is None else min(stop, self.size)
+        for i in range(start, stop, step):
+            yield self.row(i)
+
+    def __iter__(self):
+        for i in range(self.size):
+            yield self[i]
+
+    def shard(self, k, n):
+        """(start, stop) of shard k (0-based) of n contiguous, near-equal, disjoint shards."""
+        if not 0 <= k < n:
+            raise ValueError(f"shard {k} out of range for {n} shards")
+        return self.size * k // n, self.size * (k + 1) // n
+
+    def frame(self, indices):
+        """DataFrame of the given indices, decoded together with NumPy."""
+        idx = np.asarray(indices, dtype=np.int64)
+        if idx.size and (idx.min() < -self.size or idx.max() >= self.size):
+            raise IndexError(f"configuration index out of range for {self.size}")
+        idx = np.where(idx < 0, idx + self.size, idx)
+        digits = (idx[:, None] // self.stride) % self.radix
+        ids = np.char.zfill((idx + 1).astype(str), self.pad_width)
+        data = {"config_id": ids, "testFile": np.char.add("test", ids)}
+        for j, (name, vals) in enumerate(zip(self.names, self.levels)):
+            data[name] = np.asarray(vals, dtype=object)[digits[:, j]]
+        return pd.DataFrame(data)
+
+    def write_csv(self, path, start=0, stop=None, step=1):
+        """Stream rows range(start, stop, step) to a CSV in the historical layout."""
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(self.columns)
+            n = 0
+            for row in self.rows(start, stop, step):
+                writer.writerow(row)
+                n += 1
+        return n
+
+
+def parse_shard(spec):
+    """"k/N" (k is 1-based, as job array indices usually are) -> (k - 1, N)."""
+    try:
+        k, n = (int(x) for x in spec.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected K/N, got {spec!r}")
+    if not 1 <= k <= n:
+        raise argparse.ArgumentTypeError(f"shard {spec} out of range")
+    return k - 1, n
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Enumerate (a shard or slice of) the IOR configuration space lazily"
+    )
+    parser.add_argument("--shard", type=parse_shard, default=None, metavar="K/N",
+                        help="Only shard K of N (1-based)")
+    parser.add_argument("--index", type=int, nargs="+", default=None,
+                        help="Only these configuration indices (0-based)")
+    parser.add_argument("-o", "--output", default=None,
+                        help="CSV to write (default: print the selection to stdout)")
+    args = parser.parse_args()
+
+    space = ConfigSpace()
+    if args.index is not None:
+        rows = space.frame(args.index)
+        if args.output:
+            rows.to_csv(args.output, index=False)
+        else:
+            rows.to_csv(sys.stdout, index=False)
+        return
+    start, stop = space.shard(*args.shard) if args.shard else (0, len(space))
+    if args.output:
+        n = space.write_csv(args.output, start, stop)
+        print(f"Wrote {n} of {len(space)} configurations to {args.output}")
+    else:
+        writer = csv.writer(sys.stdout)
+        writer.writerow(space.columns)
+        writer.writerows(space.rows(start, stop))
+
+
+if __name__ == "__main__":
+    main()
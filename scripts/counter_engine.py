@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Table-driven counter extraction over decoded Darshan records.
+
+Every counter of the POSIX, MPI-IO, STDIO, LUSTRE, H5F and H5D modules is
+described by one schema entry (module, counter name, reduction). Records
+are reduced column-wise with NumPy using index maps built from the schema,
+so extraction is one pass per module with no per-counter branching.
+Usage (as a library):
+  log = read_log(path)
+  row = extract_counters(log, ["POSIX", "LUSTRE"])
+"""
+import re
+
+import numpy as np
+
+from darshan_reader import MODULES
+
+DEFAULT_MODULES = ["POSIX", "LUSTRE"]
+
+# Darshan writes -1 for counters it could not monitor; those never count.
+UNMONITORED = -1
+
+# How records combine into one value. Anything not matched is summed.
+# Order matters: the first matching pattern wins.
+REDUCTION_RULES = [
+    (re.compile(r"_START_TIMESTAMP$"), "min"),
+    (re.compile(r"_END_TIMESTAMP$"), "max"),
+    (re.compile(r"_MAX_|_MAX$"), "max"),
+    (re.compile(r"_ALIGNMENT$"), "max"),
+    (re.compile(r"_MODE$"), "max"),
+    # per-record rank extremes and variances are not additive across records
+    (re.compile(r"_(FASTEST|SLOWEST)_RANK(_BYTES)?$"), "max"),
+    (re.compile(r"_F_(FASTEST|SLOWEST|VARIANCE)_RANK_(TIME|BYTES)$"), "max"),
+    (re.compile(r"_STRIDE\d_STRIDE$|_ACCESS\d_ACCESS$"), "max"),
+    (re.compile(r"^LUSTRE_"), "max"),
+    (re.compile(r"^H5D_(DATASPACE_NDIMS|DATASPACE_NPOINTS|DATATYPE_SIZE|CHUNK_SIZE_D\d|USE_MPIIO_COLLECTIVE|USE_DEPRECATED)$"), "max"),
+    (re.compile(r"^H5F_USE_MPIIO$"), "max"),
+]
+
+
+def reduction_for(name):
+    for pattern, op in REDUCTION_RULES:
+        if pattern.search(name):
+            return op
+    return "sum"
+
+
+def counter_schema(modules=None):
+    """Ordered list of (module, counter name, reduction) for the selected modules."""
+    modules = DEFAULT_MODULES if modules is None else modules
+    schema = []
+    for module in modules:
+        if module not in MODULES:
+            raise ValueError(f"unknown module {module!r}; expected one of {list(MODULES)}")
+        _, _, cnames, fnames = MODULES[module]
+        for name in cnames + fnames:
+            schema.append((module, name, reduction_for(name)))
+    return schema
+
+
+def schema_columns(modules=None):
+    return [name for _, name, _ in counter_schema(modules)]
+
+
+def module_matrix(mod):
+    """Counters and fcounters of a decoded module side by side as one float64 matrix."""
+    return np.hstack([mod["counters"].astype(np.float64), mod["fcounters"]])
+
+
+def reduce_records(values, ops, group=None, ngroups=1):
+    """Reduce record rows of values (n_records x n_columns) into ngroups rows.
+
+    ops gives the reduction ("sum", "max" or "min") of each column and group
+    maps each record to its output row (all records go to row 0 by default).
+    Unmonitored (-1) entries are ignored; "min" also ignores zeros, which
+    Darshan uses for timestamps that never happened. Columns with no valid
+    entry in a group come out as 0.
+    """
+    n, k = values.shape
+    if group is None:
+        group = np.zeros(n, dtype=np.intp)
+    ops = np.asarray(ops)
+    out = np.zeros((ngroups, k))
+    valid = values != UNMONITORED
+
+    cols = np.flatnonzero(ops == "sum")
+    if len(cols):
+        np.add.at(out, (group[:, None], cols), np.where(valid[:, cols], values[:, cols], 0.0))
+
+    for op, ufunc, fill in (("max", np.maximum, -np.inf), ("min", np.minimum, np.inf)):
+        cols = np.flatnonzero(ops == op)
+        if not len(cols):
+            continue
+        ok = valid[:, cols]
+        if op == "min":
+            ok = ok & (values[:, cols] != 0)
+        acc = np.full((ngroups, len(cols)), fill)
+        ufunc.at(acc, (group[:, None], np.arange(len(cols))), np.where(ok, values[:, cols], fill))
+        acc[~np.isfinite(acc)] = 0.0
+        out[:, cols] = acc
+    return out
+
+
+def reduce_groups(values, ops, keys):
+    """reduce_records over the groups of records sharing a key.
+
+    Returns (sorted unique keys, one reduced row per key, group index of each record).
+    """
+    uniq, inverse = np.unique(keys, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    return uniq, reduce_records(values, ops, inverse, len(uniq)), inverse
+
+
+def extract_counters(log, modules=None):
+    """Reduce every record of the selected modules into one {counter: value} row.
+
+    Modules missing from the log contribute zeros, so the row always has
+    the full schema_columns(modules) layout.
+    """
+    modules = DEFAULT_MODULES if modules is None else modules
+    row = {}
+    for module in modules:
+        schema = counter_schema([module])
+        names = [name for _, name, _ in schema]
+        mod = log["modules"].get(module)
+        if mod is None or len(mod["id"]) == 0:
+            row.update(dict.fromkeys(names, 0.0))
+            continue
+        ops = [op for _, _, op in schema]
+        totals = reduce_records(module_matrix(mod), ops)[0]
+        row.update(zip(names, totals.tolist()))
+    return row
@@ -0,0 +1,444 @@
+#!/usr/bin/env python3
+"""
+In-process reader for Darshan 3.x binary logs (log format 3.41).
+
+Decodes the log header, job record, name table and the POSIX, MPI-IO, STDIO,
+LUSTRE, H5F and H5D module regions straight into NumPy arrays, so counter
+extraction no longer needs to fork darshan-parser and re-parse its text.
+Usage:
+  python darshan_reader.py log.darshan [--module POSIX ...]
+"""
+import argparse
+import bz2
+import os
+import struct
+import sys
+import zlib
+
+import numpy as np
+
+LOG_VERSION = "3.41"
+MAGIC_NR = 6567223
+MAX_MODS = 64
+
+# struct darshan_header: version[8], magic_nr, comp_type, partial_flag (u64),
+# name_map, mod_map[MAX_MODS] and mod_ver[MAX_MODS]
+HEADER_SIZE = 8 + 8 + 8 + 8 + 16 + 16 * MAX_MODS + 4 * MAX_MODS
+# struct darshan_job: seven int64 fields followed by metadata[1024]
+JOB_STRUCT_SIZE = 7 * 8 + 1024
+
+ZLIB_COMP, BZIP2_COMP, NO_COMP = 0, 1, 2
+
+POSIX_COUNTERS = [
+    "POSIX_OPENS", "POSIX_FILENOS", "POSIX_DUPS", "POSIX_READS", "POSIX_WRITES",
+    "POSIX_SEEKS", "POSIX_STATS", "POSIX_MMAPS", "POSIX_FSYNCS", "POSIX_FDSYNCS",
+    "POSIX_RENAME_SOURCES", "POSIX_RENAME_TARGETS", "POSIX_RENAMED_FROM", "POSIX_MODE",
+    "POSIX_BYTES_READ", "POSIX_BYTES_WRITTEN", "POSIX_MAX_BYTE_READ",
+    "POSIX_MAX_BYTE_WRITTEN", "POSIX_CONSEC_READS", "POSIX_CONSEC_WRITES",
+    "POSIX_SEQ_READS", "POSIX_SEQ_WRITES", "POSIX_RW_SWITCHES", "POSIX_MEM_NOT_ALIGNED",
+    "POSIX_MEM_ALIGNMENT", "POSIX_FILE_NOT_ALIGNED", "POSIX_FILE_ALIGNMENT",
+    "POSIX_MAX_READ_TIME_SIZE", "POSIX_MAX_WRITE_TIME_SIZE", "POSIX_SIZE_READ_0_100",
+    "POSIX_SIZE_READ_100_1K", "POSIX_SIZE_READ_1K_10K", "POSIX_SIZE_READ_10K_100K",
+    "POSIX_SIZE_READ_100K_1M", "POSIX_SIZE_READ_1M_4M", "POSIX_SIZE_READ_4M_10M",
+    "POSIX_SIZE_READ_10M_100M", "POSIX_SIZE_READ_100M_1G", "POSIX_SIZE_READ_1G_PLUS",
+    "POSIX_SIZE_WRITE_0_100", "POSIX_SIZE_WRITE_100_1K", "POSIX_SIZE_WRITE_1K_10K",
+    "POSIX_SIZE_WRITE_10K_100K", "POSIX_SIZE_WRITE_100K_1M", "POSIX_SIZE_WRITE_1M_4M",
+    "POSIX_SIZE_WRITE_4M_10M", "POSIX_SIZE_WRITE_10M_100M", "POSIX_SIZE_WRITE_100M_1G",
+    "POSIX_SIZE_WRITE_1G_PLUS", "POSIX_STRIDE1_STRIDE", "POSIX_STRIDE2_STRIDE",
+    "POSIX_STRIDE3_STRIDE", "POSIX_STRIDE4_STRIDE", "POSIX_STRIDE1_COUNT",
+    "POSIX_STRIDE2_COUNT", "POSIX_STRIDE3_COUNT", "POSIX_STRIDE4_COUNT",
+    "POSIX_ACCESS1_ACCESS", "POSIX_ACCESS2_ACCESS", "POSIX_ACCESS3_ACCESS",
+    "POSIX_ACCESS4_ACCESS", "POSIX_ACCESS1_COUNT", "POSIX_ACCESS2_COUNT",
+    "POSIX_ACCESS3_COUNT", "POSIX_ACCESS4_COUNT", "POSIX_FASTEST_RANK",
+    "POSIX_FASTEST_RANK_BYTES", "POSIX_SLOWEST_RANK", "POSIX_SLOWEST_RANK_BYTES"
+]
+POSIX_FCOUNTERS = [
+    "POSIX_F_OPEN_START_TIMESTAMP", "POSIX_F_READ_START_TIMESTAMP",
+    "POSIX_F_WRITE_START_TIMESTAMP", "POSIX_F_CLOSE_START_TIMESTAMP",
+    "POSIX_F_OPEN_END_TIMESTAMP", "POSIX_F_READ_END_TIMESTAMP",
+    "POSIX_F_WRITE_END_TIMESTAMP", "POSIX_F_CLOSE_END_TIMESTAMP", "POSIX_F_READ_TIME",
+    "POSIX_F_WRITE_TIME", "POSIX_F_META_TIME", "POSIX_F_MAX_READ_TIME",
+    "POSIX_F_MAX_WRITE_TIME", "POSIX_F_FASTEST_RANK_TIME", "POSIX_F_SLOWEST_RANK_TIME",
+    "POSIX_F_VARIANCE_RANK_TIME", "POSIX_F_VARIANCE_RANK_BYTES"
+]
+MPIIO_COUNTERS = [
+    "MPIIO_INDEP_OPENS", "MPIIO_COLL_OPENS", "MPIIO_INDEP_READS", "MPIIO_INDEP_WRITES",
+    "MPIIO_COLL_READS", "MPIIO_COLL_WRITES", "MPIIO_SPLIT_READS", "MPIIO_SPLIT_WRITES",
+    "MPIIO_NB_READS", "MPIIO_NB_WRITES", "MPIIO_SYNCS", "MPIIO_HINTS", "MPIIO_VIEWS",
+    "MPIIO_MODE", "MPIIO_BYTES_READ", "MPIIO_BYTES_WRITTEN", "MPIIO_RW_SWITCHES",
+    "MPIIO_MAX_READ_TIME_SIZE", "MPIIO_MAX_WRITE_TIME_SIZE", "MPIIO_SIZE_READ_AGG_0_100",
+    "MPIIO_SIZE_READ_AGG_100_1K", "MPIIO_SIZE_READ_AGG_1K_10K",
+    "MPIIO_SIZE_READ_AGG_10K_100K", "MPIIO_SIZE_READ_AGG_100K_1M",
+    "MPIIO_SIZE_READ_AGG_1M_4M", "MPIIO_SIZE_READ_AGG_4M_10M",
+    "MPIIO_SIZE_READ_AGG_10M_100M", "MPIIO_SIZE_READ_AGG_100M_1G",
+    "MPIIO_SIZE_READ_AGG_1G_PLUS", "MPIIO_SIZE_WRITE_AGG_0_100",
+    "MPIIO_SIZE_WRITE_AGG_100_1K", "MPIIO_SIZE_WRITE_AGG_1K_10K",
+    "MPIIO_SIZE_WRITE_AGG_10K_100K", "MPIIO_SIZE_WRITE_AGG_100K_1M",
+    "MPIIO_SIZE_WRITE_AGG_1M_4M", "MPIIO_SIZE_WRITE_AGG_4M_10M",
+    "MPIIO_SIZE_WRITE_AGG_10M_100M", "MPIIO_SIZE_WRITE_AGG_100M_1G",
+    "MPIIO_SIZE_WRITE_AGG_1G_PLUS", "MPIIO_ACCESS1_ACCESS", "MPIIO_ACCESS2_ACCESS",
+    "MPIIO_ACCESS3_ACCESS", "MPIIO_ACCESS4_ACCESS", "MPIIO_ACCESS1_COUNT",
+    "MPIIO_ACCESS2_COUNT", "MPIIO_ACCESS3_COUNT", "MPIIO_ACCESS4_COUNT",
+    "MPIIO_FASTEST_RANK", "MPIIO_FASTEST_RANK_BYTES", "MPIIO_SLOWEST_RANK",
+    "MPIIO_SLOWEST_RANK_BYTES"
+]
+MPIIO_FCOUNTERS = [
+    "MPIIO_F_OPEN_START_TIMESTAMP", "MPIIO_F_READ_START_TIMESTAMP",
+    "MPIIO_F_WRITE_START_TIMESTAMP", "MPIIO_F_CLOSE_START_TIMESTAMP",
+    "MPIIO_F_OPEN_END_TIMESTAMP", "MPIIO_F_READ_END_TIMESTAMP",
+    "MPIIO_F_WRITE_END_TIMESTAMP", "MPIIO_F_CLOSE_END_TIMESTAMP", "MPIIO_F_READ_TIME",
+    "MPIIO_F_WRITE_TIME", "MPIIO_F_META_TIME", "MPIIO_F_MAX_READ_TIME",
+    "MPIIO_F_MAX_WRITE_TIME", "MPIIO_F_FASTEST_RANK_TIME", "MPIIO_F_SLOWEST_RANK_TIME",
+    "MPIIO_F_VARIANCE_RANK_TIME", "MPIIO_F_VARIANCE_RANK_BYTES"
+]
+STDIO_COUNTERS = [
+    "STDIO_OPENS", "STDIO_FDOPENS", "STDIO_READS", "STDIO_WRITES", "STDIO_SEEKS",
+    "STDIO_FLUSHES", "STDIO_BYTES_WRITTEN", "STDIO_BYTES_READ", "STDIO_MAX_BYTE_READ",
+    "STDIO_MAX_BYTE_WRITTEN", "STDIO_FASTEST_RANK", "STDIO_FASTEST_RANK_BYTES",
+    "STDIO_SLOWEST_RANK", "STDIO_SLOWEST_RANK_BYTES"
+]
+STDIO_FCOUNTERS = [
+    "STDIO_F_META_TIME", "STDIO_F_WRITE_TIME", "STDIO_F_READ_TIME",
+    "STDIO_F_OPEN_START_TIMESTAMP", "STDIO_F_CLOSE_START_TIMESTAMP",
+    "STDIO_F_WRITE_START_TIMESTAMP", "STDIO_F_READ_START_TIMESTAMP",
+    "STDIO_F_OPEN_END_TIMESTAMP", "STDIO_F_CLOSE_END_TIMESTAMP",
+    "STDIO_F_WRITE_END_TIMESTAMP", "STDIO_F_READ_END_TIMESTAMP",
+    "STDIO_F_FASTEST_RANK_TIME", "STDIO_F_SLOWEST_RANK_TIME", "STDIO_F_VARIANCE_RANK_TIME",
+    "STDIO_F_VARIANCE_RANK_BYTES"
+]
+H5F_COUNTERS = [
+    "H5F_OPENS", "H5F_FLUSHES", "H5F_USE_MPIIO"
+]
+H5F_FCOUNTERS = [
+    "H5F_F_OPEN_START_TIMESTAMP", "H5F_F_CLOSE_START_TIMESTAMP", "H5F_F_OPEN_END_TIMESTAMP",
+    "H5F_F_CLOSE_END_TIMESTAMP", "H5F_F_META_TIME"
+]
+H5D_COUNTERS = [
+    "H5D_OPENS", "H5D_READS", "H5D_WRITES", "H5D_FLUSHES", "H5D_BYTES_READ",
+    "H5D_BYTES_WRITTEN", "H5D_RW_SWITCHES", "H5D_REGULAR_HYPERSLAB_SELECTS",
+    "H5D_IRREGULAR_HYPERSLAB_SELECTS", "H5D_POINT_SELECTS", "H5D_MAX_READ_TIME_SIZE",
+    "H5D_MAX_WRITE_TIME_SIZE", "H5D_SIZE_READ_AGG_0_100", "H5D_SIZE_READ_AGG_100_1K",
+    "H5D_SIZE_READ_AGG_1K_10K", "H5D_SIZE_READ_AGG_10K_100K", "H5D_SIZE_READ_AGG_100K_1M",
+    "H5D_SIZE_READ_AGG_1M_4M", "H5D_SIZE_READ_AGG_4M_10M", "H5D_SIZE_READ_AGG_10M_100M",
+    "H5D_SIZE_READ_AGG_100M_1G", "H5D_SIZE_READ_AGG_1G_PLUS", "H5D_SIZE_WRITE_AGG_0_100",
+    "H5D_SIZE_WRITE_AGG_100_1K", "H5D_SIZE_WRITE_AGG_1K_10K", "H5D_SIZE_WRITE_AGG_10K_100K",
+    "H5D_SIZE_WRITE_AGG_100K_1M", "H5D_SIZE_WRITE_AGG_1M_4M", "H5D_SIZE_WRITE_AGG_4M_10M",
+    "H5D_SIZE_WRITE_AGG_10M_100M", "H5D_SIZE_WRITE_AGG_100M_1G",
+    "H5D_SIZE_WRITE_AGG_1G_PLUS", "H5D_ACCESS1_ACCESS", "H5D_ACCESS1_LENGTH_D1",
+    "H5D_ACCESS1_LENGTH_D2", "H5D_ACCESS1_LENGTH_D3", "H5D_ACCESS1_LENGTH_D4",
+    "H5D_ACCESS1_LENGTH_D5", "H5D_ACCESS1_STRIDE_D1", "H5D_ACCESS1_STRIDE_D2",
+    "H5D_ACCESS1_STRIDE_D3", "H5D_ACCESS1_STRIDE_D4", "H5D_ACCESS1_STRIDE_D5",
+    "H5D_ACCESS2_ACCESS", "H5D_ACCESS2_LENGTH_D1", "H5D_ACCESS2_LENGTH_D2",
+    "H5D_ACCESS2_LENGTH_D3", "H5D_ACCESS2_LENGTH_D4", "H5D_ACCESS2_LENGTH_D5",
+    "H5D_ACCESS2_STRIDE_D1", "H5D_ACCESS2_STRIDE_D2", "H5D_ACCESS2_STRIDE_D3",
+    "H5D_ACCESS2_STRIDE_D4", "H5D_ACCESS2_STRIDE_D5", "H5D_ACCESS3_ACCESS",
+    "H5D_ACCESS3_LENGTH_D1", "H5D_ACCESS3_LENGTH_D2", "H5D_ACCESS3_LENGTH_D3",
+    "H5D_ACCESS3_LENGTH_D4", "H5D_ACCESS3_LENGTH_D5", "H5D_ACCESS3_STRIDE_D1",
+    "H5D_ACCESS3_STRIDE_D2", "H5D_ACCESS3_STRIDE_D3", "H5D_ACCESS3_STRIDE_D4",
+    "H5D_ACCESS3_STRIDE_D5", "H5D_ACCESS4_ACCESS", "H5D_ACCESS4_LENGTH_D1",
+    "H5D_ACCESS4_LENGTH_D2", "H5D_ACCESS4_LENGTH_D3", "H5D_ACCESS4_LENGTH_D4",
+    "H5D_ACCESS4_LENGTH_D5", "H5D_ACCESS4_STRIDE_D1", "H5D_ACCESS4_STRIDE_D2",
+    "H5D_ACCESS4_STRIDE_D3", "H5D_ACCESS4_STRIDE_D4", "H5D_ACCESS4_STRIDE_D5",
+    "H5D_ACCESS1_COUNT", "H5D_ACCESS2_COUNT", "H5D_ACCESS3_COUNT", "H5D_ACCESS4_COUNT",
+    "H5D_DATASPACE_NDIMS", "H5D_DATASPACE_NPOINTS", "H5D_DATATYPE_SIZE",
+    "H5D_CHUNK_SIZE_D1", "H5D_CHUNK_SIZE_D2", "H5D_CHUNK_SIZE_D3", "H5D_CHUNK_SIZE_D4",
+    "H5D_CHUNK_SIZE_D5", "H5D_USE_MPIIO_COLLECTIVE", "H5D_USE_DEPRECATED",
+    "H5D_FASTEST_RANK", "H5D_FASTEST_RANK_BYTES", "H5D_SLOWEST_RANK",
+    "H5D_SLOWEST_RANK_BYTES"
+]
+H5D_FCOUNTERS = [
+    "H5D_F_OPEN_START_TIMESTAMP", "H5D_F_READ_START_TIMESTAMP",
+    "H5D_F_WRITE_START_TIMESTAMP", "H5D_F_CLOSE_START_TIMESTAMP",
+    "H5D_F_OPEN_END_TIMESTAMP", "H5D_F_READ_END_TIMESTAMP", "H5D_F_WRITE_END_TIMESTAMP",
+    "H5D_F_CLOSE_END_TIMESTAMP", "H5D_F_READ_TIME", "H5D_F_WRITE_TIME", "H5D_F_META_TIME",
+    "H5D_F_MAX_READ_TIME", "H5D_F_MAX_WRITE_TIME", "H5D_F_FASTEST_RANK_TIME",
+    "H5D_F_SLOWEST_RANK_TIME", "H5D_F_VARIANCE_RANK_TIME", "H5D_F_VARIANCE_RANK_BYTES"
+]
+
+# LUSTRE module version 1 (darshan 3.4.x): fixed counters followed by
+# LUSTRE_STRIPE_WIDTH trailing OST ids
+LUSTRE_COUNTERS = [
+    "LUSTRE_OSTS", "LUSTRE_MDTS", "LUSTRE_STRIPE_OFFSET", "LUSTRE_STRIPE_SIZE",
+    "LUSTRE_STRIPE_WIDTH",
+]
+
+# module name (as printed by darshan-parser) -> (module id, supported record
+# version, counter names, fcounter names)
+MODULES = {
+    "POSIX": (1, 4, POSIX_COUNTERS, POSIX_FCOUNTERS),
+    "MPI-IO": (2, 3, MPIIO_COUNTERS, MPIIO_FCOUNTERS),
+    "H5F": (3, 3, H5F_COUNTERS, H5F_FCOUNTERS),
+    "H5D": (4, 3, H5D_COUNTERS, H5D_FCOUNTERS),
+    "LUSTRE": (8, 1, LUSTRE_COUNTERS, []),
+    "STDIO": (9, 2, STDIO_COUNTERS, STDIO_FCOUNTERS),
+}
+
+
+class DarshanLogError(Exception):
+    """Raised when a log is truncated, corrupt or in an unsupported format."""
+
+
+def _inflate(buf, comp_type):
+    """Decompress a log region; regions may hold several back-to-back streams."""
+    if comp_type == NO_COMP:
+        return buf
+    if comp_type not in (ZLIB_COMP, BZIP2_COMP):
+        raise DarshanLogError(f"unknown compression type {comp_type}")
+    out = []
+    while buf:
+        d = zlib.decompressobj() if comp_type == ZLIB_COMP else bz2.BZ2Decompressor()
+        try:
+            out.append(d.decompress(buf))
+        except (zlib.error, OSError) as e:
+            raise DarshanLogError(f"corrupt compressed region: {e}")
+        if not d.eof:
+            raise DarshanLogError("truncated compressed region")
+        buf = d.unused_data
+    return b"".join(out)
+
+
+def _read_header(raw):
+    if len(raw) < HEADER_SIZE:
+        raise DarshanLogError("file too short for a darshan header")
+    version = raw[:8].split(b"\0", 1)[0].decode("ascii", "replace")
+    for bo in "<>":
+        if struct.unpack_from(bo + "q", raw, 8)[0] == MAGIC_NR:
+            break
+    else:
+        raise DarshanLogError("bad magic number; not a darshan log")
+    if version != LOG_VERSION:
+        raise DarshanLogError(f"unsupported log version {version} (expected {LOG_VERSION})")
+
+    comp_type = raw[16]
+    partial_flag = struct.unpack_from(bo + "Q", raw, 24)[0]
+    name_map = struct.unpack_from(bo + "QQ", raw, 32)
+    maps = struct.unpack_from(bo + "%dQ" % (2 * MAX_MODS), raw, 48)
+    vers = struct.unpack_from(bo + "%dI" % MAX_MODS, raw, 48 + 16 * MAX_MODS)
+    mod_map = {i: (maps[2 * i], maps[2 * i + 1], vers[i])
+               for i in range(MAX_MODS) if maps[2 * i + 1] > 0}
+    return {
+        "version": version,
+        "byteorder": bo,
+        "comp_type": comp_type,
+        "partial_flag": partial_flag,
+        "name_map": name_map,
+        "mod_map": mod_map,
+    }
+
+
+def _read_job(buf, bo):
+    if len(buf) < JOB_STRUCT_SIZE:
+        raise DarshanLogError("truncated job record")
+    uid, s_sec, s_nsec, e_sec, e_nsec, nprocs, jobid = struct.unpack_from(bo + "7q", buf, 0)
+    meta_raw = buf[56:JOB_STRUCT_SIZE].split(b"\0", 1)[0].decode("utf-8", "replace")
+    metadata = {}
+    for kv in meta_raw.splitlines():
+        if "=" in kv:
+            k, v = kv.split("=", 1)
+            metadata[k] = v
+
+    # the exe string and mount table trail the job struct, newline separated
+    lines = buf[JOB_STRUCT_SIZE:].split(b"\0", 1)[0].decode("utf-8", "replace").split("\n")
+    exe = lines[0]
+    mounts = []
+    for ln in lines[1:]:
+        if "\t" in ln:
+            fs_type, mnt_pt = ln.split("\t", 1)
+            mounts.append((mnt_pt, fs_type))
+
+    job = {
+        "uid": uid,
+        "jobid": jobid,
+        "nprocs": nprocs,
+        "start_time": s_sec + s_nsec / 1e9,
+        "end_time": e_sec + e_nsec / 1e9,
+        "run_time": (e_sec - s_sec) + (e_nsec - s_nsec) / 1e9,
+        "metadata": metadata,
+    }
+    return job, exe, mounts
+
+
+def _read_names(buf, bo):
+    """Name table entries are a u64 record id followed by a NUL-terminated path."""
+    names = {}
+    pos, end = 0, len(buf)
+    fmt = bo + "Q"
+    while pos + 8 < end:
+        rec_id = struct.unpack_from(fmt, buf, pos)[0]
+        stop = buf.find(b"\0", pos + 8)
+        if stop < 0:
+            raise DarshanLogError("truncated name record")
+        names[rec_id] = buf[pos + 8:stop].decode("utf-8", "replace")
+        pos = stop + 1
+    return names
+
+
+def _record_dtype(name, bo):
+    _, _, cnames, fnames = MODULES[name]
+    fields = [("id", bo + "u8"), ("rank", bo + "i8")]
+    if name == "H5D":
+        fields.append(("file_rec_id", bo + "u8"))
+    fields.append(("counters", bo + "i8", (len(cnames),)))
+    if fnames:
+        fields.append(("fcounters", bo + "f8", (len(fnames),)))
+    return np.dtype(fields)
+
+
+def _read_lustre(buf, bo):
+    """LUSTRE records are variable length: one OST id per stripe follows the counters."""
+    ncnt = len(LUSTRE_COUNTERS)
+    width_idx = LUSTRE_COUNTERS.index("LUSTRE_STRIPE_WIDTH")
+    fixed = struct.Struct(bo + "Qq%dq" % ncnt)
+    ids, ranks, counters, ost_ids = [], [], [], []
+    pos, end = 0, len(buf)
+    while pos < end:
+        if pos + fixed.size > end:
+            raise DarshanLogError("truncated LUSTRE record")
+        vals = fixed.unpack_from(buf, pos)
+        cnts = vals[2:]
+        # the C struct always reserves room for at least one OST id
+        nost = max(cnts[width_idx], 1)
+        pos += fixed.size
+        ost_ids.append(np.frombuffer(buf, bo + "i8", cnts[width_idx], pos) if cnts[width_idx] > 0
+                       else np.zeros(0, dtype=np.int64))
+        pos += 8 * nost
+        ids.append(vals[0])
+        ranks.append(vals[1])
+        counters.append(cnts)
+    return {
+        "id": np.array(ids, dtype=np.uint64),
+        "rank": np.array(ranks, dtype=np.int64),
+        "counters": np.array(counters, dtype=np.int64).reshape(-1, ncnt),
+        "fcounters": np.zeros((len(ids), 0)),
+        "ost_ids": ost_ids,
+    }
+
+
+def _read_module(name, buf, version, bo):
+    _, want_ver, cnames, fnames = MODULES[name]
+    if version != want_ver:
+        raise DarshanLogError(f"unsupported {name} module version {version} (expected {want_ver})")
+    if name == "LUSTRE":
+        mod = _read_lustre(buf, bo)
+    else:
+        dtype = _record_dtype(name, bo)
+        if len(buf) % dtype.itemsize:
+            raise DarshanLogError(f"{name} region is not a whole number of records")
+        recs = np.frombuffer(buf, dtype=dtype)
+        mod = {
+            "id": recs["id"],
+            "rank": recs["rank"],
+            "counters": recs["counters"],
+            "fcounters": recs["fcounters"] if fnames else np.zeros((len(recs), 0)),
+        }
+        if name == "H5D":
+            mod["file_rec_id"] = recs["file_rec_id"]
+    mod["counter_names"] = cnames
+    mod["fcounter_names"] = fnames
+    return mod
+
+
+def read_log(path, modules=None):
+    """Decode a .darshan log.
+
+    modules restricts decoding to the given module names (see MODULES); by
+    default every supported module present in the log is decoded. Returns a
+    dict with version, job, exe, mounts, names (record id -> path), partial
+    and modules (name -> dict of id/rank/counters/fcounters arrays and the
+    matching counter_names/fcounter_names).
+    """
+    with open(path, "rb") as f:
+        raw = f.read()
+    hdr = _read_header(raw)
+    bo = hdr["byteorder"]
+    comp = hdr["comp_type"]
+
+    name_off, name_len = hdr["name_map"]
+    job_buf = _inflate(raw[HEADER_SIZE:name_off], comp)
+    job, exe, mounts = _read_job(job_buf, bo)
+    names = _read_names(_inflate(raw[name_off:name_off + name_len], comp), bo)
+
+    wanted = MODULES.keys() if modules is None else modules
+    decoded = {}
+    for name in wanted:
+        if name not in MODULES:
+            raise ValueError(f"unknown module {name!r}; expected one of {list(MODULES)}")
+        mod_id = MODULES[name][0]
+        if mod_id not in hdr["mod_map"]:
+            continue
+        off, length, version = hdr["mod_map"][mod_id]
+        if off + length > len(raw):
+            raise DarshanLogError(f"{name} region runs past end of file")
+        decoded[name] = _read_module(name, _inflate(raw[off:off + length], comp), version, bo)
+
+    return {
+        "version": hdr["version"],
+        "job": job,
+        "exe": exe,
+        "mounts": mounts,
+        "names": names,
+        "partial": hdr["partial_flag"] != 0,
+        "modules": decoded,
+    }
+
+
+def iter_counters(log, module):
+    """Yield (rank, record id, counter name, value) for every counter of module,
+    in the same order darshan-parser prints them."""
+    mod = log["modules"].get(module)
+    if mod is None:
+        return
+    cnames, fnames = mod["counter_names"], mod["fcounter_names"]
+    counters = mod["counters"].tolist()
+    fcounters = mod["fcounters"].tolist()
+    for i, (rec_id, rank) in enumerate(zip(mod["id"].tolist(), mod["rank"].tolist())):
+        for name, value in zip(cnames, counters[i]):
+            yield rank, rec_id, name, value
+        for name, value in zip(fnames, fcounters[i]):
+            yield rank, rec_id, name, value
+
+
+def _mount_for(path, mounts):
+    """Longest mount point that prefixes path, as darshan-parser reports it."""
+    best = None
+    for mnt_pt, fs_type in mounts:
+        if path.startswith(mnt_pt) and (best is None or len(mnt_pt) > len(best[0])):
+            best = (mnt_pt, fs_type)
+    return best or ("UNKNOWN", "UNKNOWN")
+
+
+def main():
+    p = argparse.ArgumentParser(
+        description="Print counters of a .darshan log in darshan-parser's record format"
+    )
+    p.add_argument("log_file", help="Path to the .darshan log")
+    p.add_argument("--module", action="append", choices=list(MODULES),
+                   help="Module(s) to print (default: all supported)")
+    args = p.parse_args()
+
+    if not os.path.exists(args.log_file):
+        print(f"Error: Darshan log file not found: {args.log_file}")
+        sys.exit(1)
+    try:
+        log = read_log(args.log_file, args.module)
+    except DarshanLogError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    job = log["job"]
+    print(f"# darshan log version: {log['version']}")
+    print(f"# exe: {log['exe']}")
+    print(f"# jobid: {job['jobid']}")
+    print(f"# nprocs: {job['nprocs']}")
+    print(f"# run time: {job['run_time']:.4f}")
+    for module in log["modules"]:
+        print(f"\n# {module} module data")
+        for rank, rec_id, name, value in iter_counters(log, module):
+            path = log["names"].get(rec_id, "")
+            mnt_pt, fs_type = _mount_for(path, log["mounts"])
+            fmt = f"{value:f}" if isinstance(value, float) else str(value)
+            print(f"{module}\t{rank}\t{rec_id}\t{name}\t{fmt}\t{path}\t{mnt_pt}\t{fs_type}")
+
+
+if __name__ == "__main__":
+    main()
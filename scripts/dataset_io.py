@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+Read and write counter datasets as CSV or typed columnar files.
+
+The format is chosen from the file extension:
+  .csv                 plain text (the historical format)
+  .parquet             Parquet with per-row-group column statistics
+  .feather / .arrow    Arrow IPC, which can be memory-mapped on read
+  .npz                 sparse CSR counters (see sparse_counters), NumPy only
+Columnar output stores counters as int64/float64 and test_id as a
+categorical, so downstream stages skip float parsing and can load only
+the columns they need. Columnar formats require pyarrow.
+iter_table and TableWriter stream a dataset in row chunks, for files too
+large to hold in memory. With compact=True every column is stored in the
+narrowest dtype that holds it (see compact_frame).
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from sparse_counters import SparseCounters, SPARSE_EXTS
+
+PARQUET_EXTS = (".parquet", ".pq")
+ARROW_EXTS = (".feather", ".arrow")
+# every extension read_table understands
+TABLE_EXTS = (".csv",) + PARQUET_EXTS + ARROW_EXTS + SPARSE_EXTS
+CATEGORICAL_COLS = ["test_id"]
+
+# rows per Parquet row group; each group carries its own min/max statistics
+ROW_GROUP_SIZE = 64 * 1024
+
+
+def table_format(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext in PARQUET_EXTS:
+        return "parquet"
+    if ext in ARROW_EXTS:
+        return "arrow"
+    if ext in SPARSE_EXTS:
+        return "sparse"
+    return "csv"
+
+
+def _require_pyarrow(path):
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise RuntimeError(f"writing or reading {path} needs pyarrow (pip install pyarrow)")
+
+
+def typed_frame(df, int_columns=()):
+    """Return df with int64/float64 counters and categorical label columns.
+
+    Float columns stay float64 unless listed in int_columns, which callers
+    use for raw counters they know to be whole numbers.
+    """
+    out = df.copy()
+    for col in out.columns:
+        s = out[col]
+        if col in CATEGORICAL_COLS:
+            out[col] = s.astype("category")
+        elif col in int_columns or pd.api.types.is_integer_dtype(s):
+            out[col] = s.astype(np.int64)
+        elif pd.api.types.is_float_dtype(s):
+            out[col] = s.astype(np.float64)
+    return out
+
+
+def _narrowest_int(values):
+    """Smallest integer dtype (unsigned if possible) holding every value, or None."""
+    lo, hi = values.min(), values.max()
+    for bits in (8, 16, 32, 64):
+        for dtype in ((np.dtype(f"uint{bits}"),) if lo >= 0 else ()) + (np.dtype(f"int{bits}"),):
+            info = np.iinfo(dtype)
+            if info.min <= lo and hi <= info.max:
+                return dtype
+    return None
+
+
+def compact_frame(df, integers=True):
+    """Return df with every column in the narrowest dtype that holds it.
+
+    Numeric columns whose values are all whole numbers become the smallest
+    integer type covering their range, which is exact. Other float columns
+    become float32 (about 7 significant digits, plenty for normalized
+    features). Label columns become categoricals. With integers=False,
+    float columns are never turned into integers, so chunks written
+    separately share one schema even if a column is whole in some of them.
+    """
+    out = df.copy()
+    for col in out.columns:
+        s = out[col]
+        if col in CATEGORICAL_COLS or (s.dtype == object and s.nunique() <= len(s) // 2):
+            out[col] = s.astype("category")
+            continue
+        if pd.api.types.is_bool_dtype(s) or not pd.api.types.is_numeric_dtype(s) or len(s) == 0:
+            continue
+        if not integers:
+            if pd.api.types.is_float_dtype(s):
+                out[col] = s.astype(np.float32)
+            continue
+        values = s.to_numpy()
+        if pd.api.types.is_integer_dtype(s) or (
+                np.isfinite(values).all() and (values == np.floor(values)).all()):
+            dtype = _narrowest_int(values)
+            if dtype is not None:
+                out[col] = s.astype(dtype)
+                continue
+        if pd.api.types.is_float_dtype(s):
+            out[col] = s.astype(np.float32)
+    return out
+
+
+def write_table(df, path, index=False, int_columns=(), compact=False):
+    """Write df to path in the format implied by its extension.
+
+    int_columns only affects columnar output; CSV is written exactly as
+    pandas formats df. compact stores each column in its narrowest dtype,
+    which columnar formats keep on reload. Sparse .npz output keeps only
+    the non-zero counters and ignores int_columns and compact.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    fmt = table_format(path)
+    if fmt == "sparse":
+        SparseCounters.from_frame(df.reset_index(drop=True)).save(path)
+        return
+    if compact:
+        df = compact_frame(df)
+    if fmt == "csv":
+        df.to_csv(path, index=index)
+        return
+    _require_pyarrow(path)
+    df = df if index else df.reset_index(drop=True)
+    if not compact:
+        df = typed_frame(df, int_columns)
+    if fmt == "parquet":
+        df.to_parquet(path, engine="pyarrow", index=index,
+                      row_group_size=ROW_GROUP_SIZE, write_statistics=True)
+    else:
+        # uncompressed so the file can be memory-mapped without decoding
+        df.to_feather(path, compression="uncompressed")
+
+
+def read_table(path, columns=None, memory_map=False, compact=False):
+    """Load a dataset written by write_table (or any CSV).
+
+    columns restricts the load to the named columns; with columnar formats
+    the other columns are never read from disk. memory_map maps the file
+    instead of reading it into memory, which for Arrow IPC files makes the
+    load zero-copy. compact downcasts a CSV after parsing; columnar files
+    already carry the dtypes they were written with.
+    """
+    fmt = table_format(path)
+    if fmt == "csv":
+        df = pd.read_csv(path, usecols=columns)
+        return compact_frame(df) if compact else df
+    if fmt == "sparse":
+        df = SparseCounters.load(path).to_frame()
+        df = df if columns is None else df[list(columns)]
+        return compact_frame(df) if compact else df
+    _require_pyarrow(path)
+    if fmt == "parquet":
+        return pd.read_parquet(path, engine="pyarrow", columns=columns, memory_map=memory_map)
+    import pyarrow.feather as feather
+    return feather.read_table(path, columns=columns, memory_map=memory_map).to_pandas()
+
+
+def iter_table(path, chunksize, columns=None):
+    """Yield the dataset at path as DataFrames of at most chunksize rows.
+
+    CSV is parsed incrementally, Parquet is read batch by batch and Arrow
+    IPC files are memory-mapped and sliced, so only one chunk is ever
+    materialized as a DataFrame.
+    """
+    fmt = table_format(path)
+    if fmt == "csv":
+        yield from pd.read_csv(path, usecols=columns, chunksize=chunksize)
+        return
+    if fmt == "sparse":
+        sp = SparseCounters.load(path)
+        for start in range(0, len(sp), chunksize):
+            df = sp.slice(start, start + chunksize).to_frame()
+            yield df if columns is None else df[list(columns)]
+        return
+    _require_pyarrow(path)
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+        return
+    import pyarrow.feather as feather
+    table = feather.read_table(path, columns=columns, memory_map=True)
+    for start in range(0, table.num_rows, chunksize):
+        yield table.slice(start, chunksize).to_pandas()
+
+
+def read_sparse(path):
+    """Load the dataset at path as SparseCounters, converting dense formats on the fly."""
+    if table_format(path) == "sparse":
+        return SparseCounters.load(path)
+    return SparseCounters.from_frame(read_table(path))
+
+
+def is_sparse(path):
+    return table_format(path) == "sparse"
+
+
+def write_sparse(sp, path, compact=False):
+    """Write SparseCounters to path: as is for .npz, densified for every other format."""
+    if table_format(path) == "sparse":
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        sp.save(path)
+        return
+    write_table(sp.to_frame(), path, int_columns=sp.int_columns, compact=compact)
+
+
+class TableWriter:
+    """Write a dataset chunk by chunk; the result reads back like one write_table call.
+
+    CSV chunks are appended with a single header. Parquet chunks become row
+    groups of one file. Arrow IPC cannot change a column's dictionary between
+    batches, so in .feather/.arrow output the categorical columns are stored
+    as plain strings. Sparse .npz chunks are kept in CSR form and written
+    as one file on close.
+    """
+
+    def __init__(self, path, int_columns=(), compact=False):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.fmt = table_format(path)
+        self.int_columns = int_columns
+        self.compact = compact
+        self._writer = None
+        self._schema = None
+        self._header = True
+        self._parts = []
+        if self.fmt not in ("csv", "sparse"):
+            _require_pyarrow(path)
+
+    def write(self, df):
+        if self.fmt == "sparse":
+            self._parts.append(SparseCounters.from_frame(df.reset_index(drop=True)))
+            return
+        if self.compact:
+            df = compact_frame(df, integers=False)
+        if self.fmt == "csv":
+            df.to_csv(self.path, index=False, mode="w" if self._header else "a",
+                      header=self._header)
+            self._header = False
+            return
+        import pyarrow as pa
+        df = df.reset_index(drop=True)
+        if not self.compact:
+            df = typed_frame(df, self.int_columns)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if self._schema is None:
+            self._schema = self._chunk_schema(table.schema)
+            if self.fmt == "parquet":
+                import pyarrow.parquet as pq
+                self._writer = pq.ParquetWriter(self.path, self._schema, write_statistics=True)
+            else:
+                self._writer = pa.ipc.new_file(
+                    self.path, self._schema,
+                    options=pa.ipc.IpcWriteOptions(compression=None))
+        table = table.cast(self._schema)
+        if self.fmt == "parquet":
+            self._writer.write_table(table, row_group_size=ROW_GROUP_SIZE)
+        else:
+            self._writer.write_table(table)
+
+    def _chunk_schema(self, schema):
+        """Fix dictionary index widths (or drop dictionaries for IPC) so every chunk casts to one schema."""
+        import pyarrow as pa
+        fields = []
+        for field in schema:
+            if pa.types.is_dictionary(field.type):
+                if self.fmt == "parquet":
+                    field = field.with_type(pa.dictionary(pa.int32(), field.type.value_type))
+                else:
+                    field = field.with_type(field.type.value_type)
+            fields.append(field)
+        # pandas metadata records the first chunk's categories; drop it so
+        # readers rebuild categoricals from the data itself
+        return pa.schema(fields)
+
+    def close(self):
+        if self.fmt == "sparse":
+            if self._parts:
+                SparseCounters.vstack(self._parts).save(self.path)
+                self._parts = []
+            return
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        elif self._header and self.fmt == "csv":
+            # no chunks at all: still leave an (empty) file behind
+            open(self.path, "w").close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+Content-addressed store for parsed datasets and their derived transforms.
+
+Every dataset is stored once, gzip-compressed, under the SHA-256 of its
+bytes; names such as "6-29-V5" are just references to a hash, so identical
+copies cost nothing. A derived dataset (a normalization chain, the
+sorted-by-tag view, ...) is keyed by the hash of its input plus the
+transform name and parameters, and is computed only the first time it is
+asked for; later requests are served from the store. Layout:
+  STORE/objects/ab/abcdef....csv.gz    one file per distinct dataset
+  STORE/catalog.json                   names, derivations and object sizes
+Usage:
+  python dataset_store.py import data/darshan_csv
+  python dataset_store.py put parsed.csv --name 7-8-V1
+  python dataset_store.py get darshan_csv/darshan_parsed_output_6-29-V5 --stages log10,log10_tag,l2 -o norm.csv
+  python dataset_store.py ls
+  python dataset_store.py gc
+"""
+import argparse
+import gzip
+import hashlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+import pandas as pd
+
+from dataset_io import read_table, write_table, table_format
+from normalize_pipeline import DEFAULT_STAGES, parse_stages, run_pipeline
+
+DEFAULT_STORE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "store")
+CATALOG_VERSION = 1
+
+# bump when a transform's output changes, so stale derivations are recomputed
+TRANSFORM_VERSION = 1
+
+
+def _sort_by_tag(df):
+    # the view sort_by_tag.py writes
+    return df.sort_values(by="tag", ascending=True)[["test_id", "tag"]]
+
+
+def _pipeline(df, stages=DEFAULT_STAGES, tag_target_max=4.0):
+    return run_pipeline(df, list(stages), tag_target_max)
+
+
+TRANSFORMS = {
+    "pipeline": _pipeline,
+    "sort_by_tag": _sort_by_tag,
+}
+
+
+def file_digest(path, chunk=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def derivation_key(input_hash, transform, params):
+    spec = {"input": input_hash, "transform": transform, "params": params,
+            "version": TRANSFORM_VERSION}
+    return hashlib.sha256(json.dumps(spec, sort_keys=True).encode()).hexdigest()
+
+
+class DatasetStore:
+    """A directory of content-addressed dataset objects plus a JSON catalog."""
+
+    def __init__(self, root=DEFAULT_STORE):
+        self.root = root
+        self.catalog_path = os.path.join(root, "catalog.json")
+        if os.path.exists(self.catalog_path):
+            with open(self.catalog_path) as f:
+                self.catalog = json.load(f)
+            if self.catalog.get("version") != CATALOG_VERSION:
+                raise ValueError(f"{self.catalog_path}: unsupported catalog version "
+                                 f"{self.catalog.get('version')}")
+        else:
+            self.catalog = {"version": CATALOG_VERSION, "names": {}, "derived": {}, "objects": {}}
+
+    # -- objects ----------------------------------------------------------
+
+    def object_path(self, digest):
+        return os.path.join(self.root, "objects", digest[:2], digest + ".csv.gz")
+
+    def _save_catalog(self):
+        os.makedirs(self.root, exist_ok=True)
+        tmp = self.catalog_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.catalog, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.catalog_path)
+
+    def _add_object(self, digest, src, size, rows, source):
+        """Compress src (an open binary file) into the store unless digest is already there."""
+        path = self.object_path(digest)
+        if digest not in self.catalog["objects"] or not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) as gz:
+                shutil.copyfileobj(src, gz)
+            os.replace(tmp, path)
+            self.catalog["objects"][digest] = {
+                "size": size, "stored": os.path.getsize(path), "rows": rows, "source": source,
+            }
+            return True
+        return False
+
+    def put(self, path, name=None):
+        """Add the dataset file at path; returns (digest, added).
+
+        CSV files are stored byte for byte; other formats are converted to
+        CSV first, so a dataset hashes the same whatever format it came in.
+        """
+        if table_format(path) == "csv":
+            digest = file_digest(path)
+            with open(path, "rb") as f:
+                rows = max(sum(1 for _ in f) - 1, 0)
+                f.seek(0)
+                added = self._add_object(digest, f, os.path.getsize(path), rows,
+                                         os.path.relpath(path))
+        else:
+            digest, added = self.put_frame(read_table(path), source=os.path.relpath(path),
+                                           save=False)
+        if name:
+            self.catalog["names"][name] = digest
+        self._save_catalog()
+        return digest, added
+
+    def put_frame(self, df, name=None, source=None, save=True):
+        data = df.to_csv(index=False).encode()
+        digest = hashlib.sha256(data).hexdigest()
+        added = self._add_object(digest, io.BytesIO(data), len(data), len(df), source)
+        if name:
+            self.catalog["names"][name] = digest
+        if save:
+            self._save_catalog()
+        return digest, added
+
+    def resolve(self, ref):
+        """Digest for a name, a full digest or a unique digest prefix (>= 6 characters)."""
+        if ref in self.catalog["names"]:
+            return self.catalog["names"][ref]
+        if ref in self.catalog["objects"]:
+            return ref
+        matches = [d for d in self.catalog["objects"] if len(ref) >= 6 and d.startswith(ref)]
+        if len(matches) == 1:
+            return matches[0]
+        raise KeyError(f"{ref!r} is not a stored name or digest"
+                       + (" (ambiguous prefix)" if matches else ""))
+
+    def load(self, ref):
+        return pd.read_csv(self.object_path(self.resolve(ref)))
+
+    def export(self, ref, path):
+        """Write a stored dataset to path; .csv gets the original bytes back."""
+        digest = self.resolve(ref)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if table_format(path) == "csv":
+            with gzip.open(self.object_path(digest), "rb") as src, open(path, "wb") as dst:
+                shutil.copyfileobj(src, dst)
+        else:
+            write_table(self.load(digest), path)
+
+    # -- derived datasets -------------------------------------------------
+
+    def derive(self, ref, transform, **params):
+        """Digest of transform(ref, **params), computing and storing it only if missing.
+
+        Returns (digest, cached).
+        """
+        if transform not in TRANSFORMS:
+            raise ValueError(f"unknown transform {transform!r}; expected one of {list(TRANSFORMS)}")
+        source = self.resolve(ref)
+        key = derivation_key(source, transform, params)
+        digest = self.catalog["derived"].get(key, {}).get("output")
+        if digest and os.path.exists(self.object_path(digest)):
+            return digest, True
+        out = TRANSFORMS[transform](self.load(source), **params)
+        digest, _ = self.put_frame(out, source=f"{transform}({source[:12]})", save=False)
+        self.catalog["derived"][key] = {"input": source, "transform": transform,
+                                        "params": params, "output": digest}
+        self._save_catalog()
+        return digest, False
+
+    # -- housekeeping -----------------------------------------------------
+
+    def gc(self):
+        """Drop objects no name reaches, directly or through derivations; returns bytes freed."""
+        live = set(self.catalog["names"].values())
+        derived = self.catalog["derived"]
+        changed = True
+        while changed:
+            changed = False
+            for entry in derived.values():
+                if entry["input"] in live and entry["output"] not in live:
+                    live.add(entry["output"])
+                    changed = True
+        freed = 0
+        for digest in list(self.catalog["objects"]):
+            if digest not in live:
+                path = self.object_path(digest)
+                if os.path.exists(path):
+                    freed += os.path.getsize(path)
+                    os.remove(path)
+                del self.catalog["objects"][digest]
+        self.catalog["derived"] = {k: e for k, e in derived.items()
+                                   if e["input"] in live and e["output"] in live}
+        self._save_catalog()
+        return freed
+
+    def usage(self):
+        """(bytes the catalogued files would take as plain copies, bytes actually stored)."""
+        objects = self.catalog["objects"]
+        logical = sum(objects[d]["size"] for d in self.catalog["names"].values() if d in objects)
+        stored = sum(o["stored"] for o in objects.values())
+        return logical, stored
+
+
+def _transform_args(args):
+    if args.sort_by_tag:
+        return "sort_by_tag", {}
+    if args.stages:
+        return "pipeline", {"stages": parse_stages(args.stages),
+                            "tag_target_max": args.tag_target_max}
+    return None, None
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Content-addressed store for counter datasets and derived transforms"
+    )
+    parser.add_argument("--store", default=DEFAULT_STORE,
+                        help="Store directory (default: data/store in the repo)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("put", help="Add a dataset file")
+    p.add_argument("path")
+    p.add_argument("--name", default=None, help="Reference name (default: the file name)")
+
+    p = sub.add_parser("import", help="Add every .csv under the given directories")
+    p.add_argument("dirs", nargs="+")
+
+    p = sub.add_parser("get", help="Export a dataset, or a derived transform of it")
+    p.add_argument("ref", help="Name or digest (prefix)")
+    p.add_argument("-o", "--output", required=True,
+                   help="Output path (.csv, .parquet, .feather or .npz)")
+    p.add_argument("--stages", default=None,
+                   help="Normalization chain to derive, e.g. log10,log10_tag,l2")
+    p.add_argument("--tag_target_max", type=float, default=4.0,
+                   help="Target max tag for the scale_tag stage")
+    p.add_argument("--sort-by-tag", action="store_true",
+                   help="Derive the test_id/tag view sorted by tag")
+
+    sub.add_parser("ls", help="List names and derived datasets")
+    sub.add_parser("gc", help="Delete objects no name refers to")
+    args = parser.parse_args()
+
+    store = DatasetStore(args.store)
+    if args.command == "put":
+        name = args.name or os.path.splitext(os.path.basename(args.path))[0]
+        digest, added = store.put(args.path, name)
+        print(f"[OK] {name} -> {digest[:12]}" + ("" if added else " (already stored)"))
+    elif args.command == "import":
+        for d in args.dirs:
+            for root, _, files in sorted(os.walk(d)):
+                for fn in sorted(files):
+                    if fn.endswith(".csv"):
+                        path = os.path.join(root, fn)
+                        # name by path below the imported directory's parent, so
+                        # equal file names in different directories stay distinct
+                        rel = os.path.relpath(path, os.path.dirname(os.path.normpath(d)))
+                        digest, added = store.put(path, os.path.splitext(rel)[0])
+                        print(f"  {path} -> {digest[:12]}" + ("" if added else " (duplicate)"))
+        logical, stored = store.usage()
+        print(f"[OK] {logical / 1e6:.1f} MB of datasets held in {stored / 1e6:.1f} MB")
+    elif args.command == "get":
+        try:
+            transform, params = _transform_args(args)
+            ref = args.ref
+            if transform:
+                ref, cached = store.derive(args.ref, transform, **params)
+                print(f"[INFO] {transform} {'served from store' if cached else 'computed and stored'}"
+                      f" as {ref[:12]}")
+            store.export(ref, args.output)
+        except (KeyError, ValueError) as e:
+            print(f"[ERROR] {e}", file=sys.stderr)
+            sys.exit(1)
+        print(f"[OK] wrote {args.output}")
+    elif args.command == "ls":
+        objects = store.catalog["objects"]
+        for name, digest in sorted(store.catalog["names"].items()):
+            o = objects.get(digest, {})
+            print(f"{name:<45}{digest[:12]:>14}{o.get('rows', 0):>8} rows{o.get('stored', 0) / 1e3:>9.0f} kB")
+        for e in store.catalog["derived"].values():
+            print(f"  {e['transform']}({e['input'][:12]}) {json.dumps(e['params'], sort_keys=True)}"
+                  f" -> {e['output'][:12]}")
+        logical, stored = store.usage()
+        print(f"{len(objects)} objects, {logical / 1e6:.1f} MB of named datasets in {stored / 1e6:.1f} MB")
+    elif args.command == "gc":
+        print(f"[OK] freed {store.gc() / 1e3:.0f} kB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Derived I/O characterization features computed from the parsed counters.
+
+Each feature is declared as a ratio of two column sums, numerator over
+denominator, and evaluated with NumPy over whole columns at once. A zero
+denominator (no reads, no I/O time, ...) gives 0 instead of NaN or inf.
+  avg_read_size        bytes per read
+  avg_write_size       bytes per write
+  seq_read_frac        sequential reads / reads
+  seq_write_frac       sequential writes / writes
+  consec_read_frac     consecutive reads / reads
+  consec_write_frac    consecutive writes / writes
+  file_unaligned_frac  file-unaligned accesses / (reads + writes)
+  mem_unaligned_frac   memory-unaligned accesses / (reads + writes)
+  rw_switch_frac       read/write switches / (reads + writes)
+  read_op_frac         reads / (reads + writes)
+  read_byte_frac       bytes read / (bytes read + bytes written)
+  meta_time_frac       metadata time / (read + write + metadata time)
+meta_time_frac needs the POSIX_F_*_TIME counters, which only the parser
+sees (they are not written to the CSV), so it can be derived while parsing
+but not afterwards.
+Usage (as a library):
+  names = parse_features("all")
+  df, added = add_derived_features(df, names)
+"""
+from collections import namedtuple
+
+import numpy as np
+
+Feature = namedtuple("Feature", ["name", "numerator", "denominator"])
+
+_OPS = ["POSIX_READS", "POSIX_WRITES"]
+
+FEATURES = [
+    Feature("avg_read_size", ["POSIX_BYTES_READ"], ["POSIX_READS"]),
+    Feature("avg_write_size", ["POSIX_BYTES_WRITTEN"], ["POSIX_WRITES"]),
+    Feature("seq_read_frac", ["POSIX_SEQ_READS"], ["POSIX_READS"]),
+    Feature("seq_write_frac", ["POSIX_SEQ_WRITES"], ["POSIX_WRITES"]),
+    Feature("consec_read_frac", ["POSIX_CONSEC_READS"], ["POSIX_READS"]),
+    Feature("consec_write_frac", ["POSIX_CONSEC_WRITES"], ["POSIX_WRITES"]),
+    Feature("file_unaligned_frac", ["POSIX_FILE_NOT_ALIGNED"], _OPS),
+    Feature("mem_unaligned_frac", ["POSIX_MEM_NOT_ALIGNED"], _OPS),
+    Feature("rw_switch_frac", ["POSIX_RW_SWITCHES"], _OPS),
+    Feature("read_op_frac", ["POSIX_READS"], _OPS),
+    Feature("read_byte_frac", ["POSIX_BYTES_READ"], ["POSIX_BYTES_READ", "POSIX_BYTES_WRITTEN"]),
+    Feature("meta_time_frac", ["POSIX_F_META_TIME"],
+            ["POSIX_F_READ_TIME", "POSIX_F_WRITE_TIME", "POSIX_F_META_TIME"]),
+]
+FEATURE_NAMES = [f.name for f in FEATURES]
+_BY_NAME = {f.name: f for f in FEATURES}
+
+
+def parse_features(spec):
+    """Feature names from "all" or a comma-separated list; "" or None gives none."""
+    if not spec:
+        return []
+    if spec == "all":
+        return list(FEATURE_NAMES)
+    names = [s.strip() for s in spec.split(",") if s.strip()]
+    unknown = [n for n in names if n not in _BY_NAME]
+    if unknown:
+        raise ValueError(f"unknown derived features {unknown}; expected any of {FEATURE_NAMES} or 'all'")
+    return names
+
+
+def inputs(names):
+    """Counters the named features read."""
+    needed = []
+    for name in names:
+        f = _BY_NAME[name]
+        needed += [c for c in f.numerator + f.denominator if c not in needed]
+    return needed
+
+
+def available(names, columns):
+    """The subset of names whose input counters are all in columns."""
+    columns = set(columns)
+    return [n for n in names if set(inputs([n])) <= columns]
+
+
+def _column_sum(columns, names, cache):
+    key = tuple(names)
+    if key not in cache:
+        total = np.asarray(columns[names[0]], dtype=np.float64)
+        for name in names[1:]:
+            total = total + np.asarray(columns[name], dtype=np.float64)
+        cache[key] = total
+    return cache[key]
+
+
+def compute_features(columns, names):
+    """Evaluate the named features; columns maps counter names to equal-length arrays.
+
+    Returns {name: float64 array}. Shared denominators are summed once.
+    """
+    cache = {}
+    out = {}
+    for name in names:
+        f = _BY_NAME[name]
+        num = _column_sum(columns, f.numerator, cache)
+        den = _column_sum(columns, f.denominator, cache)
+        out[name] = np.divide(num, den, out=np.zeros_like(num), where=den != 0)
+    return out
+
+
+def add_derived_features(df, names, before="tag"):
+    """Return (df with the computable features inserted before column before, names added).
+
+    Features whose inputs are missing from df are skipped; compare the
+    returned names with the requested ones to report them.
+    """
+    names = available(names, df.columns)
+    values = compute_features(df, names)
+    # recomputing replaces columns derived earlier
+    out = df.drop(columns=[n for n in names if n in df.columns])
+    pos = out.columns.get_loc(before) if before in out.columns else len(out.columns)
+    for i, name in enumerate(names):
+        out.insert(pos + i, name, values[name])
+    return out, names
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Space-filling samples of the IOR configuration space, with coverage metrics.
+
+Instead of running the full factorial (or drawing configurations uniformly
+at random, which repeats some and clusters others), pick a design that
+spreads a fixed budget of runs over the parameter levels:
+  lhs     Latin hypercube: every level of every parameter appears
+          equally often (within one).
+  sobol   Sobol low-discrepancy sequence (Joe-Kuo direction numbers) with a
+          random digital shift.
+  halton  Halton sequence (one prime base per parameter) with a random
+          Cranley-Patterson shift.
+  oa      Strength-2 orthogonal array (Rao-Hamming construction over the
+          smallest prime >= the largest level count), so every pair of
+          levels of every two parameters appears; levels are collapsed for
+          parameters with fewer levels. Its size is fixed by the
+          construction (27 runs for the default space).
+  random  uniform draws (deduplicated, unlike the old random.choice
+          loop), for comparison.
+Points are mapped onto levels and then to ConfigSpace indices, so the
+samples keep the global config_id / testFile numbering of the full
+factorial, and duplicates are removed (and topped up where the method
+allows). pairwise_coverage() is the share of all level pairs of all
+parameter pairs that the sample contains (t_way_coverage for other t).
+Usage:
+  python doe_sampler.py --method oa -o configs/ior_configurations_oa.csv
+  python doe_sampler.py --method lhs --n 200 --seed 1 -o lhs.csv
+  python doe_sampler.py --compare --n 64
+"""
+import argparse
+from itertools import combinations
+
+import numpy as np
+
+from config_space import ConfigSpace
+
+METHODS = ["lhs", "sobol", "halton", "oa", "random"]
+
+# Joe-Kuo (new-joe-kuo-6.21201) primitive polynomials for dimensions 2..13:
+# (degree s, coefficients a, initial direction numbers m_1..m_s)
+SOBOL_PARAMS = [
+    (1, 0, [1]),
+    (2, 1, [1, 3]),
+    (3, 1, [1, 3, 1]),
+    (3, 2, [1, 1, 1]),
+    (4, 1, [1, 1, 3, 3]),
+    (4, 4, [1, 3, 5, 13]),
+    (5, 2, [1, 1, 5, 5, 17]),
+    (5, 4, [1, 1, 5, 5, 5]),
+    (5, 7, [1, 1, 7, 11, 19]),
+    (5, 11, [1, 1, 5, 1, 1]),
+    (5, 13, [1, 1, 1, 3, 11]),
+    (5, 14, [1, 3, 5, 5, 31]),
+]
+SOBOL_BITS = 32
+PRIMES = [2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41, 43, 47, 53]
+
+
+# -- unit-cube point sets -----------------------------------------------------
+
+def _sobol_directions(dims):
+    if dims > len(SOBOL_PARAMS) + 1:
+        raise ValueError(f"sobol supports at most {len(SOBOL_PARAMS) + 1} parameters")
+    v = np.zeros((dims, SOBOL_BITS), dtype=np.uint64)
+    v[0] = [1 << (SOBOL_BITS - 1 - k) for k in range(SOBOL_BITS)]
+    for d in range(1, dims):
+        s, a, m = SOBOL_PARAMS[d - 1]
+        for k in range(SOBOL_BITS):
+            if k < s:
+                v[d, k] = m[k] << (SOBOL_BITS - 1 - k)
+            else:
+                x = v[d, k - s] ^ (v[d, k - s] >> np.uint64(s))
+                for i in range(1, s):
+                    if (a >> (s - 1 - i)) & 1:
+                        x ^= v[d, k - i]
+                v[d, k] = x
+    return v
+
+
+def sobol_points(n, dims, rng):
+    """First n Sobol points in [0, 1)^dims with a random digital shift (XOR)."""
+    v = _sobol_directions(dims)
+    idx = np.arange(n, dtype=np.uint64)
+    gray = idx ^ (idx >> np.uint64(1))
+    x = np.zeros((n, dims), dtype=np.uint64)
+    for b in range(SOBOL_BITS):
+        bit = ((gray >> np.uint64(b)) & np.uint64(1)).astype(bool)
+        x[bit] ^= v[:, b]
+    shift = rng.integers(0, 1 << SOBOL_BITS, size=dims, dtype=np.uint64)
+    return (x ^ shift).astype(np.float64) / float(1 << SOBOL_BITS)
+
+
+def halton_points(n, dims, rng):
+    """First n Halton points (skipping 0) with a random shift modulo 1."""
+    if dims > len(PRIMES):
+        raise ValueError(f"halton supports at most {len(PRIMES)} parameters")
+    idx = np.arange(1, n + 1)
+    out = np.zeros((n, dims))
+    for d in range(dims):
+        base = PRIMES[d]
+        i, f = idx.copy(), 1.0
+        while i.any():
+            f /= base
+            out[:, d] += f * (i % base)
+            i //= base
+    return (out + rng.random(dims)) % 1.0
+
+
+def lhs_points(n, dims, rng):
+    """Latin hypercube: one point in each of n strata per dimension."""
+    strata = np.argsort(rng.random((dims, n)), axis=1).T
+    return (strata + rng.random((n, dims))) / n
+
+
+def orthogonal_array(radix, rng):
+    """Strength-2 orthogonal array as level digits (rows x parameters).
+
+    Rao-Hamming over GF(p): rows are all vectors x in GF(p)^k, columns all
+    nonzero c with leading entry 1, entries x.c mod p. Any two columns are
+    independent, so every pair of symbols appears p^(k-2) times. A
+    parameter with m < p levels maps symbol s to level s mod m, which
+    keeps every level pair present. Levels are randomly relabeled per
+    column and rows shuffled, which preserves the array's strength.
+    """
+    p = next(q for q in PRIMES if q >= radix.max())
+    k = 2
+    while (p ** k - 1) // (p - 1) < len(radix):
+        k += 1
+    rows = np.array(np.meshgrid(*[np.arange(p)] * k, indexing="ij")).reshape(k, -1).T
+    cols = []
+    for lead in range(k):
+        tail = np.array(np.meshgrid(*[np.arange(p)] * (k - lead - 1), indexing="ij")) \
+            .reshape(k - lead - 1, -1).T if k - lead - 1 else np.zeros((1, 0), dtype=int)
+        for t in tail:
+            cols.append(np.concatenate([np.zeros(lead, dtype=int), [1], t]))
+    cols = np.array(cols[:len(radix)]).T
+    symbols = rows @ cols % p
+    for j in range(len(radix)):
+        symbols[:, j] = rng.permutation(p)[symbols[:, j]]
+    digits = symbols % radix
+    return digits[rng.permutation(len(digits))]
+
+
+# -- mapping onto the space ---------------------------------------------------
+
+def points_to_digits(points, radix):
+    """Map unit-cube points to level positions (equal-width bins per parameter)."""
+    return np.minimum((points * radix).astype(np.int64), radix - 1)
+
+
+def digits_to_indices(space, digits):
+    return digits @ space.stride
+
+
+def _unique_in_order(indices):
+    _, first = np.unique(indices, return_index=True)
+    return indices[np.sort(first)]
+
+
+def sample(space, method, n=None, seed=0):
+    """ConfigSpace indices of an n-run design (unique, in design order).
+
+    When points land on the same configuration, further points are drawn
+    (the sequences continue, lhs adds a fresh hypercube for the shortfall)
+    until n distinct configurations are found. oa returns its own size
+    unless n is smaller, in which case the array is truncated and loses
+    its strength.
+    """
+    rng = np.random.default_rng(seed)
+    radix = space.radix
+    dims = len(radix)
+    if method == "oa":
+        idx = _unique_in_order(digits_to_indices(space, orthogonal_array(radix, rng)))
+        return idx if n is None else idx[:n]
+    if n is None:
+        raise ValueError(f"method {method!r} needs a sample size n")
+    n = min(n, len(space))
+    if method in ("sobol", "halton"):
+        points = sobol_points if method == "sobol" else halton_points
+        # a fresh generator per call keeps the shift, so a longer prefix only adds points
+        draw = lambda start, m: points(start + m, dims, np.random.default_rng(seed))[start:]
+    elif method == "lhs":
+        draw = lambda start, m: lhs_points(m, dims, rng)
+    elif method == "random":
+        draw = lambda start, m: rng.random((m, dims))
+    else:
+        raise ValueError(f"unknown method {method!r}; expected one of {METHODS}")
+    idx, drawn = np.empty(0, dtype=np.int64), 0
+    while len(idx) < n and drawn < 64 * n:
+        # top up with further points, keeping the ones already chosen
+        m = max(n - len(idx), 1) if drawn else n
+        new = digits_to_indices(space, points_to_digits(draw(drawn, m), radix))
+        idx = _unique_in_order(np.concatenate([idx, new]))
+        drawn += m
+    return idx[:n]
+
+
+# -- coverage -----------------------------------------------------------------
+
+def t_way_coverage(digits, radix, t=2):
+    """Fraction of all level combinations of all t-parameter subsets present in the sample."""
+    digits = np.asarray(digits)
+    covered = total = 0
+    for cols in combinations(range(len(radix)), t):
+        code = np.zeros(len(digits), dtype=np.int64)
+        size = 1
+        for c in cols:
+            code = code * radix[c] + digits[:, c]
+            size *= int(radix[c])
+        covered += len(np.unique(code))
+        total += size
+    return covered / total
+
+
+def pairwise_coverage(digits, radix):
+    return t_way_coverage(digits, radix, 2)
+
+
+def level_balance(digits, radix):
+    """Worst ratio of least- to most-used level over all parameters (1 = perfectly balanced)."""
+    worst = 1.0
+    for j, m in enumerate(radix):
+        counts = np.bincount(digits[:, j], minlength=m)
+        worst = min(worst, counts.min() / max(counts.max(), 1))
+    return worst
+
+
+def describe(space, indices):
+    digits = (np.asarray(indices)[:, None] // space.stride) % space.radix
+    return {
+        "runs": len(indices),
+        "pairwise_coverage": pairwise_coverage(digits, space.radix),
+        "three_way_coverage": t_way_coverage(digits, space.radix, 3),
+        "level_balance": level_balance(digits, space.radix),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Sample the IOR configuration space with a space-filling design"
+    )
+    parser.add_argument("--method", choices=METHODS, default="lhs")
+    parser.add_argument("--n", type=int, default=None,
+                        help="Number of configurations (default for oa: the array size)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", default=None, help="Write the sampled configurations CSV here")
+    parser.add_argument("--compare", action="store_true",
+                        help="Print the coverage of every method at the same size and exit")
+    args = parser.parse_args()
+
+    space = ConfigSpace()
+    if args.compare:
+        n = args.n or len(sample(space, "oa", seed=args.seed))
+        print(f"{'method':<8}{'runs':>6}{'pairs':>9}{'3-way':>9}{'balance':>9}")
+        for method in METHODS:
+            d = describe(space, sample(space, method, n, args.seed))
+            print(f"{method:<8}{d['runs']:>6}{d['pairwise_coverage']:>9.3f}"
+                  f"{d['three_way_coverage']:>9.3f}{d['level_balance']:>9.2f}")
+        return
+
+    try:
+        indices = sample(space, args.method, args.n, args.seed)
+    except ValueError as e:
+        parser.error(str(e))
+    d = describe(space, indices)
+    print(f"{args.method}: {d['runs']} of {len(space)} configurations, pairwise coverage "
+          f"{d['pairwise_coverage']:.3f}, 3-way {d['three_way_coverage']:.3f}, "
+          f"level balance {d['level_balance']:.2f}")
+    if args.output:
+        space.frame(indices).to_csv(args.output, index=False)
+        print(f"Wrote {len(indices)} configurations to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
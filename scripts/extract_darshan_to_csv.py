@@ -1,27 +1,25 @@
+import argparse
+import numpy as np
 import pandas as pd
-import sys
 from collections import defaultdict
 
-TARGET_COUNTERS = [
-    "POSIX_OPENS", "LUSTRE_STRIPE_SIZE", "LUSTRE_STRIPE_WIDTH", "POSIX_FILENOS",
-    "POSIX_MEM_ALIGNMENT", "POSIX_FILE_ALIGNMENT", "POSIX_READS", "POSIX_WRITES",
-    "POSIX_SEEKS", "POSIX_STATS", "POSIX_BYTES_READ", "POSIX_BYTES_WRITTEN",
-    "POSIX_CONSEC_READS", "POSIX_CONSEC_WRITES", "POSIX_SEQ_READS", "POSIX_SEQ_WRITES",
-    "POSIX_RW_SWITCHES", "POSIX_MEM_NOT_ALIGNED", "POSIX_FILE_NOT_ALIGNED",
-    "POSIX_SIZE_READ_0_100", "POSIX_SIZE_READ_100_1K", "POSIX_SIZE_READ_1K_10K",
-    "POSIX_SIZE_READ_100K_1M", "POSIX_SIZE_WRITE_0_100", "POSIX_SIZE_WRITE_100_1K",
-    "POSIX_SIZE_WRITE_1K_10K", "POSIX_SIZE_WRITE_10K_100K", "POSIX_SIZE_WRITE_100K_1M",
-    "POSIX_STRIDE1_STRIDE", "POSIX_STRIDE2_STRIDE", "POSIX_STRIDE3_STRIDE", "POSIX_STRIDE4_STRIDE",
-    "POSIX_STRIDE1_COUNT", "POSIX_STRIDE2_COUNT", "POSIX_STRIDE3_COUNT", "POSIX_STRIDE4_COUNT",
-    "POSIX_ACCESS1_ACCESS", "POSIX_ACCESS2_ACCESS", "POSIX_ACCESS3_ACCESS", "POSIX_ACCESS4_ACCESS",
-    "POSIX_ACCESS1_COUNT", "POSIX_ACCESS2_COUNT", "POSIX_ACCESS3_COUNT", "POSIX_ACCESS4_COUNT",
-    "POSIX_F_META_TIME"
-]
+from counter_engine import reduce_groups
+from parse_darshan_dir import TARGET_COUNTERS, TARGET_OPS
+from throughput import TAG_METRICS, DEFAULT_METRIC, TIME_COUNTERS, group_throughput
 
-# Parse file
-rank_data = defaultdict(lambda: defaultdict(float))
+parser = argparse.ArgumentParser(description="Turn saved darshan-parser output into per-rank counters + tag")
+parser.add_argument("parser_output", help="Text file written by darshan-parser")
+parser.add_argument("output_csv", nargs="?", default="darshan_parsed_output.csv")
+parser.add_argument("--tag", choices=TAG_METRICS, default=DEFAULT_METRIC,
+                    help="Throughput definition used as the tag (default: %(default)s)")
+parser.add_argument("--legacy-nprocs", action="store_true",
+                    help="Name the rank column nprocs as datasets built before it was renamed did")
+args = parser.parse_args()
 
-with open(sys.argv[1], 'r') as f:
+# Parse file, one counter dict per (rank, record id)
+record_data = defaultdict(lambda: defaultdict(float))
+
+with open(args.parser_output, 'r') as f:
     for line in f:
         if not (line.startswith("POSIX") or line.startswith("LUSTRE")):
             continue
@@ -30,37 +28,42 @@ with open(sys.argv[1], 'r') as f:
         if len(parts) < 5:
             continue
 
-        module, rank_str, _, counter, value_str = parts[:5]
+        module, rank_str, id_str, counter, value_str = parts[:5]
         try:
-            rank = int(rank_str)
+            key = (int(rank_str), int(id_str))
             value = float(value_str)
         except ValueError:
             continue
 
         if counter in TARGET_COUNTERS:
-            rank_data[rank][counter] += value
+            record_data[key][counter] += value
+
+# Reduce records into one row per rank with the same per-counter ops as
+# parse_darshan_dir.py; the tag needs the records themselves
+keys = list(record_data)
+record_ranks = np.array([rank for rank, _ in keys], dtype=np.int64)
+values = np.array([[record_data[k].get(c, 0.0) for c in TARGET_COUNTERS] for k in keys])
+values = values.reshape(-1, len(TARGET_COUNTERS))
+ranks, reduced, group = reduce_groups(values, TARGET_OPS, record_ranks)
+columns = {c: values[:, i] for i, c in enumerate(TARGET_COUNTERS)}
+tags = group_throughput(record_ranks, columns, group, len(ranks), args.tag)
 
 # Process rows
 records = []
 
-for rank, counters in rank_data.items():
-    row = {"nprocs": rank}
-    for counter in TARGET_COUNTERS:
-        row[counter] = counters.get(counter, 0.0)
-
-    # Calculate tag = total bytes / slowest time
-    total_bytes = row["POSIX_BYTES_READ"] + row["POSIX_BYTES_WRITTEN"]
-    time = row["POSIX_F_META_TIME"]
-    if time <= 0:
-        time = 1e-9  # Avoid divide-by-zero
-    row["tag"] = total_bytes / time
-
-    del row["POSIX_F_META_TIME"]  # Remove helper
+for i, rank in enumerate(ranks.tolist()):
+    row = {"rank": rank}
+    for j, counter in enumerate(TARGET_COUNTERS):
+        if counter not in TIME_COUNTERS:  # helpers only feed the tag
+            row[counter] = reduced[i, j]
+    row["tag"] = tags[i]
     records.append(row)
 
 # Save
-output_csv = sys.argv[2] if len(sys.argv) > 2 else "darshan_parsed_output.csv"
+output_csv = args.output_csv
 df = pd.DataFrame(records)
-df.sort_values("nprocs", inplace=True)
+df.sort_values("rank", inplace=True)
+if args.legacy_nprocs:
+    df.rename(columns={"rank": "nprocs"}, inplace=True)
 df.to_csv(output_csv, index=False)
 print(f"Saved {len(df)} ranks to {output_csv}")
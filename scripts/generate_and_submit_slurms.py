@@ -1,17 +1,18 @@
+import argparse
 import pandas as pd
 import os
 
+from config_canonical import canonicalize
+from config_space import ConfigSpace, parse_shard
+
 # === CONFIG ===
 CSV_FILE = "configs/ior_configurations_llm.csv"
 SLURM_TEMPLATE_DIR = "generated_slurms"
 IOR_BIN = "~/.conda/envs/ior_env/bin/ior"
 DARSHAN_LIB = "$HOME/.conda/envs/ior_env/lib/libdarshan.so"
 
-os.makedirs(SLURM_TEMPLATE_DIR, exist_ok=True)
-
-df = pd.read_csv(CSV_FILE)
-
-for idx, row in df.iterrows():
+def submit(row, dry_run=False):
+    """Write the slurm script for one configuration row and sbatch it."""
     config_id = row["config_id"]
     test_file = row["testFile"]
     api = row["api"].strip()
@@ -75,8 +76,55 @@ for idx, row in df.iterrows():
 
         f.write(f"echo \"✅ Finished: {config_id}\"\n")
 
+    if dry_run:
+        print(f"📝 Wrote {slurm_file} (not submitted)")
+        return
     os.system(f"sbatch {slurm_file}")
     os.remove(slurm_file)
     print(f"🗑️ Deleted {slurm_file} after submission.")
 
-print("🎉 All jobs submitted and temporary slurm files cleaned up.")
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate and submit one IOR slurm job per configuration")
+    parser.add_argument("--csv", default=CSV_FILE, help="Configuration CSV (default: %(default)s)")
+    parser.add_argument("--shard", type=parse_shard, default=None, metavar="K/N",
+                        help="Submit shard K of N of the full configuration space instead of a CSV")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Only write the slurm files into the template directory")
+    parser.add_argument("--dedup", default=None, metavar="MAP_CSV",
+                        help="Submit one job per distinct IOR invocation and write the "
+                             "testFile -> canonical testFile map here (see config_canonical.py)")
+    args = parser.parse_args()
+
+    os.makedirs(SLURM_TEMPLATE_DIR, exist_ok=True)
+
+    if args.shard:
+        space = ConfigSpace()
+        start, stop = space.shard(*args.shard)
+        if args.dedup:
+            configs = space.frame(range(start, stop))
+        else:
+            # rows are decoded one at a time; the full factorial is never built
+            rows = (dict(zip(space.columns, r)) for r in space.rows(start, stop))
+    else:
+        configs = pd.read_csv(args.csv)
+
+    if args.dedup:
+        configs, mapping = canonicalize(configs)
+        mapping.to_csv(args.dedup, index=False)
+        print(f"🔁 {len(mapping)} configurations collapse to {len(configs)} distinct IOR runs; "
+              f"map written to {args.dedup}")
+    if args.dedup or not args.shard:
+        rows = (row for _, row in configs.iterrows())
+
+    for row in rows:
+        submit(row, args.dry_run)
+
+    if args.dry_run:
+        print("🎉 All slurm files written.")
+    else:
+        print("🎉 All jobs submitted and temporary slurm files cleaned up.")
+
+
+if __name__ == "__main__":
+    main()
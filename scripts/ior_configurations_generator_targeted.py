@@ -1,5 +1,8 @@
+import argparse
 import csv
-import random
+
+from config_space import ConfigSpace
+from doe_sampler import METHODS, describe, sample
 
 # You can adjust this per group
 NUM_SAMPLES_PER_GROUP = 500
@@ -53,38 +56,46 @@ header = [
     "LUSTRE_STRIPE_SIZE", "LUSTRE_STRIPE_WIDTH"
 ]
 
+parser = argparse.ArgumentParser(description="Sample targeted IOR configuration groups")
+parser.add_argument("--method", choices=METHODS, default="lhs",
+                    help="Sampler within each group (default: lhs; random draws uniformly but, "
+                         "unlike the old random.choice loop, never repeats a configuration)")
+parser.add_argument("--seed", type=int, default=0)
+args = parser.parse_args()
+
 rows = []
 config_id = 1
 
-for group in all_groups:
-    samples = 0
-    while samples < NUM_SAMPLES_PER_GROUP:
-        api = random.choice(apis)
-        ts = random.choice(group.get("transferSize", transfer_sizes))
-        bs = random.choice(group.get("blockSize", block_sizes))
-        sc = random.choice(group.get("segmentCount", segment_counts))
-        nt = random.choice(group.get("numTasks", num_tasks_list))
-        fpp = random.choice(group["filePerProc"])
-        usd = random.choice(group["useStridedDatatype"])
-        sa = random.choice(set_alignment_vals)
-        od = random.choice(group["useO_DIRECT"])
-        fs = random.choice(group["fsync"])
-        lss = random.choice(lustre_stripe_sizes)
-        lsw = random.choice(lustre_stripe_widths)
+for g, group in enumerate(all_groups):
+    # Each group is a sub-space of the levels; sample it without duplicates
+    space = ConfigSpace({
+        "api": apis,
+        "transferSize": group.get("transferSize", transfer_sizes),
+        "blockSize": group.get("blockSize", block_sizes),
+        "segmentCount": group.get("segmentCount", segment_counts),
+        "numTasks": group.get("numTasks", num_tasks_list),
+        "filePerProc": group["filePerProc"],
+        "useStridedDatatype": group["useStridedDatatype"],
+        "setAlignment": set_alignment_vals,
+        "useO_DIRECT": group["useO_DIRECT"],
+        "fsync": group["fsync"],
+        "LUSTRE_STRIPE_SIZE": lustre_stripe_sizes,
+        "LUSTRE_STRIPE_WIDTH": lustre_stripe_widths,
+    })
+    n = None if args.method == "oa" else NUM_SAMPLES_PER_GROUP
+    indices = sample(space, args.method, n, args.seed + g)
+    d = describe(space, indices)
+    print(f"Group {g + 1}: {d['runs']} of {len(space)} configurations, "
+          f"pairwise coverage {d['pairwise_coverage']:.3f}")
 
+    for i in indices:
+        cfg = space[i]
         cfg_str = str(config_id).zfill(5)
         test_file = f"test{cfg_str}"
 
-        row = [
-            cfg_str, test_file,
-            api, ts, bs, sc, nt,
-            fpp, usd, sa,
-            od, fs,
-            lss, lsw
-        ]
+        row = [cfg_str, test_file] + [cfg[name] for name in space.names]
         rows.append(row)
         config_id += 1
-        samples += 1
 
 # Write to CSV
 with open("ior_configurations_targeted.csv", "w", newline="") as csvfile:
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Join parsed Darshan counters with the IOR configurations that produced them.
+
+Parsed datasets carry only test_id (e.g. test01984); the parameters live in
+configs/ior_configurations*.csv keyed by testFile. IorDataset joins the two
+through a hashed testFile index and keeps an inverted index (parameter
+value -> row positions) over every parameter column, so queries such as
+"all runs with transferSize=4K and numTasks=64" intersect a few posting
+lists instead of scanning the table. Size parameters compare by bytes, so
+"4K", "4k" and 4096 are the same value, and other text values ignore case.
+Usage:
+  python ior_dataset.py COUNTERS CONFIG_CSV [CONFIG_CSV ...] -o joined.parquet
+  python ior_dataset.py COUNTERS CONFIG_CSV --where transferSize=4K --where numTasks=64
+"""
+import argparse
+import re
+import sys
+
+import numpy as np
+import pandas as pd
+
+from dataset_io import read_table, write_table
+
+CONFIG_KEY = "testFile"
+RUN_KEY = "test_id"
+PARAM_COLUMNS = [
+    "api", "transferSize", "blockSize", "segmentCount", "numTasks", "filePerProc",
+    "useStridedDatatype", "setAlignment", "useO_DIRECT", "fsync",
+    "LUSTRE_STRIPE_SIZE", "LUSTRE_STRIPE_WIDTH",
+]
+SIZE_PARAMS = ["transferSize", "blockSize", "setAlignment", "LUSTRE_STRIPE_SIZE"]
+
+# config columns that clash with parsed counters get this suffix in the join
+CONFIG_SUFFIX = "_config"
+
+_SIZE_RE = re.compile(r"(\d+)\s*([KMGTP]?)(?:I?B)?")
+_SIZE_UNITS = {"": 0, "K": 1, "M": 2, "G": 3, "T": 4, "P": 5}
+
+
+def parse_size(value):
+    """IOR size ("4K", "1m", "16MiB", 512) as a number of bytes."""
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    match = _SIZE_RE.fullmatch(str(value).strip().upper())
+    if match is None:
+        raise ValueError(f"not an IOR size: {value!r}")
+    return int(match.group(1)) * 1024 ** _SIZE_UNITS[match.group(2)]
+
+
+def normalize_value(column, value):
+    """Canonical form of a parameter value for index lookups.
+
+    Sizes become bytes, integers ints and anything else an upper-case
+    string, so "posix" and "POSIX " are the same api.
+    """
+    if column in SIZE_PARAMS:
+        return parse_size(value)
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return str(value).strip().upper()
+
+
+def normalize_column(column, series):
+    """normalize_value over a Series, as an object array."""
+    # normalize each distinct value once; configs repeat a handful of values
+    uniq, inverse = np.unique(series.astype(str).to_numpy(), return_inverse=True)
+    canon = np.array([normalize_value(column, v) for v in uniq], dtype=object)
+    return canon[inverse.reshape(-1)]
+
+
+def load_configs(paths):
+    """Read one or more IOR configuration CSVs as strings, one row per testFile.
+
+    A testFile listed twice with different parameters is ambiguous and
+    raises ValueError; exact repeats are dropped.
+    """
+    frames = [pd.read_csv(p, dtype=str) for p in paths]
+    configs = pd.concat(frames, ignore_index=True).drop_duplicates()
+    dup = configs[CONFIG_KEY].duplicated(keep=False)
+    if dup.any():
+        clash = sorted(configs.loc[dup, CONFIG_KEY].unique())
+        raise ValueError(f"{len(clash)} testFile values have conflicting configurations, "
+                         f"e.g. {clash[:5]}")
+    return configs.reset_index(drop=True)
+
+
+def find_param_columns(columns, params=None):
+    """{parameter: column} for the IOR parameters among a table's columns.
+
+    A parameter that clashes with a counter name is joined as
+    <name>_config, which takes precedence over the counter.
+    """
+    columns = set(columns)
+    found = {}
+    for p in params or PARAM_COLUMNS:
+        if p + CONFIG_SUFFIX in columns:
+            found[p] = p + CONFIG_SUFFIX
+        elif p in columns:
+            found[p] = p
+    return found
+
+
+class ParamIndex:
+    """Inverted index from canonical parameter values to row positions of a table."""
+
+    def __init__(self, df, columns):
+        self.columns = [c for c in columns if c in df.columns]
+        self._postings = {}
+        for col in self.columns:
+            rows = np.flatnonzero(df[col].notna().to_numpy())
+            keys = normalize_column(col, df[col].iloc[rows])
+            groups = pd.Series(rows).groupby(keys, sort=False).indices if len(rows) else {}
+            # groupby().indices are offsets into rows
+            self._postings[col] = {k: rows[v] for k, v in groups.items()}
+
+    def values(self, column):
+        """Distinct canonical values of column."""
+        return list(self._postings[column])
+
+    def positions(self, **criteria):
+        """Sorted row positions matching every criterion.
+
+        Each criterion is column=value or column=[values] (any of them).
+        The smallest posting list is intersected first.
+        """
+        lists = []
+        for col, wanted in criteria.items():
+            if col not in self._postings:
+                raise KeyError(f"{col!r} is not an indexed parameter; expected one of {self.columns}")
+            postings = self._postings[col]
+            wanted = wanted if isinstance(wanted, (list, tuple, set)) else [wanted]
+            hits = [postings.get(normalize_value(col, v)) for v in wanted]
+            hits = [h for h in hits if h is not None]
+            if len(hits) == 1:
+                lists.append(hits[0])  # posting lists are already sorted
+            else:
+                lists.append(np.unique(np.concatenate(hits)) if hits else np.empty(0, dtype=np.intp))
+        if not lists:
+            raise ValueError("positions() needs at least one criterion")
+        lists.sort(key=len)
+        out = lists[0]
+        for other in lists[1:]:
+            if not len(out):
+                break
+            out = np.intersect1d(out, other, assume_unique=True)
+        return out
+
+
+class IorDataset:
+    """Parsed counters joined to their IOR parameters, with indexed lookups.
+
+    table has the counter columns followed by the configuration columns
+    (clashing names get CONFIG_SUFFIX). Runs whose test_id has no
+    configuration keep empty parameters and are listed in unmatched.
+    """
+
+    def __init__(self, counters, configs, how="left"):
+        counters = counters.reset_index(drop=True)
+        self.configs = configs.reset_index(drop=True)
+        self._config_pos = pd.Index(self.configs[CONFIG_KEY])
+        pos = self._config_pos.get_indexer(counters[RUN_KEY].astype(str))
+        matched = pos >= 0
+        self.unmatched = sorted(counters.loc[~matched, RUN_KEY].astype(str).unique())
+        if how == "inner":
+            counters, pos = counters[matched].reset_index(drop=True), pos[matched]
+        elif how != "left":
+            raise ValueError(f"how must be 'left' or 'inner', not {how!r}")
+
+        params = self.configs.reindex(pos).reset_index(drop=True)  # -1 -> all-NaN row
+        # positions in params are positions in table, so the index is built on params
+        self.index = ParamIndex(params, PARAM_COLUMNS)
+        renames = {c: c + CONFIG_SUFFIX for c in params.columns if c in counters.columns}
+        self.table = pd.concat([counters, params.rename(columns=renames)], axis=1)
+        self.param_columns = [renames.get(c, c) for c in PARAM_COLUMNS if c in params.columns]
+
+    @classmethod
+    def build(cls, counters_path, config_paths, how="left"):
+        return cls(read_table(counters_path), load_configs(config_paths), how)
+
+    def config(self, test_id):
+        """Parameters of one test as a dict (KeyError if unknown)."""
+        pos = self._config_pos.get_indexer([test_id])[0]
+        if pos < 0:
+            raise KeyError(test_id)
+        return self.configs.iloc[pos].to_dict()
+
+    def runs(self, **criteria):
+        """Rows of table whose parameters match criteria (see ParamIndex.positions)."""
+        return self.table.iloc[self.index.positions(**criteria)]
+
+
+def _parse_where(items):
+    criteria = {}
+    for item in items:
+        col, sep, value = item.partition("=")
+        if not sep:
+            raise argparse.ArgumentTypeError(f"--where expects COLUMN=VALUE, got {item!r}")
+        values = value.split("|")
+        criteria[col] = values if len(values) > 1 else values[0]
+    return criteria
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Join parsed counters with IOR configuration CSVs on test_id = testFile"
+    )
+    parser.add_argument("counters", help="Parsed counters (.csv, .parquet, .feather or .npz)")
+    parser.add_argument("configs", nargs="+", help="IOR configuration CSV(s), e.g. configs/ior_configurations.csv")
+    parser.add_argument("-o", "--output", default=None,
+                        help="Write the joined (and filtered) table here")
+    parser.add_argument("--where", action="append", default=[], metavar="COLUMN=VALUE",
+                        help="Keep runs with this parameter value; repeatable, VALUE may be a|b")
+    parser.add_argument("--how", choices=["left", "inner"], default="left",
+                        help="left keeps runs without a configuration (default), inner drops them")
+    args = parser.parse_args()
+
+    try:
+        ds = IorDataset.build(args.counters, args.configs, args.how)
+    except ValueError as e:
+        print(f"[ERROR] {e}", file=sys.stderr)
+        sys.exit(1)
+    print(f"[INFO] joined {len(ds.table)} runs with {len(ds.configs)} configurations")
+    if ds.unmatched:
+        print(f"[WARN] {len(ds.unmatched)} test_id values have no configuration, "
+              f"e.g. {ds.unmatched[:5]}", file=sys.stderr)
+
+    table = ds.table
+    if args.where:
+        try:
+            table = ds.runs(**_parse_where(args.where))
+        except (KeyError, ValueError, argparse.ArgumentTypeError) as e:
+            print(f"[ERROR] {e}", file=sys.stderr)
+            sys.exit(1)
+        print(f"[INFO] {len(table)} runs match {' and '.join(args.where)}")
+
+    if args.output:
+        write_table(table, args.output)
+        print(f"[OK] wrote {len(table)} rows to {args.output}")
+    else:
+        print(table[[RUN_KEY] + ds.param_columns].to_string(max_rows=20))
+
+
+if __name__ == "__main__":
+    main()
@@ -9,54 +9,110 @@ import os
 import pandas as pd
 import numpy as np
 
+from dataset_io import (read_table, write_table, iter_table, TableWriter,
+                        is_sparse, read_sparse, write_sparse)
+from profiling import add_profile_args, profiler_from_args
+
+def l2_normalize(df, exclude_cols=("tag", "test_id")):
+    """Return a copy of df with each row's feature vector scaled to unit L2 norm.
+
+    Columns in exclude_cols are passed through unchanged and moved to the end.
+    """
+    exclude_cols = [c for c in exclude_cols if c in df.columns]
+    features = df.drop(columns=exclude_cols)
+
+    # Compute L2 norm per row
+    data = features.values.astype(float)
+    norms = np.linalg.norm(data, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0  # avoid divide by zero
+
+    # Apply L2 normalization
+    df_normed = pd.DataFrame(data / norms, columns=features.columns)
+    for col in exclude_cols:
+        df_normed[col] = df[col].values
+    return df_normed
+
 def main():
     parser = argparse.ArgumentParser(
         description="Apply L2 normalization to log-normalized counters (excluding 'tag')"
     )
     parser.add_argument(
         "--input_csv", required=True,
-        help="Path to log-normalized CSV (with numeric features + optional tag)"
+        help="Path to log-normalized CSV/Parquet/Arrow file (with numeric features + optional tag)"
     )
     parser.add_argument(
         "--output_csv", required=True,
-        help="Path to save the L2-normalized CSV"
+        help="Path to save the L2-normalized output (.csv, .parquet or .feather)"
     )
+    parser.add_argument(
+        "--chunksize", type=int, default=0,
+        help="Stream the input in chunks of this many rows instead of loading it whole "
+             "(ignored for sparse .npz input, which is normalized in place)"
+    )
+    parser.add_argument(
+        "--compact", action="store_true",
+        help="Store each column in its narrowest dtype (float32 features, small ints, categoricals)"
+    )
+    add_profile_args(parser)
     args = parser.parse_args()
+    profiler = profiler_from_args(args)
 
-    print(f"🔹 Loading data from: {args.input_csv}")
-    df = pd.read_csv(args.input_csv)
+    if is_sparse(args.input_csv):
+        # scaling a row leaves its zeros at zero, so only stored entries change
+        print(f"🔹 Loading sparse counters from: {args.input_csv}")
+        with profiler.stage("read") as st:
+            sp = read_sparse(args.input_csv)
+            st.update(rows=len(sp), bytes_read=os.path.getsize(args.input_csv))
+        with profiler.stage("transform") as st:
+            sp.l2_normalize([c for c in ('tag', 'test_id') if c in sp.column_order])
+            st["rows"] = len(sp)
+        with profiler.stage("write") as st:
+            write_sparse(sp, args.output_csv, compact=args.compact)
+            st.update(rows=len(sp), bytes_written=os.path.getsize(args.output_csv))
+        profiler.write()
+        print(f"✅ Saved {len(sp)} L2-normalized sparse rows ({sp.nnz} non-zeros) to: {args.output_csv}")
+        return
 
-    # Separate features and exclude 'tag' and 'test_id' if present
-    exclude_cols = []
-    if 'tag' in df.columns:
-        exclude_cols.append('tag')
-    if 'test_id' in df.columns:
-        exclude_cols.append('test_id')
+    if args.chunksize > 0:
+        # each row is normalized by its own norm, so chunks give the same result
+        print(f"🔹 Streaming {args.input_csv} in chunks of {args.chunksize} rows")
+        rows = 0
+        with TableWriter(args.output_csv, compact=args.compact) as writer:
+            for chunk in profiler.iter_stage("read", iter_table(args.input_csv, args.chunksize)):
+                with profiler.stage("transform") as st:
+                    exclude_cols = [c for c in ('tag', 'test_id') if c in chunk.columns]
+                    df_normed = l2_normalize(chunk, exclude_cols)
+                    st["rows"] = len(df_normed)
+                with profiler.stage("write") as st:
+                    writer.write(df_normed)
+                    st["rows"] = len(df_normed)
+                rows += len(df_normed)
+        profiler.add("read", calls=0, bytes_read=os.path.getsize(args.input_csv))
+        profiler.add("write", calls=0, bytes_written=os.path.getsize(args.output_csv))
+        profiler.write()
+        print(f"✅ Saved {rows} L2-normalized rows to: {args.output_csv}")
+        return
 
-    features = df.drop(columns=exclude_cols)
-    extras = df[exclude_cols] if exclude_cols else None
+    print(f"🔹 Loading data from: {args.input_csv}")
+    with profiler.stage("read") as st:
+        df = read_table(args.input_csv)
+        st.update(rows=len(df), bytes_read=os.path.getsize(args.input_csv))
 
+    # Separate features and exclude 'tag' and 'test_id' if present
+    exclude_cols = [c for c in ('tag', 'test_id') if c in df.columns]
     print(f"🔹 Excluding columns from normalization: {exclude_cols}")
 
-    # Compute L2 norm per row
     print("🔹 Computing L2 norms per row...")
-    data = features.values.astype(float)
-    norms = np.linalg.norm(data, axis=1, keepdims=True)
-    norms[norms == 0] = 1.0  # avoid divide by zero
-
-    # Apply L2 normalization
-    normed_data = data / norms
-
-    # Build DataFrame
-    df_normed = pd.DataFrame(normed_data, columns=features.columns)
-    if extras is not None:
-        for col in extras.columns:
-            df_normed[col] = extras[col].values
+    with profiler.stage("transform") as st:
+        df_normed = l2_normalize(df, exclude_cols)
+        st["rows"] = len(df_normed)
 
-    # Ensure output directory exists
-    os.makedirs(os.path.dirname(args.output_csv) or '.', exist_ok=True)
-    df_normed.to_csv(args.output_csv, index=False)
-    print(f"✅ Saved L2-normalized CSV to: {args.output_csv}")
+    # write_table creates the output directory if needed
+    with profiler.stage("write") as st:
+        write_table(df_normed, args.output_csv, compact=args.compact)
+        st.update(rows=len(df_normed), bytes_written=os.path.getsize(args.output_csv))
+    profiler.write()
+    print(f"✅ Saved L2-normalized data to: {args.output_csv}")
 
 if __name__ == '__main__':
     main()
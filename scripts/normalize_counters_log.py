@@ -5,41 +5,122 @@ Usage:
   python normalize_counters.py input.csv output_normalized.csv
 """
 import argparse
-import pandas as pd
+import os
 import numpy as np
 
+from dataset_io import (read_table, write_table, iter_table, TableWriter,
+                        is_sparse, read_sparse, write_sparse)
+from sparse_counters import SparseCounters
+from profiling import add_profile_args, profiler_from_args
+from derived_features import FEATURE_NAMES, parse_features, add_derived_features
+
+def log_normalize(df, exclude_cols=("test_id",)):
+    """Apply log10(x + 1) in place to every numeric column of df not in exclude_cols.
+
+    Returns the list of normalized columns.
+    """
+    # Identify numeric columns to normalize (e.g., nprocs, all counters, tag)
+    numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
+    cols_to_normalize = [col for col in numeric_cols if col not in exclude_cols]
+    # float64 first: compact inputs may hold narrow integers that would wrap on + 1
+    df[cols_to_normalize] = np.log10(df[cols_to_normalize].astype(np.float64) + 1)
+    return cols_to_normalize
+
 def main():
     parser = argparse.ArgumentParser(
         description="Apply log10(x + 1) normalization to all numeric columns in a CSV"
     )
     parser.add_argument(
         "input_csv",
-        help="Path to the raw counters CSV (nprocs + counters + tag)"
+        help="Path to the raw counters CSV/Parquet/Arrow file (nprocs + counters + tag)"
     )
     parser.add_argument(
         "output_csv",
-        help="Where to write the normalized output CSV"
+        help="Where to write the normalized output (.csv, .parquet or .feather)"
+    )
+    parser.add_argument(
+        "--chunksize", type=int, default=0,
+        help="Stream the input in chunks of this many rows instead of loading it whole "
+             "(ignored for sparse .npz input, which is normalized in place)"
+    )
+    parser.add_argument(
+        "--derived", default=None, metavar="FEATURES",
+        help="Add derived ratio columns from the raw counters before normalizing: 'all' or a "
+             f"comma-separated subset of {','.join(FEATURE_NAMES)}"
+    )
+    parser.add_argument(
+        "--compact", action="store_true",
+        help="Store each column in its narrowest dtype (float32 features, small ints, categoricals)"
     )
+    add_profile_args(parser)
     args = parser.parse_args()
+    profiler = profiler_from_args(args)
+    try:
+        derived = parse_features(args.derived)
+    except ValueError as e:
+        parser.error(str(e))
 
-    # Load the dataset
-    df = pd.read_csv(args.input_csv)
+    if is_sparse(args.input_csv):
+        # log10(0 + 1) = 0, so only the stored non-zero entries change
+        with profiler.stage("read") as st:
+            sp = read_sparse(args.input_csv)
+            st.update(rows=len(sp), bytes_read=os.path.getsize(args.input_csv))
+        with profiler.stage("transform") as st:
+            if derived:
+                # ratios are dense; add them as columns and rebuild the sparse matrix
+                sp = SparseCounters.from_frame(add_derived_features(sp.to_frame(), derived)[0])
+            cols_to_normalize = sp.log_normalize(exclude_cols=["test_id"])
+            st["rows"] = len(sp)
+        with profiler.stage("write") as st:
+            write_sparse(sp, args.output_csv, compact=args.compact)
+            st.update(rows=len(sp), bytes_written=os.path.getsize(args.output_csv))
+        profiler.write()
+        print(f"✅ Wrote {len(sp)} sparse rows ({sp.nnz} non-zeros, density {sp.density:.1%}) "
+              f"with {len(cols_to_normalize)} normalized columns to {args.output_csv}")
+        return
 
-    # Identify numeric columns to normalize (e.g., nprocs, all counters, tag)
-    numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
+    if args.chunksize > 0:
+        # log10 is element-wise, so chunks give the same result as the whole file
+        rows = 0
+        with TableWriter(args.output_csv, compact=args.compact) as writer:
+            for chunk in profiler.iter_stage("read", iter_table(args.input_csv, args.chunksize)):
+                with profiler.stage("transform") as st:
+                    if derived:
+                        chunk, _ = add_derived_features(chunk, derived)
+                    cols_to_normalize = log_normalize(chunk, exclude_cols=["test_id"])
+                    st["rows"] = len(chunk)
+                with profiler.stage("write") as st:
+                    writer.write(chunk)
+                    st["rows"] = len(chunk)
+                rows += len(chunk)
+        profiler.add("read", calls=0, bytes_read=os.path.getsize(args.input_csv))
+        profiler.add("write", calls=0, bytes_written=os.path.getsize(args.output_csv))
+        profiler.write()
+        print(f"✅ Wrote {rows} normalized rows in chunks of {args.chunksize} to {args.output_csv}")
+        return
 
-    # Explicitly exclude columns if needed (e.g., "test_id" if mistakenly included)
-    exclude_cols = ["test_id"]
-    cols_to_normalize = [col for col in numeric_cols if col not in exclude_cols]
+    # Load the dataset
+    with profiler.stage("read") as st:
+        df = read_table(args.input_csv)
+        st.update(rows=len(df), bytes_read=os.path.getsize(args.input_csv))
 
+    # Apply log10(x + 1) to each numeric column; exclude "test_id" if mistakenly numeric
+    with profiler.stage("transform") as st:
+        if derived:
+            df, added = add_derived_features(df, derived)
+            skipped = [n for n in derived if n not in added]
+            if skipped:
+                print(f"Skipping derived features whose counters are not in the input: {skipped}")
+        cols_to_normalize = log_normalize(df, exclude_cols=["test_id"])
+        st["rows"] = len(df)
     print(f"Normalizing columns: {cols_to_normalize}")
 
-    # Apply log10(x + 1) to each numeric column
-    df[cols_to_normalize] = np.log10(df[cols_to_normalize] + 1)
-
     # Save the result
-    df.to_csv(args.output_csv, index=False)
-    print(f"✅ Wrote normalized CSV with {len(cols_to_normalize)} columns to {args.output_csv}")
+    with profiler.stage("write") as st:
+        write_table(df, args.output_csv, compact=args.compact)
+        st.update(rows=len(df), bytes_written=os.path.getsize(args.output_csv))
+    profiler.write()
+    print(f"✅ Wrote normalized data with {len(cols_to_normalize)} columns to {args.output_csv}")
 
 if __name__ == "__main__":
     main()
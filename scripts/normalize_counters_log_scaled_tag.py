@@ -1,6 +1,9 @@
 #!/usr/bin/env python3
 """
 Same as normalize_counters.py, but rescales only the tag so it lands in your train range.
+Save the fitted scale with --save_transform when normalizing the training
+set and pass it back with --transform for new logs, so they get the
+training D instead of one derived from their own max.
 Usage:
   python normalize_counters_log_scaled_tag.py \
       --input_csv raw_parse.csv \
@@ -9,45 +12,63 @@ Usage:
 """
 import argparse
 import os
-import pandas as pd
-import numpy as np
+
+from dataset_io import read_table, write_table
+from profiling import add_profile_args, profiler_from_args
+from normalize_pipeline import FittedPipeline
 
 def main():
     p = argparse.ArgumentParser(
         description="Log10‐normalize counters and rescale tag to match train max"
     )
     p.add_argument("input_csv",
-                   help="raw parsed CSV (with raw tag = bytes/time)")
+                   help="raw parsed CSV/Parquet/Arrow file (with raw tag = bytes/time)")
     p.add_argument("output_csv",
-                   help="where to write log10‐normalized + scaled-tag CSV")
+                   help="where to write log10‐normalized + scaled-tag output (.csv, .parquet or .feather)")
     p.add_argument("--tag_target_max", type=float, default=4.0,
                    help="maximum tag (after log) seen in your training data")
+    p.add_argument("--save_transform", default=None,
+                   help="save the fitted D and column layout as JSON for later --transform runs")
+    p.add_argument("--transform", default=None,
+                   help="reuse a transform saved with --save_transform instead of fitting D here")
+    p.add_argument("--compact", action="store_true",
+                   help="store each column in its narrowest dtype (float32 features, categoricals)")
+    add_profile_args(p)
     args = p.parse_args()
+    profiler = profiler_from_args(args)
 
-    df = pd.read_csv(args.input_csv)
+    with profiler.stage("read") as st:
+        df = read_table(args.input_csv)
+        st.update(rows=len(df), bytes_read=os.path.getsize(args.input_csv))
     if "tag" not in df.columns:
         raise RuntimeError("input CSV must have a raw 'tag' column")
 
-    # 1) Compute D so that max_new_tag = tag_target_max
-    raw_tag = df["tag"].values
-    raw_max = raw_tag.max()
-    D = (raw_max + 1.0) / (10 ** args.tag_target_max)
-    print(f"🔹 Found raw_tag.max() = {raw_max:.3g}, so D = {D:.3g}")
-
-    # 2) Log‐normalize all other numeric columns (x → log10(x+1))
-    numeric = df.select_dtypes(include=[np.number]).columns.tolist()
-    numeric.remove("tag")
-    print(f"🔹 Log10‐normalizing counters: {numeric}")
-    df[numeric] = np.log10(df[numeric] + 1.0)
-
-    # 3) Scale & log‐normalize the tag:
-    #    new_tag = log10(raw_tag / D + 1)
-    df["tag"] = np.log10(raw_tag / D + 1.0)
-    print(f"🔹 tag now ranges {df['tag'].min():.3f} … {df['tag'].max():.3f}")
+    with profiler.stage("transform") as st:
+        if args.transform:
+            # 1) Reuse the training D so this file is scaled like the training data
+            pipeline = FittedPipeline.load(args.transform)
+            if pipeline.stages != ["log10", "scale_tag"]:
+                raise RuntimeError(f"{args.transform} is not a log10 + scaled-tag transform")
+            print(f"🔹 Using D = {pipeline.params[1]['D']:.3g} from {args.transform}")
+            df = pipeline.transform(df)
+        else:
+            # 1) Compute D so that max_new_tag = tag_target_max
+            # 2) Log‐normalize all other numeric columns (x → log10(x+1))
+            # 3) Scale & log‐normalize the tag: new_tag = log10(raw_tag / D + 1)
+            pipeline, df = FittedPipeline.fit_transform(df, ["log10", "scale_tag"],
+                                                        args.tag_target_max)
+        print(f"🔹 Log10‐normalizing counters: {pipeline.feature_cols}")
+        print(f"🔹 tag now ranges {df['tag'].min():.3f} … {df['tag'].max():.3f}")
+        st["rows"] = len(df)
+    if args.save_transform:
+        pipeline.save(args.save_transform)
+        print(f"🔹 Saved fitted transform to {args.save_transform}")
 
     # 4) Save
-    os.makedirs(os.path.dirname(args.output_csv) or ".", exist_ok=True)
-    df.to_csv(args.output_csv, index=False)
+    with profiler.stage("write") as st:
+        write_table(df, args.output_csv, compact=args.compact)
+        st.update(rows=len(df), bytes_written=os.path.getsize(args.output_csv))
+    profiler.write()
     print(f"✅ Wrote {len(df)} rows to {args.output_csv}")
 
 if __name__ == "__main__":
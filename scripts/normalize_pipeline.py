@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""
+Run a chain of normalization stages over a counters file in one pass.
+
+The input is read once into a float64 feature matrix plus the tag, every
+stage is applied in place with NumPy, and the result is written once.
+Stages run in the order given:
+  log10      x -> log10(x + 1) on every feature column
+  log10_tag  tag -> log10(tag + 1)
+  scale_tag  tag -> log10(tag / D + 1), D chosen so max tag = --tag_target_max
+  l2         scale each row's features to unit L2 norm
+  zscore     standardize each feature column to mean 0, std 1
+Features are the numeric columns other than tag and test_id. Parameters
+learned while fitting (D, z-score statistics) and the column layout can be
+saved with --save-transform and reused on new data with --transform, so a
+single fresh log is scaled exactly like the training set. With --chunksize
+the input is streamed; that needs stages that learn nothing from the data
+(or a saved --transform), since every stage is then row-local. --derived
+first adds derived_features ratio columns, which then count as features
+and are recomputed from the raw counters whenever the transform is applied.
+The separate
+scripts correspond to these chains:
+  normalize_counters_log.py              log10,log10_tag
+  normalize_counters_log.py + _l2.py     log10,log10_tag,l2
+  normalize_counters_log_scaled_tag.py   log10,scale_tag
+Usage:
+  python normalize_pipeline.py raw.csv train.csv --stages log10,scale_tag,l2 \
+      --save-transform train_transform.json
+  python normalize_pipeline.py new.csv new_norm.csv --transform train_transform.json
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from dataset_io import read_table, write_table, iter_table, TableWriter
+from profiling import NULL_PROFILER, add_profile_args, profiler_from_args
+from derived_features import FEATURE_NAMES, parse_features, add_derived_features, compute_features, inputs
+
+TAG_COL = "tag"
+EXCLUDE_COLS = [TAG_COL, "test_id"]
+DEFAULT_STAGES = ["log10", "log10_tag", "l2"]
+TRANSFORM_VERSION = 1
+
+
+# Each stage is an optional fit function, which learns parameters from the
+# data as it reaches that stage, and an apply function using them.
+
+def _log10(features, tag, params):
+    np.add(features, 1.0, out=features)
+    np.log10(features, out=features)
+    return features, tag
+
+
+def _log10_tag(features, tag, params):
+    return features, np.log10(tag + 1.0)
+
+
+def _fit_scale_tag(features, tag, opts):
+    D = (tag.max() + 1.0) / (10 ** opts["tag_target_max"])
+    print(f"🔹 Found raw_tag.max() = {tag.max():.3g}, so D = {D:.3g}")
+    return {"D": float(D)}
+
+
+def _scale_tag(features, tag, params):
+    return features, np.log10(tag / params["D"] + 1.0)
+
+
+def _l2(features, tag, params):
+    norms = np.linalg.norm(features, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0  # avoid divide by zero
+    np.divide(features, norms, out=features)
+    return features, tag
+
+
+def _fit_zscore(features, tag, opts):
+    std = features.std(axis=0)
+    std[std == 0] = 1.0  # constant columns become 0
+    return {"mean": features.mean(axis=0), "std": std}
+
+
+def _zscore(features, tag, params):
+    features -= params["mean"]
+    features /= params["std"]
+    return features, tag
+
+
+STAGES = {
+    "log10": (None, _log10),
+    "log10_tag": (None, _log10_tag),
+    "scale_tag": (_fit_scale_tag, _scale_tag),
+    "l2": (None, _l2),
+    "zscore": (_fit_zscore, _zscore),
+}
+TAG_STAGES = {"log10_tag", "scale_tag"}
+
+
+def parse_stages(spec):
+    """Split a comma-separated stage list and check every name is known."""
+    stages = [s.strip() for s in spec.split(",") if s.strip()]
+    unknown = [s for s in stages if s not in STAGES]
+    if unknown:
+        raise ValueError(f"unknown stage(s) {unknown}; expected some of {list(STAGES)}")
+    return stages
+
+
+class FittedPipeline:
+    """A stage chain with everything it learned at fit time.
+
+    Holds the stages, their fitted parameters (tag divisor D, z-score
+    statistics), the derived features, the feature column order and the excluded columns, so new
+    data -- a whole file or one row -- is transformed exactly as the
+    training set was. Save with save() and restore with FittedPipeline.load().
+    """
+
+    def __init__(self, stages, feature_cols, params, exclude_cols=EXCLUDE_COLS, derived=()):
+        self.stages = list(stages)
+        self.derived = list(derived)
+        self.feature_cols = list(feature_cols)
+        self.params = [dict(p) for p in params]
+        self.exclude_cols = list(exclude_cols)
+        self._funcs = [STAGES[name][1] for name in self.stages]
+
+    @classmethod
+    def fit_transform(cls, df, stages, tag_target_max=4.0, derived=()):
+        """Fit stages on df; return (pipeline, transformed DataFrame).
+
+        derived names derived_features columns to add first; those whose
+        inputs are not in df are skipped.
+        """
+        if derived:
+            df, derived = add_derived_features(df, derived)
+        numeric = df.select_dtypes(include=[np.number]).columns
+        feature_cols = [c for c in numeric if c not in EXCLUDE_COLS]
+        if TAG_COL not in df.columns:
+            missing = [name for name in stages if name in TAG_STAGES]
+            if missing:
+                raise RuntimeError(f"stage(s) {missing} need a '{TAG_COL}' column")
+        features, tag = cls._arrays(df, feature_cols)
+
+        opts = {"tag_target_max": tag_target_max}
+        params = []
+        for name in stages:
+            fit, apply = STAGES[name]
+            params.append(fit(features, tag, opts) if fit else {})
+            features, tag = apply(features, tag, params[-1])
+        pipeline = cls(stages, feature_cols, params, derived=derived)
+        return pipeline, pipeline._frame(df, features, tag)
+
+    @staticmethod
+    def _arrays(df, feature_cols):
+        # row-major, so each row's L2 norm is reduced along contiguous memory
+        # whether it arrives in a batch or alone through transform_row
+        features = np.ascontiguousarray(df[feature_cols].to_numpy(dtype=np.float64, copy=True))
+        tag = df[TAG_COL].to_numpy(dtype=np.float64) if TAG_COL in df.columns else None
+        return features, tag
+
+    def transform_arrays(self, features, tag=None):
+        """Apply the fitted stages to a (rows x features) matrix laid out as feature_cols.
+
+        features is modified in place; tag stages are skipped when tag is None,
+        e.g. when scoring logs whose throughput is not known yet.
+        """
+        for name, func, params in zip(self.stages, self._funcs, self.params):
+            if tag is None and name in TAG_STAGES:
+                continue
+            features, tag = func(features, tag, params)
+        return features, tag
+
+    def transform(self, df):
+        """Transform a DataFrame with the fitted parameters; returns a new DataFrame."""
+        if self.derived:
+            df, _ = add_derived_features(df, self.derived)
+        missing = [c for c in self.feature_cols if c not in df.columns]
+        if missing:
+            raise ValueError(f"input is missing feature columns {missing}")
+        features, tag = self.transform_arrays(*self._arrays(df, self.feature_cols))
+        return self._frame(df, features, tag)
+
+    def transform_row(self, row, tag=None):
+        """Transform one record (a mapping with every feature column); returns (features, tag).
+
+        Skips DataFrame construction entirely, for scoring logs one at a time.
+        NumPy may order the arithmetic differently for one row than for a
+        batch, so results agree with transform() within float rounding
+        (a few ulp), not necessarily bit for bit.
+        """
+        if self.derived:
+            values = compute_features({c: [row[c]] for c in inputs(self.derived)}, self.derived)
+            row = dict(row, **{name: v[0] for name, v in values.items()})
+        features = np.array([[row[c] for c in self.feature_cols]], dtype=np.float64)
+        if tag is None and TAG_COL in row:
+            tag = row[TAG_COL]
+        tag = None if tag is None else np.array([tag], dtype=np.float64)
+        features, tag = self.transform_arrays(features, tag)
+        return features[0], (None if tag is None else float(tag[0]))
+
+    def _frame(self, df, features, tag):
+        """Assemble the output DataFrame; an l2 stage moves excluded columns to the end."""
+        out = pd.DataFrame(features, columns=self.feature_cols, index=df.index)
+        if tag is not None:
+            out[TAG_COL] = tag
+        for col in df.columns:
+            if col not in out.columns:
+                out[col] = df[col]
+        if "l2" in self.stages:
+            order = self.feature_cols + [c for c in df.columns
+                                         if c not in self.feature_cols and c not in self.exclude_cols]
+            order += [c for c in self.exclude_cols if c in df.columns]
+        else:
+            order = [c for c in df.columns if c in out.columns]
+        return out[order].reset_index(drop=True)
+
+    def to_dict(self):
+        return {
+            "version": TRANSFORM_VERSION,
+            "stages": self.stages,
+            "params": [{k: (v.tolist() if isinstance(v, np.ndarray) else v) for k, v in p.items()}
+                       for p in self.params],
+            "feature_columns": self.feature_cols,
+            "exclude_columns": self.exclude_cols,
+            "derived": self.derived,
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        if d.get("version") != TRANSFORM_VERSION:
+            raise ValueError(f"unsupported transform version {d.get('version')!r}")
+        params = [{k: (np.asarray(v, dtype=np.float64) if isinstance(v, list) else v)
+                   for k, v in p.items()} for p in d["params"]]
+        return cls(d["stages"], d["feature_columns"], params, d["exclude_columns"],
+                   d.get("derived", []))
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+def run_pipeline(df, stages, tag_target_max=4.0, derived=()):
+    """Return a new DataFrame with stages fitted on and applied to df.
+
+    Column order is kept, except that an l2 stage moves tag and test_id to
+    the end, as normalize_counters_l2.py does.
+    """
+    return FittedPipeline.fit_transform(df, stages, tag_target_max, derived)[1]
+
+
+def run_chunked(input_path, output_path, chunksize, stages, pipeline=None, profiler=NULL_PROFILER,
+                compact=False, derived=()):
+    """Stream input_path through the stages chunk by chunk into output_path.
+
+    Without a loaded pipeline the stages must be fit-free; their column
+    layout is taken from the first chunk.
+    """
+    rows = 0
+    with TableWriter(output_path, compact=compact) as writer:
+        for chunk in profiler.iter_stage("read", iter_table(input_path, chunksize)):
+            with profiler.stage("transform") as st:
+                if pipeline is None:
+                    pipeline, out = FittedPipeline.fit_transform(chunk, stages, derived=derived)
+                else:
+                    out = pipeline.transform(chunk)
+                st["rows"] = len(out)
+            with profiler.stage("write") as st:
+                writer.write(out)
+                st["rows"] = len(out)
+            rows += len(out)
+    profiler.add("read", calls=0, bytes_read=os.path.getsize(input_path))
+    profiler.add("write", calls=0, bytes_written=os.path.getsize(output_path))
+    profiler.write()
+    print(f"✅ Wrote {rows} rows in chunks of {chunksize} to {output_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Apply log10 / tag scaling / L2 / ... normalization in a single pass"
+    )
+    parser.add_argument("input_csv", help="Raw counters CSV/Parquet/Arrow file (nprocs + counters + tag)")
+    parser.add_argument("output_csv", help="Where to write the result (.csv, .parquet or .feather)")
+    parser.add_argument("--stages", default=",".join(DEFAULT_STAGES),
+                        help=f"Comma-separated stages to run in order, from {list(STAGES)} "
+                             "(default: %(default)s)")
+    parser.add_argument("--tag_target_max", type=float, default=4.0,
+                        help="maximum tag (after log) for the scale_tag stage")
+    parser.add_argument("--save-transform", default=None,
+                        help="Save the fitted stages, parameters and column order as JSON")
+    parser.add_argument("--transform", default=None,
+                        help="Apply a transform saved with --save-transform instead of fitting "
+                             "(--stages and --tag_target_max are ignored)")
+    parser.add_argument("--chunksize", type=int, default=0,
+                        help="Stream the input in chunks of this many rows instead of loading it whole")
+    parser.add_argument("--derived", default=None, metavar="FEATURES",
+                        help="Add derived ratio features before the stages: 'all' or a "
+                             f"comma-separated subset of {','.join(FEATURE_NAMES)}")
+    parser.add_argument("--compact", action="store_true",
+                        help="Store each column in its narrowest dtype (float32 features, small ints, categoricals)")
+    add_profile_args(parser)
+    args = parser.parse_args()
+    profiler = profiler_from_args(args)
+
+    pipeline = FittedPipeline.load(args.transform) if args.transform else None
+    try:
+        stages = pipeline.stages if pipeline else parse_stages(args.stages)
+        derived = parse_features(args.derived)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.chunksize > 0:
+        if pipeline is None:
+            fitted = [name for name in stages if STAGES[name][0] is not None]
+            if fitted:
+                parser.error(f"stage(s) {fitted} are fitted on the whole input; fit once with "
+                             "--save-transform, then stream with --transform")
+        run_chunked(args.input_csv, args.output_csv, args.chunksize, stages, pipeline, profiler,
+                    args.compact, derived)
+        if args.save_transform and pipeline is None:
+            print("🔹 --save-transform ignored: nothing is fitted in a streaming run")
+        return
+
+    with profiler.stage("read") as st:
+        df = read_table(args.input_csv)
+        st.update(rows=len(df), bytes_read=os.path.getsize(args.input_csv))
+
+    print(f"🔹 Running stages: {' -> '.join(stages)}")
+    with profiler.stage("transform") as st:
+        if pipeline is None:
+            pipeline, out = FittedPipeline.fit_transform(df, stages, args.tag_target_max, derived)
+        else:
+            out = pipeline.transform(df)
+        st["rows"] = len(out)
+    if args.save_transform:
+        pipeline.save(args.save_transform)
+        print(f"🔹 Saved fitted transform to {args.save_transform}")
+
+    with profiler.stage("write") as st:
+        write_table(out, args.output_csv, compact=args.compact)
+        st.update(rows=len(out), bytes_written=os.path.getsize(args.output_csv))
+    profiler.write()
+    print(f"✅ Wrote {len(out)} rows to {args.output_csv}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,9 +3,20 @@ import os
 import sys
 import subprocess
 import argparse
+import hashlib
+import json
+import numpy as np
 import pandas as pd
-from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 import re
+import time
+
+from counter_engine import module_matrix, reduce_groups, reduce_records, reduction_for
+from darshan_reader import read_log, DarshanLogError
+from dataset_io import write_table
+from throughput import TAG_METRICS, DEFAULT_METRIC, TIME_COUNTERS, group_throughput
+from derived_features import FEATURE_NAMES, parse_features, compute_features
+from profiling import NULL_PROFILER, StageProfiler, add_profile_args, profiler_from_args, children_cpu
 
 # List of all counters to extract
 TARGET_COUNTERS = [
@@ -21,16 +32,173 @@ TARGET_COUNTERS = [
     "POSIX_STRIDE1_COUNT", "POSIX_STRIDE2_COUNT", "POSIX_STRIDE3_COUNT", "POSIX_STRIDE4_COUNT",
     "POSIX_ACCESS1_ACCESS", "POSIX_ACCESS2_ACCESS", "POSIX_ACCESS3_ACCESS", "POSIX_ACCESS4_ACCESS",
     "POSIX_ACCESS1_COUNT", "POSIX_ACCESS2_COUNT", "POSIX_ACCESS3_COUNT", "POSIX_ACCESS4_COUNT",
-    # helper counter for time
-    "POSIX_F_META_TIME"
+    # helper counters for time
+    "POSIX_F_META_TIME", "POSIX_F_READ_TIME", "POSIX_F_WRITE_TIME", "POSIX_F_SLOWEST_RANK_TIME",
 ]
 
+# only used to compute the tag; not written out
+HELPER_COUNTERS = TIME_COUNTERS
+OUTPUT_COUNTERS = [c for c in TARGET_COUNTERS if c not in HELPER_COUNTERS]
+
+# how records of a group combine, per counter (alignments, stripe settings and
+# stride/access sizes are not additive); -1 "not monitored" values never count
+TARGET_OPS = [reduction_for(c) for c in TARGET_COUNTERS]
+
+
+AGGREGATION_LEVELS = ["rank", "job", "file", "shared"]
+
+# key columns written ahead of the counters for each aggregation level;
+# nprocs is always the job's process count, rank the MPI rank (-1 = shared)
+LEVEL_KEYS = {
+    "rank": ["rank"],
+    "job": ["nprocs"],
+    "file": ["rank", "file_name"],
+    "shared": ["shared", "nfiles"],
+}
+
+
+def _records_parser(darshan_file: str, parser_cmd: str, profiler=NULL_PROFILER):
+    """Build the flat record table while streaming darshan-parser's text output.
+
+    Lines are consumed from the pipe as the parser writes them and folded
+    into one TARGET_COUNTERS vector per (rank, record id) immediately, so
+    memory is bounded by the number of records, not by the text size.
+    Because the two overlap, the "subprocess" stage (parser lifetime and
+    CPU) and the "text_parse" stage (our CPU) cover the same wall time.
+    """
+    col = {c: i for i, c in enumerate(TARGET_COUNTERS)}
+    vectors = {}
+    names = {}
+    nprocs = 0
+    nbytes = 0
+    if profiler.enabled:
+        w0, child0 = time.perf_counter(), children_cpu()
+    with profiler.stage("text_parse") as st, \
+            subprocess.Popen([parser_cmd, darshan_file], stdout=subprocess.PIPE,
+                             text=True, bufsize=1 << 16) as proc:
+        for line in proc.stdout:
+            nbytes += len(line)
+            if line.startswith("# nprocs:"):
+                nprocs = int(line.split(":", 1)[1])
+                continue
+            if not (line.startswith("POSIX") or line.startswith("LUSTRE")):
+                continue
+            parts = line.split("\t", 6)
+            if len(parts) < 5:
+                continue
+            _, rank_str, id_str, counter, value_str = parts[:5]
+            i = col.get(counter)
+            if i is None:
+                continue
+            try:
+                key = (int(rank_str), int(id_str))
+                value = float(value_str)
+            except ValueError:
+                continue
+            vec = vectors.get(key)
+            if vec is None:
+                vec = vectors[key] = np.zeros(len(TARGET_COUNTERS))
+                if len(parts) > 5:
+                    names[key[1]] = parts[5].rstrip("\n")
+            vec[i] += value
+        st["rows"] = len(vectors)
+    if profiler.enabled:
+        profiler.add("subprocess", time.perf_counter() - w0, children_cpu() - child0,
+                     bytes_read=nbytes)
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, proc.args)
+
+    keys = list(vectors)
+    return {
+        "rank": np.array([k[0] for k in keys], dtype=np.int64),
+        "id": np.array([k[1] for k in keys], dtype=np.uint64),
+        "values": np.array([vectors[k] for k in keys]).reshape(-1, len(TARGET_COUNTERS)),
+        "names": names,
+        "nprocs": nprocs,
+    }
+
 
-def parse_file(darshan_file: str, parser_cmd: str):
-    """Run darshan-parser on a file and extract TARGET_COUNTERS per rank."""
+def _records_native(darshan_file: str, profiler=NULL_PROFILER):
+    """Build the flat record table straight from the binary log's record arrays."""
+    with profiler.stage("read") as st:
+        log = read_log(darshan_file, modules=("POSIX", "LUSTRE"))
+        st["bytes_read"] = os.path.getsize(darshan_file)
+
+    ranks, ids, blocks = [], [], []
+    for mod in log["modules"].values():
+        names = mod["counter_names"] + mod["fcounter_names"]
+        src = [i for i, n in enumerate(names) if n in TARGET_COUNTERS]
+        if not src or len(mod["rank"]) == 0:
+            continue
+        dst = [TARGET_COUNTERS.index(names[i]) for i in src]
+        block = np.zeros((len(mod["rank"]), len(TARGET_COUNTERS)))
+        block[:, dst] = module_matrix(mod)[:, src]
+        ranks.append(mod["rank"])
+        ids.append(mod["id"])
+        blocks.append(block)
+    return {
+        "rank": np.concatenate(ranks) if ranks else np.zeros(0, dtype=np.int64),
+        "id": np.concatenate(ids) if ids else np.zeros(0, dtype=np.uint64),
+        "values": np.vstack(blocks) if blocks else np.zeros((0, len(TARGET_COUNTERS))),
+        "names": log["names"],
+        "nprocs": log["job"]["nprocs"],
+    }
+
+
+def aggregate_records(recs, level: str = "rank"):
+    """Collapse a flat record table to one row per group at the given level.
+
+    rank   one row per MPI rank (rank -1 holds shared-file records)
+    job    one row for the whole log, keyed by the job's real nprocs
+    file   one row per file (record id); rank is -1 if several ranks touched it
+    shared two rows: shared-file records (rank -1) and unique-file records
+    Counters are combined with counter_engine.reduce_records using TARGET_OPS.
+    Returns (key dicts, reduced TARGET_COUNTERS rows, group index of each record).
+    """
+    values, ranks, ids = recs["values"], recs["rank"], recs["id"]
+    if len(values) == 0:
+        return [], np.zeros((0, len(TARGET_COUNTERS))), np.zeros(0, dtype=np.intp)
+    if level == "rank":
+        uniq, sums, group = reduce_groups(values, TARGET_OPS, ranks)
+        return [{"rank": int(r)} for r in uniq], sums, group
+    if level == "job":
+        group = np.zeros(len(values), dtype=np.intp)
+        return [{"nprocs": recs["nprocs"]}], reduce_records(values, TARGET_OPS), group
+    if level == "file":
+        uniq, sums, group = reduce_groups(values, TARGET_OPS, ids)
+        lo = np.full(len(uniq), np.iinfo(np.int64).max)
+        hi = np.full(len(uniq), np.iinfo(np.int64).min)
+        np.minimum.at(lo, group, ranks)
+        np.maximum.at(hi, group, ranks)
+        owner = np.where(lo == hi, lo, -1)
+        keys = [{"rank": int(o), "file_name": recs["names"].get(int(i), "")}
+                for i, o in zip(uniq.tolist(), owner)]
+        return keys, sums, group
+    if level == "shared":
+        shared = (ranks == -1).astype(np.int64)
+        uniq, sums, group = reduce_groups(values, TARGET_OPS, shared)
+        keys = [{"shared": flag, "nfiles": len(np.unique(ids[shared == flag]))}
+                for flag in uniq.tolist()]
+        return keys, sums, group
+    raise ValueError(f"unknown aggregation level {level!r}; expected one of {AGGREGATION_LEVELS}")
+
+
+def parse_file(darshan_file: str, parser_cmd: str = None, level: str = "rank",
+               tag_metric: str = DEFAULT_METRIC, profiler=NULL_PROFILER, derived=()):
+    """Extract TARGET_COUNTERS from a .darshan file, aggregated at level.
+
+    The log is decoded in-process unless parser_cmd is given, in which case
+    darshan-parser is run and its text output is parsed instead. The tag of
+    each row is tag_metric (see throughput.py) over the row's records.
+    derived names derived_features columns to add, computed from the
+    aggregated counters (including the time helpers).
+    """
     try:
-        raw = subprocess.check_output([parser_cmd, darshan_file], text=True)
-    except subprocess.CalledProcessError as e:
+        if parser_cmd:
+            recs = _records_parser(darshan_file, parser_cmd, profiler)
+        else:
+            recs = _records_native(darshan_file, profiler)
+    except (subprocess.CalledProcessError, DarshanLogError) as e:
         print(f"[ERROR] parsing {darshan_file}: {e}", file=sys.stderr)
         return []
 
@@ -42,42 +210,181 @@ def parse_file(darshan_file: str, parser_cmd: str):
     else:
         test_id = "unknown"
 
-    rank_data = defaultdict(lambda: defaultdict(float))
-    for line in raw.splitlines():
-        if not (line.startswith("POSIX") or line.startswith("LUSTRE")):
-            continue
-        parts = line.split("\t")
-        if len(parts) < 5:
-            continue
-        _, rank_str, _, counter, value_str = parts[:5]
-        try:
-            rank = int(rank_str)
-            value = float(value_str)
-        except ValueError:
-            continue
-        if counter in TARGET_COUNTERS:
-            rank_data[rank][counter] += value
+    with profiler.stage("aggregate") as st:
+        keys, sums, group = aggregate_records(recs, level)
+        columns = {c: recs["values"][:, i] for i, c in enumerate(TARGET_COUNTERS)}
+        tags = group_throughput(recs["rank"], columns, group, len(keys), tag_metric)
+        features = compute_features({c: sums[:, i] for i, c in enumerate(TARGET_COUNTERS)}, derived)
+        feature_rows = np.column_stack([features[n] for n in derived]).tolist() \
+            if derived else [()] * len(keys)
 
-    records = []
-    for rank, counters in rank_data.items():
-        row = {"nprocs": rank}
-        for cnt in TARGET_COUNTERS:
-            row[cnt] = counters.get(cnt, 0.0)
+        out = [i for i, c in enumerate(TARGET_COUNTERS) if c not in HELPER_COUNTERS]
+        records = []
+        for key, vec, feats, tag in zip(keys, sums[:, out].tolist(), feature_rows, tags.tolist()):
+            row = dict(key)
+            # helper counters are left out
+            row.update(zip(OUTPUT_COUNTERS, vec))
+            row.update(zip(derived, feats))
+            row["tag"] = tag
 
-        total_bytes = row["POSIX_BYTES_READ"] + row["POSIX_BYTES_WRITTEN"]
-        t = row["POSIX_F_META_TIME"]
-        if t <= 0.0:
-            t = 1e-9
-        row["tag"] = total_bytes / t
+            # add test_id column
+            row["test_id"] = test_id
 
-        # drop helper counter
-        del row["POSIX_F_META_TIME"]
+            records.append(row)
+        st["rows"] = len(records)
+    return records
 
-        # add test_id column
-        row["test_id"] = test_id
+def find_darshan_files(input_dir: str):
+    """Return every .darshan file under input_dir in a stable, sorted order."""
+    paths = []
+    for root, _, files in os.walk(input_dir):
+        for fn in files:
+            if fn.endswith(".darshan"):
+                paths.append(os.path.join(root, fn))
+    return sorted(paths)
+
+
+CACHE_VERSION = 3  # 2: non-additive counters are no longer summed; 3: rank column
+
+
+def _content_hash(path: str):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _fingerprint(path: str):
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha1": _content_hash(path)}
+
+
+def load_cache(cache_path: str, parser_cmd: str = None, level: str = "rank",
+               tag_metric: str = DEFAULT_METRIC, derived=()):
+    """Load the parse manifest, starting fresh if it is missing or was built with other settings."""
+    settings = {"version": CACHE_VERSION, "reader": parser_cmd or "native",
+                "counters": TARGET_COUNTERS, "level": level, "tag": tag_metric}
+    if derived:
+        settings["derived"] = list(derived)
+    if os.path.exists(cache_path):
+        with open(cache_path) as f:
+            cache = json.load(f)
+        if cache.get("settings") == settings:
+            return cache
+        print(f"[INFO] parse settings changed since {cache_path} was written; rebuilding it")
+    return {"settings": settings, "entries": {}}
+
+
+def save_cache(cache, cache_path: str):
+    tmp = cache_path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(cache, f)
+    os.replace(tmp, cache_path)
+
+
+def _cached_records(cache, path: str):
+    """Return the cached rows for path if the log is unchanged, else None.
+
+    Size and mtime are checked first; the content hash is only computed when
+    the mtime moved, so a touched-but-identical log is still a cache hit.
+    Entries without rows (from before failed logs stopped being cached)
+    are misses.
+    """
+    entry = cache["entries"].get(os.path.abspath(path))
+    if entry is None or not entry["records"]:
+        return None
+    st = os.stat(path)
+    if entry["size"] != st.st_size:
+        return None
+    if entry["mtime_ns"] != st.st_mtime_ns:
+        if entry["sha1"] != _content_hash(path):
+            return None
+        entry["mtime_ns"] = st.st_mtime_ns
+    return entry["records"]
+
+
+def _parse_worker(task, profiler=None):
+    """Pool entry point: parse one file and never raise, so one bad log can't abort the batch.
+
+    Without a profiler, a worker that was asked to profile times the file
+    with its own and returns the stage totals for the parent to merge.
+    """
+    darshan_file, parser_cmd, level, tag_metric, derived, want_fingerprint, want_profile = task
+    local = profiler is None and want_profile
+    if profiler is None:
+        profiler = StageProfiler() if want_profile else NULL_PROFILER
+    stages = profiler.stages if local else None
+    try:
+        fingerprint = _fingerprint(darshan_file) if want_fingerprint else None
+        recs = parse_file(darshan_file, parser_cmd, level, tag_metric, profiler, derived)
+        return darshan_file, recs, None, fingerprint, stages
+    except Exception as e:
+        return darshan_file, [], f"{type(e).__name__}: {e}", None, stages
+
+
+def parse_files(paths, parser_cmd: str = None, jobs: int = 1, cache=None, level: str = "rank",
+                tag_metric: str = DEFAULT_METRIC, profiler=NULL_PROFILER, derived=()):
+    """Parse paths serially or across a process pool.
+
+    Results are merged in the order of paths regardless of which worker
+    finishes first. With a cache (see load_cache), unchanged logs reuse their
+    stored rows and only new, modified, failed or empty logs are parsed; the cache is updated
+    in place and pruned to paths. Returns (records, failures) where failures
+    is a list of (path, reason) for files that errored or produced no records.
+    Stage timings from every worker are merged into profiler.
+    """
+    records_by_path = {}
+    todo = []
+    for fp in paths:
+        recs = _cached_records(cache, fp) if cache is not None else None
+        if recs is None:
+            todo.append(fp)
+        else:
+            records_by_path[fp] = recs
+    if cache is not None:
+        print(f"[INFO] {len(records_by_path)} logs unchanged since last run; parsing {len(todo)}")
+
+    tasks = [(fp, parser_cmd, level, tag_metric, tuple(derived), cache is not None, profiler.enabled)
+             for fp in todo]
+    if jobs == 1:
+        results = (_parse_worker(task, profiler) for task in tasks)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(max_workers=jobs)
+        chunksize = max(1, len(tasks) // (jobs * 8))
+        results = executor.map(_parse_worker, tasks, chunksize=chunksize)
+
+    failures = []
+    try:
+        for fp, recs, err, fingerprint, stages in results:
+            profiler.merge(stages)
+            if err is not None:
+                print(f"[ERROR] parsing {fp}: {err}", file=sys.stderr)
+                failures.append((fp, err))
+            elif not recs:
+                failures.append((fp, "no records (parser error or no POSIX/LUSTRE data)"))
+            else:
+                print(f"[INFO] processed {fp}")
+            # failed or empty logs are not cached, so they are retried and reported every run
+            if fingerprint is not None and err is None and recs:
+                cache["entries"][os.path.abspath(fp)] = dict(fingerprint, records=recs)
+            records_by_path[fp] = recs
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    if cache is not None:
+        keep = {os.path.abspath(fp) for fp in paths}
+        cache["entries"] = {k: v for k, v in cache["entries"].items() if k in keep}
+
+    all_records = [rec for fp in paths for rec in records_by_path.get(fp, [])]
+    if cache is not None:
+        parsed = set(todo)
+        profiler.add("cache", calls=len(paths) - len(todo),
+                     rows=sum(len(records_by_path[fp]) for fp in paths if fp not in parsed))
+    return all_records, failures
 
-        records.append(row)
-    return records
 
 def main():
     parser = argparse.ArgumentParser(
@@ -85,35 +392,85 @@ def main():
     )
     parser.add_argument("input_dir", help="Directory containing .darshan files")
     parser.add_argument("output_csv", nargs="?", default="darshan_parsed_output.csv",
-                        help="Output CSV path")
-    parser.add_argument("--parser-cmd", default="darshan-parser",
-                        help="darshan-parser executable path")
+                        help="Output path; .parquet or .feather writes a typed columnar file, "
+                             ".npz a sparse matrix of the non-zero counters")
+    parser.add_argument("--parser-cmd", default=None,
+                        help="darshan-parser executable to use instead of the in-process reader")
+    parser.add_argument("--jobs", "-j", type=int, default=1,
+                        help="Number of parallel parser processes (0 = one per CPU)")
+    parser.add_argument("--cache", default=None,
+                        help="Parse manifest (JSON); unchanged logs listed in it are not re-parsed")
+    parser.add_argument("--aggregate", choices=AGGREGATION_LEVELS, default="rank",
+                        help="Row granularity: per rank (default), per job, per file, "
+                             "or shared vs unique files")
+    parser.add_argument("--legacy-nprocs", action="store_true",
+                        help="With --aggregate rank, name the rank column nprocs as datasets "
+                             "built before aggregation levels did")
+    parser.add_argument("--tag", choices=TAG_METRICS, default=DEFAULT_METRIC,
+                        help="Throughput definition used as the tag (default: %(default)s; "
+                             "meta_time is the old tag definition, though its values differ "
+                             "slightly from older datasets since fcounters are read at full precision)")
+    parser.add_argument("--derived", default=None, metavar="FEATURES",
+                        help="Add derived ratio columns (see derived_features.py): 'all' or a "
+                             f"comma-separated subset of {','.join(FEATURE_NAMES)}")
+    parser.add_argument("--compact", action="store_true",
+                        help="Store counters in the narrowest exact integer type, tag as float32 "
+                             "and test_id as categorical")
+    add_profile_args(parser)
     args = parser.parse_args()
+    profiler = profiler_from_args(args)
+    if args.legacy_nprocs and args.aggregate != "rank":
+        parser.error("--legacy-nprocs only applies to --aggregate rank")
+    try:
+        derived = parse_features(args.derived)
+    except ValueError as e:
+        parser.error(str(e))
 
-    all_records = []
-    for root, _, files in os.walk(args.input_dir):
-        for fn in files:
-            if not fn.endswith(".darshan"):
-                continue
-            fp = os.path.join(root, fn)
-            print(f"[INFO] processing {fp}")
-            recs = parse_file(fp, args.parser_cmd)
-            all_records.extend(recs)
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    paths = find_darshan_files(args.input_dir)
+    print(f"[INFO] found {len(paths)} .darshan files; parsing with {jobs} job(s)")
+
+    cache = load_cache(args.cache, args.parser_cmd, args.aggregate, args.tag, derived) \
+        if args.cache else None
+    all_records, failures = parse_files(paths, args.parser_cmd, jobs, cache, args.aggregate,
+                                        args.tag, profiler, derived)
+    if cache is not None:
+        save_cache(cache, args.cache)
+
+    if failures:
+        print(f"[WARN] {len(failures)} of {len(paths)} files failed or had no records:",
+              file=sys.stderr)
+        for fp, reason in failures:
+            print(f"  {fp}: {reason}", file=sys.stderr)
 
     if not all_records:
         print("[WARN] no records found; exiting.")
         sys.exit(1)
 
-    # build DataFrame with only nprocs, counters, and tag
-    df = pd.DataFrame(all_records)
-    # order columns: nprocs, all TARGET_COUNTERS (minus meta-time), then tag
-    cols = ["nprocs"] + [c for c in TARGET_COUNTERS if c != "POSIX_F_META_TIME"] + ["tag", "test_id"]
-    df = df[cols]
+    with profiler.stage("dataframe") as st:
+        # build DataFrame with only the level's key columns, counters, and tag
+        df = pd.DataFrame(all_records)
+        # order columns: keys, all TARGET_COUNTERS (minus helpers), then tag
+        keys = LEVEL_KEYS[args.aggregate]
+        counters = OUTPUT_COUNTERS
+        cols = keys + counters + derived + ["tag", "test_id"]
+        df = df[cols]
 
-    # sort by rank
-    df.sort_values("nprocs", inplace=True)
-    df.to_csv(args.output_csv, index=False)
+        if args.aggregate == "rank":
+            # sort by rank (stable, so file order is kept within a rank)
+            df.sort_values("rank", inplace=True, kind="stable")
+            if args.legacy_nprocs:
+                df.rename(columns={"rank": "nprocs"}, inplace=True)
+                keys = ["nprocs"]
+        st["rows"] = len(df)
+    with profiler.stage("write") as st:
+        # raw counters are whole numbers; only tag is a true float
+        write_table(df, args.output_csv,
+                    int_columns=[k for k in keys if k != "file_name"] + counters,
+                    compact=args.compact)
+        st.update(rows=len(df), bytes_written=os.path.getsize(args.output_csv))
     print(f"[OK] wrote {len(df)} rows to {args.output_csv}")
+    profiler.write()
 
 
 if __name__ == "__main__":
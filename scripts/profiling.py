@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Per-stage timing for the pipeline scripts.
+
+A StageProfiler accumulates wall time, CPU time, call count, bytes and rows
+for named stages (read, subprocess, text_parse, aggregate, dataframe,
+transform, write, ...) and writes them as one JSON trace. Optionally each
+stage also gets a cProfile dump. A disabled profiler costs one branch per
+stage, so scripts can thread it through unconditionally.
+Usage (as a library):
+  profiler = profiler_from_args(args)
+  with profiler.stage("read") as st:
+      df = read_table(path)
+      st["rows"] = len(df)
+  profiler.write()
+"""
+import cProfile
+import json
+import os
+import resource
+import sys
+import time
+from contextlib import contextmanager
+
+COUNT_FIELDS = ("bytes_read", "bytes_written", "rows")
+
+
+def add_profile_args(parser):
+    """Add the shared --profile / --cprofile options to an argparse parser."""
+    parser.add_argument("--profile", default=None, metavar="TRACE_JSON",
+                        help="Write per-stage wall/CPU time, bytes and rows to this JSON file")
+    parser.add_argument("--cprofile", default=None, metavar="DIR",
+                        help="With --profile, also dump a cProfile .prof file per stage into DIR "
+                             "(stages run in worker processes are timed but not profiled)")
+
+
+def profiler_from_args(args):
+    return StageProfiler(trace_path=args.profile, cprofile_dir=args.cprofile,
+                         enabled=args.profile is not None)
+
+
+def children_cpu():
+    """CPU seconds used so far by waited-for child processes."""
+    ru = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return ru.ru_utime + ru.ru_stime
+
+
+class StageProfiler:
+    def __init__(self, trace_path=None, cprofile_dir=None, enabled=True):
+        self.enabled = enabled
+        self.trace_path = trace_path
+        self.cprofile_dir = cprofile_dir if enabled else None
+        self.stages = {}
+        self._profiles = {}
+        self._profiling = False
+        self._wall0 = time.perf_counter()
+        self._cpu0 = time.process_time()
+
+    def add(self, name, wall=0.0, cpu=0.0, calls=1, **counts):
+        """Accumulate one measurement (or a merged batch of calls) into stage name."""
+        if not self.enabled:
+            return
+        st = self.stages.get(name)
+        if st is None:
+            st = self.stages[name] = dict(wall_s=0.0, cpu_s=0.0, calls=0,
+                                          **dict.fromkeys(COUNT_FIELDS, 0))
+        st["wall_s"] += wall
+        st["cpu_s"] += cpu
+        st["calls"] += calls
+        for key, value in counts.items():
+            st[key] = st.get(key, 0) + value
+
+    def merge(self, stages):
+        """Fold in the stages dict of another profiler, e.g. one run in a worker process."""
+        for name, st in (stages or {}).items():
+            st = dict(st)
+            self.add(name, st.pop("wall_s"), st.pop("cpu_s"), st.pop("calls"), **st)
+
+    @contextmanager
+    def stage(self, name):
+        """Time the enclosed block as stage name; yields a dict for bytes/rows counts."""
+        counts = {}
+        if not self.enabled:
+            yield counts
+            return
+        prof = None
+        if self.cprofile_dir and not self._profiling:
+            # only the outermost stage is profiled; cProfile does not nest
+            prof = self._profiles.setdefault(name, cProfile.Profile())
+            self._profiling = True
+            prof.enable()
+        w0, c0 = time.perf_counter(), time.process_time()
+        try:
+            yield counts
+        finally:
+            wall, cpu = time.perf_counter() - w0, time.process_time() - c0
+            if prof is not None:
+                prof.disable()
+                self._profiling = False
+            self.add(name, wall, cpu, **counts)
+
+    def iter_stage(self, name, iterable):
+        """Yield from iterable, timing each step as stage name (rows = len of each item)."""
+        it = iter(iterable)
+        while True:
+            with self.stage(name) as st:
+                try:
+                    item = next(it)
+                except StopIteration:
+                    return
+                st["rows"] = len(item)
+            yield item
+
+    def write(self, path=None):
+        """Write the JSON trace (and cProfile dumps); no-op when disabled."""
+        path = path or self.trace_path
+        if not self.enabled or not path:
+            return
+        trace = {
+            "script": os.path.basename(sys.argv[0]),
+            "argv": sys.argv[1:],
+            "total_wall_s": time.perf_counter() - self._wall0,
+            "total_cpu_s": time.process_time() - self._cpu0,
+            "stages": self.stages,
+        }
+        if self._profiles:
+            os.makedirs(self.cprofile_dir, exist_ok=True)
+            dumps = {}
+            for name, prof in self._profiles.items():
+                dumps[name] = os.path.join(self.cprofile_dir, f"{name}.prof")
+                prof.dump_stats(dumps[name])
+            trace["cprofile"] = dumps
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(trace, f, indent=2)
+        print(f"[INFO] wrote profile trace to {path}")
+
+
+NULL_PROFILER = StageProfiler(enabled=False)
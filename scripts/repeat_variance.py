@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Run-to-run variability of the tag across repeats of the same IOR configuration.
+
+Inputs must be job-level (parse_darshan_dir.py --aggregate job, one row
+per test id); rank-level rows are rejected rather than counted as repeats.
+Runs are grouped by identical IOR parameters (joined from the config CSVs
+with ior_dataset.IorDataset, or already present in a joined table), so a
+configuration repeated under different test ids or on different days forms
+one group. For every group the statistics are computed at once with NumPy
+segment reductions, with no per-group Python loop:
+  n, mean, median, std (sample), cv = std / mean,
+  ci_low / ci_high   Student-t confidence interval of the mean,
+  mad                median absolute deviation from the median.
+Each run gets a robust z-score, 0.6745 * (x - median) / MAD (Iglewicz and
+Hoaglin), and is flagged as an outlier when |z| exceeds --z-threshold.
+When MAD is 0 the mean absolute deviation (times 1.2533) stands in, and
+groups with fewer than three runs are never flagged.
+Usage:
+  python repeat_variance.py runs.csv --configs configs/ior_configurations.csv \\
+      --groups groups.csv --runs-out runs_flagged.csv
+  python repeat_variance.py joined_a.parquet joined_b.parquet --ignore LUSTRE_STRIPE_SIZE
+"""
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+from dataset_io import read_table, write_table
+from ior_dataset import IorDataset, PARAM_COLUMNS, RUN_KEY, find_param_columns, load_configs, normalize_column
+
+# two-sided Student-t critical values for df = 1..30
+T_TABLE = {
+    0.90: [6.314, 2.920, 2.353, 2.132, 2.015, 1.943, 1.895, 1.860, 1.833, 1.812,
+           1.796, 1.782, 1.771, 1.761, 1.753, 1.746, 1.740, 1.734, 1.729, 1.725,
+           1.721, 1.717, 1.714, 1.711, 1.708, 1.706, 1.703, 1.701, 1.699, 1.697],
+    0.95: [12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+           2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+           2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042],
+    0.99: [63.657, 9.925, 5.841, 4.604, 4.032, 3.707, 3.499, 3.355, 3.250, 3.169,
+           3.106, 3.055, 3.012, 2.977, 2.947, 2.921, 2.898, 2.878, 2.861, 2.845,
+           2.831, 2.819, 2.807, 2.797, 2.787, 2.779, 2.771, 2.763, 2.756, 2.750],
+}
+Z_TABLE = {0.90: 1.6449, 0.95: 1.9600, 0.99: 2.5758}
+
+# Iglewicz-Hoaglin constants: 0.6745 = Phi^-1(0.75); 1.2533 = sqrt(pi / 2)
+MAD_SCALE = 0.6745
+MEAN_AD_SCALE = 1.2533
+DEFAULT_Z = 3.5
+MIN_FLAG_RUNS = 3
+
+
+def t_critical(df, confidence=0.95):
+    """Two-sided t critical values for an array of degrees of freedom (NaN where df < 1).
+
+    Tabulated up to df = 30; beyond that the Cornish-Fisher expansion around
+    the normal quantile is accurate to better than 1e-3.
+    """
+    if confidence not in T_TABLE:
+        raise ValueError(f"confidence must be one of {sorted(T_TABLE)}")
+    df = np.asarray(df, dtype=np.float64)
+    z = Z_TABLE[confidence]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        approx = z + (z ** 3 + z) / (4 * df) + (5 * z ** 5 + 16 * z ** 3 + 3 * z) / (96 * df ** 2)
+    table = np.asarray(T_TABLE[confidence])
+    small = (df >= 1) & (df <= len(table))
+    out = np.where(small, table[np.clip(df.astype(np.int64), 1, len(table)) - 1], approx)
+    return np.where(df >= 1, out, np.nan)
+
+
+def _segment_median(values, group, ngroups):
+    """Median of values within each group (NaN for empty groups)."""
+    order = np.lexsort((values, group))
+    sorted_vals = values[order]
+    counts = np.bincount(group, minlength=ngroups)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    lo = starts + (counts - 1) // 2
+    hi = starts + counts // 2
+    valid = counts > 0
+    med = np.full(ngroups, np.nan)
+    med[valid] = (sorted_vals[lo[valid]] + sorted_vals[hi[valid]]) / 2.0
+    return med
+
+
+def group_statistics(values, group, ngroups, confidence=0.95, z_threshold=DEFAULT_Z):
+    """Per-group statistics and per-run robust z-scores.
+
+    values and group are equal-length arrays (group ids 0..ngroups-1; NaN
+    values must already be removed). Returns (stats dict of per-group
+    arrays, robust z per run, outlier flag per run).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    group = np.asarray(group, dtype=np.intp)
+    n = np.bincount(group, minlength=ngroups)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = np.bincount(group, weights=values, minlength=ngroups) / n
+        dev = values - mean[group]
+        var = np.bincount(group, weights=dev * dev, minlength=ngroups) / (n - 1)
+        std = np.where(n > 1, np.sqrt(var), np.nan)
+        cv = std / np.abs(mean)
+        half = t_critical(n - 1, confidence) * std / np.sqrt(n)
+    median = _segment_median(values, group, ngroups)
+    absdev = np.abs(values - median[group])
+    mad = _segment_median(absdev, group, ngroups)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean_ad = np.bincount(group, weights=absdev, minlength=ngroups) / n
+        # MAD of 0 (over half the runs identical) falls back to the mean absolute deviation
+        robust_z = np.where(mad[group] > 0, MAD_SCALE * (values - median[group]) / mad[group],
+                            (values - median[group]) / (MEAN_AD_SCALE * mean_ad[group]))
+    robust_z = np.where(np.isfinite(robust_z), robust_z, 0.0)
+    outlier = (np.abs(robust_z) > z_threshold) & (n[group] >= MIN_FLAG_RUNS)
+    stats = {
+        "n": n, "mean": mean, "median": median, "std": std, "cv": cv,
+        "ci_low": mean - half, "ci_high": mean + half, "mad": mad,
+        "outliers": np.bincount(group, weights=outlier, minlength=ngroups).astype(np.int64),
+    }
+    return stats, robust_z, outlier
+
+
+def check_job_level(runs, keys=(RUN_KEY,), name="runs"):
+    """Raise ValueError unless runs has one row per keys (one row per job).
+
+    Rank-, file- or shared-level tables have several rows per test_id;
+    counting those as repeats would shrink the intervals and skew the
+    robust z-scores.
+    """
+    # parse_darshan_dir labels logs without a test id "unknown"; those are distinct jobs
+    dup = runs.duplicated(list(keys), keep=False) & (runs[RUN_KEY].astype(str) != "unknown")
+    if dup.any():
+        ids = runs.loc[dup, RUN_KEY].astype(str).unique()
+        raise ValueError(f"{name}: {len(ids)} test ids have several rows (e.g. {list(ids[:3])}); "
+                         f"expected one row per job, parse with parse_darshan_dir.py --aggregate job")
+
+
+def load_runs(paths, config_paths=None):
+    """Concatenate job-level run tables; with config_paths each is joined to its parameters first."""
+    configs = load_configs(config_paths) if config_paths else None
+    frames = []
+    for path in paths:
+        df = read_table(path)
+        check_job_level(df, name=path)
+        if configs is not None:
+            ds = IorDataset(df, configs, how="inner")
+            if ds.unmatched:
+                print(f"[WARN] {path}: {len(ds.unmatched)} test ids have no configuration",
+                      file=sys.stderr)
+            df = ds.table
+        df["source"] = path
+        frames.append(df)
+    return pd.concat(frames, ignore_index=True)
+
+
+def repeat_variance(runs, value="tag", params=None, confidence=0.95, z_threshold=DEFAULT_Z):
+    """Group runs by identical canonical params; return (groups DataFrame, runs with z and flags)."""
+    check_job_level(runs, [k for k in ("source", RUN_KEY) if k in runs.columns])
+    columns = find_param_columns(runs.columns, params)
+    if not columns:
+        raise ValueError("no IOR parameter columns in the runs; pass --configs to join them")
+    runs = runs[runs[value].notna()].reset_index(drop=True)
+    # canonical values, so "4K" and "4096" group together
+    keys = pd.DataFrame({p: normalize_column(p, runs[c]) for p, c in columns.items()})
+    group, uniq = pd.MultiIndex.from_frame(keys).factorize()
+    stats, robust_z, outlier = group_statistics(runs[value].to_numpy(dtype=np.float64), group,
+                                                len(uniq), confidence, z_threshold)
+
+    groups = uniq.to_frame(index=False)
+    for name, arr in stats.items():
+        groups[name] = arr
+    groups.insert(0, "group_id", np.arange(len(groups)))
+    runs = runs.copy()
+    runs["group_id"] = group
+    runs["robust_z"] = robust_z
+    runs["outlier"] = outlier
+    return groups, runs
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Tag variability and outliers across repeats of identical IOR configurations"
+    )
+    parser.add_argument("inputs", nargs="+",
+                        help="Run tables: parsed counters (with --configs) or joined tables")
+    parser.add_argument("--configs", nargs="+", default=None,
+                        help="IOR configuration CSV(s) to join on test_id = testFile")
+    parser.add_argument("--value", default="tag", help="Column to analyze (default: tag)")
+    parser.add_argument("--ignore", nargs="+", default=[], metavar="PARAM",
+                        help="Parameters left out of the grouping key (e.g. ones IOR ignores)")
+    parser.add_argument("--confidence", type=float, default=0.95, choices=sorted(T_TABLE),
+                        help="Confidence level of the mean's interval (default: 0.95)")
+    parser.add_argument("--z-threshold", type=float, default=DEFAULT_Z,
+                        help="Flag runs whose |robust z| exceeds this (default: %(default)s)")
+    parser.add_argument("--min-runs", type=int, default=2,
+                        help="Only report groups with at least this many runs (default: 2)")
+    parser.add_argument("--groups", default=None, help="Write per-group statistics here")
+    parser.add_argument("--runs-out", default=None,
+                        help="Write every run with its group_id, robust_z and outlier flag here")
+    args = parser.parse_args()
+
+    try:
+        runs = load_runs(args.inputs, args.configs)
+        params = [c for c in PARAM_COLUMNS if c not in args.ignore]
+        groups, runs = repeat_variance(runs, args.value, params, args.confidence, args.z_threshold)
+    except (KeyError, ValueError) as e:
+        print(f"[ERROR] {e}", file=sys.stderr)
+        sys.exit(1)
+
+    repeated = groups[groups["n"] >= args.min_runs]
+    print(f"[INFO] {len(runs)} runs in {len(groups)} configurations; "
+          f"{len(repeated)} have at least {args.min_runs} runs")
+    if len(repeated):
+        print(f"[INFO] median CV {repeated['cv'].median():.3f}, "
+              f"{int(repeated['outliers'].sum())} outlier runs flagged")
+        cols = ["group_id", "n", "mean", "median", "cv", "ci_low", "ci_high", "outliers"]
+        print(repeated.sort_values("cv", ascending=False)[cols].head(10).to_string(index=False))
+
+    if args.groups:
+        write_table(repeated, args.groups)
+        print(f"[OK] wrote {len(repeated)} groups to {args.groups}")
+    if args.runs_out:
+        write_table(runs, args.runs_out)
+        print(f"[OK] wrote {len(runs)} runs to {args.runs_out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Sparse (CSR) storage for wide, zero-heavy counter datasets.
+
+Most counters are zero in most rows (a write-only run never touches the
+read size buckets), so a SparseCounters keeps only the non-zero entries of
+the numeric columns in compressed-sparse-row form, with a column-name
+index, and the label columns (test_id, file_name) as dense string arrays.
+It is stored as a .npz file and needs only NumPy; to_scipy() hands the
+matrix to scipy.sparse when that is installed.
+
+log10(x + 1) maps zero to zero, and L2 scaling multiplies every entry of a
+row by one factor, so both normalizations work on the stored entries alone
+and keep the matrix sparse. Columns that are zero are never touched.
+Usage (as a library):
+  sp = SparseCounters.from_frame(df)
+  sp.log_normalize(exclude_cols=["test_id"])
+  sp.save("counters.npz")
+  df = SparseCounters.load("counters.npz").to_frame()
+"""
+import numpy as np
+import pandas as pd
+
+SPARSE_EXTS = (".npz",)
+SPARSE_VERSION = 1
+
+
+class SparseCounters:
+    """CSR matrix of the numeric columns plus dense label columns.
+
+    data/indices/indptr follow the usual CSR layout: the entries of row i
+    are data[indptr[i]:indptr[i+1]] in the columns indices[...], sorted.
+    NaN is stored explicitly, like any other non-zero value.
+    """
+
+    def __init__(self, data, indices, indptr, columns, labels=None,
+                 column_order=None, int_columns=()):
+        self.data = np.asarray(data, dtype=np.float64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.columns = list(columns)
+        self.labels = dict(labels or {})
+        self.column_order = list(column_order) if column_order is not None \
+            else self.columns + list(self.labels)
+        self.int_columns = [c for c in int_columns if c in self.columns]
+        self._col = {c: i for i, c in enumerate(self.columns)}
+
+    # -- construction -----------------------------------------------------
+
+    @classmethod
+    def from_frame(cls, df):
+        """Build from a DataFrame; numeric columns go into the matrix, others become labels."""
+        numeric = [c for c in df.columns if pd.api.types.is_numeric_dtype(df[c])
+                   and not pd.api.types.is_bool_dtype(df[c])]
+        values = df[numeric].to_numpy(dtype=np.float64)
+        mask = values != 0
+        indptr = np.concatenate([[0], np.cumsum(mask.sum(axis=1))])
+        indices = np.nonzero(mask)[1]
+        labels = {c: df[c].astype(str).to_numpy() for c in df.columns if c not in numeric}
+        int_columns = [c for c in numeric if pd.api.types.is_integer_dtype(df[c])]
+        return cls(values[mask], indices, indptr, numeric, labels, list(df.columns), int_columns)
+
+    @classmethod
+    def vstack(cls, parts):
+        """Stack row blocks that share one column layout."""
+        parts = list(parts)
+        first = parts[0]
+        offsets = np.cumsum([0] + [p.nnz for p in parts[:-1]])
+        indptr = np.concatenate([[0]] + [p.indptr[1:] + off for p, off in zip(parts, offsets)])
+        labels = {name: np.concatenate([p.labels[name] for p in parts]) for name in first.labels}
+        int_columns = [c for c in first.int_columns if all(c in p.int_columns for p in parts)]
+        return cls(np.concatenate([p.data for p in parts]),
+                   np.concatenate([p.indices for p in parts]),
+                   indptr, first.columns, labels, first.column_order, int_columns)
+
+    # -- shape and access -------------------------------------------------
+
+    @property
+    def shape(self):
+        return (len(self.indptr) - 1, len(self.columns))
+
+    @property
+    def nnz(self):
+        return len(self.data)
+
+    @property
+    def density(self):
+        rows, cols = self.shape
+        return self.nnz / max(rows * cols, 1)
+
+    def memory_bytes(self):
+        """Bytes held by the matrix and the label arrays."""
+        return (self.data.nbytes + self.indices.nbytes + self.indptr.nbytes
+                + sum(v.nbytes for v in self.labels.values()))
+
+    def __len__(self):
+        return self.shape[0]
+
+    def row_ids(self):
+        """Row of every stored entry (the COO row array)."""
+        return np.repeat(np.arange(len(self), dtype=np.int64), np.diff(self.indptr))
+
+    def column_mask(self, names):
+        """Boolean mask over the stored entries that lie in the named columns."""
+        wanted = [self._col[c] for c in names if c in self._col]
+        return np.isin(self.indices, wanted)
+
+    def slice(self, start, stop):
+        """Rows start:stop as a new SparseCounters."""
+        stop = min(stop, len(self))
+        lo, hi = self.indptr[start], self.indptr[stop]
+        return SparseCounters(self.data[lo:hi], self.indices[lo:hi],
+                              self.indptr[start:stop + 1] - lo, self.columns,
+                              {k: v[start:stop] for k, v in self.labels.items()},
+                              self.column_order, self.int_columns)
+
+    # -- conversion -------------------------------------------------------
+
+    def to_dense(self):
+        out = np.zeros(self.shape)
+        out[self.row_ids(), self.indices] = self.data
+        return out
+
+    def to_frame(self):
+        """Dense DataFrame in the original column order; integer columns stay integers."""
+        df = pd.DataFrame(self.to_dense(), columns=self.columns)
+        for c in self.int_columns:
+            if not df[c].isnull().any():
+                df[c] = df[c].astype(np.int64)
+        for name, values in self.labels.items():
+            df[name] = values
+        return df[self.column_order]
+
+    def to_coo(self):
+        """(row, col, value) arrays of the stored entries."""
+        return self.row_ids(), self.indices.copy(), self.data.copy()
+
+    def to_scipy(self):
+        """The matrix as a scipy.sparse.csr_matrix (needs scipy)."""
+        try:
+            from scipy import sparse
+        except ImportError:
+            raise RuntimeError("to_scipy needs scipy (pip install scipy)")
+        return sparse.csr_matrix((self.data, self.indices, self.indptr), shape=self.shape)
+
+    # -- transforms (in place) --------------------------------------------
+
+    def log_normalize(self, exclude_cols=("test_id",)):
+        """Apply log10(x + 1) to the stored entries of every matrix column not excluded.
+
+        Returns the list of normalized columns, like normalize_counters_log.log_normalize.
+        """
+        cols = [c for c in self.columns if c not in exclude_cols]
+        mask = self.column_mask(cols)
+        self.data[mask] = np.log10(self.data[mask] + 1)
+        self.int_columns = [c for c in self.int_columns if c not in cols]
+        return cols
+
+    def l2_normalize(self, exclude_cols=("tag", "test_id")):
+        """Scale each row's features to unit L2 norm; excluded columns move to the end.
+
+        Rows whose features are all zero are left as they are.
+        """
+        features = [c for c in self.columns if c not in exclude_cols]
+        mask = self.column_mask(features)
+        rows = self.row_ids()
+        sq = np.where(mask, self.data, 0.0) ** 2
+        norms = np.sqrt(np.bincount(rows, weights=sq, minlength=len(self)))
+        norms[norms == 0] = 1.0
+        self.data[mask] = self.data[mask] / norms[rows[mask]]
+        self.int_columns = [c for c in self.int_columns if c not in features]
+        excluded = [c for c in self.column_order if c in exclude_cols]
+        self.reorder(features + [c for c in self.columns if c in exclude_cols])
+        self.column_order = [c for c in self.column_order if c not in excluded] + excluded
+        return self
+
+    def reorder(self, columns):
+        """Permute the matrix columns into the given order (same set of names)."""
+        position = np.array([columns.index(c) for c in self.columns], dtype=np.int32)
+        indices = position[self.indices]
+        # entries must stay sorted by column within each row
+        order = np.lexsort((indices, self.row_ids()))
+        self.data = self.data[order]
+        self.indices = indices[order]
+        self.columns = list(columns)
+        self._col = {c: i for i, c in enumerate(self.columns)}
+
+    # -- column statistics ------------------------------------------------
+
+    def nonzero_counts(self):
+        """Number of non-zero (or NaN) entries per column."""
+        return np.bincount(self.indices[self.data != 0], minlength=len(self.columns))
+
+    # -- storage ----------------------------------------------------------
+
+    def save(self, path):
+        label_names = list(self.labels)
+        np.savez(path, version=SPARSE_VERSION, data=self.data, indices=self.indices,
+                 indptr=self.indptr, columns=np.array(self.columns, dtype=str),
+                 column_order=np.array(self.column_order, dtype=str),
+                 int_columns=np.array(self.int_columns, dtype=str),
+                 label_names=np.array(label_names, dtype=str),
+                 **{f"label_{i}": self.labels[name].astype(str) for i, name in enumerate(label_names)})
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as z:
+            version = int(z["version"])
+            if version != SPARSE_VERSION:
+                raise ValueError(f"{path}: unsupported sparse format version {version}")
+            label_names = z["label_names"].tolist()
+            labels = {name: z[f"label_{i}"].astype(object) for i, name in enumerate(label_names)}
+            return cls(z["data"], z["indices"], z["indptr"], z["columns"].tolist(), labels,
+                       z["column_order"].tolist(), z["int_columns"].tolist())
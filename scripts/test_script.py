@@ -1,5 +1,6 @@
 import pandas as pd
-from collections import Counter
+
+from config_diversity import diversity_scores, encode_columns
 
 # === Load CSV ===
 df = pd.read_csv("ior_configurations_targeted.csv")
@@ -9,20 +10,10 @@ cols = ["api", "transferSize", "blockSize", "segmentCount", "numTasks",
         "filePerProc", "useStridedDatatype", "setAlignment", "useO_DIRECT", "fsync",
         "LUSTRE_STRIPE_SIZE", "LUSTRE_STRIPE_WIDTH"]
 
-# === Count frequency of each value for each column ===
-freqs = {col: Counter(df[col]) for col in cols}
-
-# === Function to compute diversity score ===
-def compute_diversity(row):
-    score = 0
-    for col in cols:
-        val = row[col]
-        # Lower frequency means higher diversity
-        score += 1 / freqs[col][val]
-    return score
-
-# === Apply function to each row ===
-df["diversity_score"] = df.apply(compute_diversity, axis=1)
+# === Score every row at once from per-column frequency tables ===
+# (sum over columns of 1 / frequency of the row's value; lower frequency means higher diversity)
+codes, sizes = encode_columns(df, cols)
+df["diversity_score"] = diversity_scores(codes, sizes)
 
 # === Sort configs by diversity score descending ===
 df_sorted = df.sort_values(by="diversity_score", ascending=False)
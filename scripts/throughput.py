@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Throughput metrics computed from Darshan POSIX fcounters.
+
+Each metric turns a group of records (a whole job, one rank, one file, ...)
+into a single bandwidth figure that can be used as the training tag:
+
+  slowest_rank         total bytes / I/O time of the slowest rank (bytes/s).
+                       A rank's time is its read+write+meta time on unique
+                       files; every shared-file record (rank -1) adds its
+                       POSIX_F_SLOWEST_RANK_TIME, since all ranks wait on it.
+  agg_perf_by_slowest  the same quantity in MiB/s, as darshan-job-summary
+                       reports it.
+  rank_bandwidth       mean over ranks of each rank's own bytes / own
+                       read+write+meta time (bytes/s); shared records count
+                       as one pseudo-rank timed by their slowest rank.
+  meta_time            total bytes / POSIX_F_META_TIME (bytes/s); the
+                       historical tag, kept only to reproduce old datasets.
+"""
+import numpy as np
+
+TAG_METRICS = ["slowest_rank", "agg_perf_by_slowest", "rank_bandwidth", "meta_time"]
+DEFAULT_METRIC = "slowest_rank"
+
+# counters every metric needs, besides the byte counts
+TIME_COUNTERS = [
+    "POSIX_F_READ_TIME", "POSIX_F_WRITE_TIME", "POSIX_F_META_TIME", "POSIX_F_SLOWEST_RANK_TIME",
+]
+BYTE_COUNTERS = ["POSIX_BYTES_READ", "POSIX_BYTES_WRITTEN"]
+
+# stand-in for zero elapsed time, matching the historical tag
+MIN_TIME = 1e-9
+
+
+def group_throughput(ranks, columns, group, ngroups, metric=DEFAULT_METRIC):
+    """Compute metric for ngroups groups of records at once.
+
+    ranks is the record rank array (-1 for shared files), columns maps each
+    name in BYTE_COUNTERS + TIME_COUNTERS to a per-record value array, and
+    group maps each record to its group. Returns one value per group.
+    """
+    if metric not in TAG_METRICS:
+        raise ValueError(f"unknown tag metric {metric!r}; expected one of {TAG_METRICS}")
+    ranks = np.asarray(ranks)
+    group = np.asarray(group, dtype=np.intp)
+    nbytes = np.asarray(columns["POSIX_BYTES_READ"], dtype=float) \
+        + np.asarray(columns["POSIX_BYTES_WRITTEN"], dtype=float)
+    total_bytes = np.bincount(group, weights=nbytes, minlength=ngroups)
+
+    if metric == "meta_time":
+        meta = np.bincount(group, weights=columns["POSIX_F_META_TIME"], minlength=ngroups)
+        return total_bytes / np.where(meta > 0, meta, MIN_TIME)
+
+    shared = ranks == -1
+    # per-record time: own read+write+meta for unique files, slowest rank for shared ones
+    io_time = np.where(
+        shared,
+        np.asarray(columns["POSIX_F_SLOWEST_RANK_TIME"], dtype=float),
+        np.asarray(columns["POSIX_F_READ_TIME"], dtype=float)
+        + np.asarray(columns["POSIX_F_WRITE_TIME"], dtype=float)
+        + np.asarray(columns["POSIX_F_META_TIME"], dtype=float),
+    )
+
+    # cumulative time and bytes per (group, rank); shared records share rank -1
+    pairs, inverse = np.unique(np.stack([group, ranks]), axis=1, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    pair_time = np.bincount(inverse, weights=io_time, minlength=pairs.shape[1])
+    pair_group = pairs[0]
+    pair_shared = pairs[1] == -1
+
+    if metric == "rank_bandwidth":
+        pair_bytes = np.bincount(inverse, weights=nbytes, minlength=pairs.shape[1])
+        bw = pair_bytes / np.where(pair_time > 0, pair_time, MIN_TIME)
+        count = np.bincount(pair_group, minlength=ngroups)
+        return np.bincount(pair_group, weights=bw, minlength=ngroups) / np.maximum(count, 1)
+
+    slowest_unique = np.zeros(ngroups)
+    np.maximum.at(slowest_unique, pair_group[~pair_shared], pair_time[~pair_shared])
+    shared_time = np.bincount(pair_group[pair_shared], weights=pair_time[pair_shared],
+                              minlength=ngroups)
+    agg_time = slowest_unique + shared_time
+    perf = total_bytes / np.where(agg_time > 0, agg_time, MIN_TIME)
+    if metric == "agg_perf_by_slowest":
+        return perf / (1024.0 * 1024.0)
+    return perf
@@ -0,0 +1,67 @@
+"""next_batch must only propose configurations that have not run and are not pending."""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "scripts"))
+
+from active_sweep import MIN_TRAIN, next_batch, space_indices  # noqa: E402
+from config_space import ConfigSpace  # noqa: E402
+from ior_dataset import find_param_columns  # noqa: E402
+
+SPACE = ConfigSpace({
+    "api": ["POSIX", "HDF5"],
+    "transferSize": ["4K", "64K", "1M"],
+    "blockSize": ["1M", "4M", "16M"],
+    "numTasks": [4, 16, 64],
+})
+
+
+def _runs(indices, seed=0):
+    runs = SPACE.frame(indices).rename(columns={"testFile": "test_id"})
+    rng = np.random.default_rng(seed)
+    runs["tag"] = 10.0 ** (6 + np.arange(len(runs)) % 5 + rng.random(len(runs)))
+    return runs
+
+
+def _batch_indices(batch):
+    return space_indices(SPACE, batch, find_param_columns(batch.columns, SPACE.names))
+
+
+@pytest.mark.parametrize("ndone", [3, 20], ids=["cold_start", "model"])
+@pytest.mark.parametrize("kind", ["ei", "ucb", "std"])
+def test_next_batch_skips_run_and_excluded_configs(ndone, kind):
+    rng = np.random.default_rng(1)
+    order = rng.permutation(len(SPACE))
+    done, exclude = order[:ndone], order[ndone:ndone + 10]
+    # a repeated configuration is one training point, not two
+    runs = _runs(np.concatenate([done, done[:2]]))
+    runs["test_id"] = [f"test{i:05d}" for i in range(len(runs))]
+
+    batch, report = next_batch(runs, SPACE, 8, kind, exclude=exclude)
+    picked = _batch_indices(batch)
+    assert (report["model"] is None) == (ndone < MIN_TRAIN)
+    assert len(picked) == 8
+    assert len(np.unique(picked)) == len(picked)
+    assert (picked >= 0).all()
+    assert not np.isin(picked, done).any()
+    assert not np.isin(picked, exclude).any()
+
+
+def test_next_batch_stops_when_the_space_is_exhausted():
+    order = np.random.default_rng(2).permutation(len(SPACE))
+    runs = _runs(order[:-6])
+    runs["test_id"] = [f"test{i:05d}" for i in range(len(runs))]
+    batch, _ = next_batch(runs, SPACE, 8, exclude=order[-6:-3])
+    np.testing.assert_array_equal(np.sort(_batch_indices(batch)), np.sort(order[-3:]))
+
+
+def test_next_batch_rejects_rank_level_runs():
+    runs = _runs(np.arange(10))
+    runs["test_id"] = "test00001"
+    with pytest.raises(ValueError, match="--aggregate job"):
+        next_batch(runs, SPACE, 4)
@@ -0,0 +1,52 @@
+"""counter_engine reduction rules, and parse_darshan_dir job-level rows built from them."""
+import glob
+import os
+import sys
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "scripts"))
+
+from counter_engine import (  # noqa: E402
+    counter_schema, extract_counters, module_matrix, reduce_records, reduction_for,
+)
+from darshan_reader import MODULES, read_log  # noqa: E402
+from parse_darshan_dir import OUTPUT_COUNTERS, parse_file  # noqa: E402
+
+LOGS = sorted(glob.glob(os.path.join(ROOT, "logs", "tests", "2025", "6", "30.1", "*.darshan")))
+
+
+@pytest.mark.skipif(not LOGS, reason="no test logs under logs/tests")
+@pytest.mark.parametrize("path", LOGS, ids=os.path.basename)
+def test_job_level_matches_reduce_records(path):
+    log = read_log(path, modules=("POSIX", "LUSTRE"))
+    expected = {}
+    for mod in log["modules"].values():
+        names = mod["counter_names"] + mod["fcounter_names"]
+        if len(mod["rank"]):
+            totals = reduce_records(module_matrix(mod), [reduction_for(n) for n in names])[0]
+            expected.update(zip(names, totals))
+    (row,) = parse_file(path, level="job")
+    for name in OUTPUT_COUNTERS:
+        assert row[name] == pytest.approx(expected.get(name, 0.0)), name
+
+
+@pytest.mark.skipif(not LOGS, reason="no test logs under logs/tests")
+def test_job_level_matches_extract_counters():
+    for path in LOGS:
+        engine = extract_counters(read_log(path, modules=("POSIX", "LUSTRE")))
+        (row,) = parse_file(path, level="job")
+        got = np.array([row[c] for c in OUTPUT_COUNTERS])
+        np.testing.assert_allclose(got, [engine[c] for c in OUTPUT_COUNTERS])
+
+
+def test_rank_extremes_and_variances_are_not_summed():
+    schema = counter_schema(list(MODULES))
+    for module, name, op in schema:
+        if "_RANK" in name or "_VARIANCE_" in name:
+            assert op == "max", (module, name)
+    values = np.array([[10.0, 0.5], [30.0, -1.0], [20.0, 0.25]])
+    ops = [reduction_for("POSIX_SLOWEST_RANK_BYTES"), reduction_for("POSIX_F_VARIANCE_RANK_TIME")]
+    np.testing.assert_array_equal(reduce_records(values, ops)[0], [30.0, 0.5])
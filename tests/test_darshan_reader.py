@@ -0,0 +1,72 @@
+"""darshan_reader must decode committed logs exactly as darshan-parser / pydarshan do."""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "scripts"))
+
+from darshan_reader import iter_counters, read_log  # noqa: E402
+
+# darshan_output.txt is darshan-parser's output for this log
+REFERENCE_TEXT = os.path.join(ROOT, "darshan_output.txt")
+REFERENCE_LOG = os.path.join(
+    ROOT, "logs", "tests", "2025", "6", "20",
+    "mbanisha_ior_id1207928-1207928_6-20-70782-2734026435876817806_1.darshan")
+# MPIIO-api runs; the committed logs hold no LUSTRE or H5F/H5D records
+MPIIO_LOGS = [p for p in (os.path.join(ROOT, "logs", "tests", "2025", "6", "29.3", name) for name in (
+    "mbanisha_ior_id1267156-1267156_6-29-71167-8721427151262446187_1.darshan",
+    "mbanisha_ior_id1267158-1267158_6-29-71167-12037464317649592882_1.darshan",
+    "mbanisha_ior_id1267160-1267160_6-29-71167-16305451094807043815_1.darshan",
+)) if os.path.exists(p)]
+
+# darshan-parser prints fcounters with %f (six decimals)
+TEXT_FLOAT_TOL = 5e-7 + 1e-12
+
+
+def _reference_counters(module):
+    """{(rank, record id, counter): (value text, path)} for module from the parser text."""
+    out = {}
+    with open(REFERENCE_TEXT) as f:
+        for line in f:
+            if not line.startswith(module + "\t"):
+                continue
+            _, rank, rec_id, name, value, path = line.rstrip("\n").split("\t")[:6]
+            out[(int(rank), int(rec_id), name)] = (value, path)
+    return out
+
+
+@pytest.mark.skipif(not (os.path.exists(REFERENCE_TEXT) and os.path.exists(REFERENCE_LOG)),
+                    reason="reference log or darshan-parser output missing")
+@pytest.mark.parametrize("module", ["POSIX", "STDIO"])
+def test_matches_darshan_parser_text(module):
+    expected = _reference_counters(module)
+    assert expected
+    log = read_log(REFERENCE_LOG, modules=(module,))
+    got = {(rank, rec_id, name): value for rank, rec_id, name, value in iter_counters(log, module)}
+    assert got.keys() == expected.keys()
+    fnames = set(log["modules"][module]["fcounter_names"])
+    for key, (text, path) in expected.items():
+        if key[2] in fnames:
+            assert abs(got[key] - float(text)) <= TEXT_FLOAT_TOL, key
+        else:
+            assert got[key] == int(text), key
+        assert log["names"][key[1]] == path
+
+
+@pytest.mark.skipif(not MPIIO_LOGS, reason="no MPI-IO test logs under logs/tests")
+@pytest.mark.parametrize("path", MPIIO_LOGS, ids=os.path.basename)
+def test_mpiio_matches_pydarshan(path):
+    darshan = pytest.importorskip("darshan")
+    report = darshan.DarshanReport(path, read_all=False)
+    report.mod_read_all_records("MPI-IO")
+    expected = report.records["MPI-IO"].to_numpy()
+    mod = read_log(path, modules=("MPI-IO",))["modules"]["MPI-IO"]
+    assert mod["counter_names"] == report.counters["MPI-IO"]["counters"]
+    assert mod["fcounter_names"] == report.counters["MPI-IO"]["fcounters"]
+    assert mod["id"].tolist() == [rec["id"] for rec in expected]
+    assert mod["rank"].tolist() == [rec["rank"] for rec in expected]
+    np.testing.assert_array_equal(mod["counters"], np.array([rec["counters"] for rec in expected]))
+    np.testing.assert_array_equal(mod["fcounters"], np.array([rec["fcounters"] for rec in expected]))
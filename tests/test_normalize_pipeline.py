@@ -0,0 +1,26 @@
+"""transform_row must agree with the batch transform within float rounding."""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "scripts"))
+
+from normalize_pipeline import DEFAULT_STAGES, FittedPipeline  # noqa: E402
+
+DATA = os.path.join(ROOT, "data", "darshan_csv", "darshan_parsed_output_6-29-V5.csv")
+
+
+@pytest.mark.skipif(not os.path.exists(DATA), reason="dataset not present")
+@pytest.mark.parametrize("stages", [DEFAULT_STAGES, ["log10", "scale_tag", "zscore"]])
+def test_transform_row_matches_batch(stages):
+    df = pd.read_csv(DATA).head(200)
+    pipeline, batch = FittedPipeline.fit_transform(df, stages)
+    expected = batch[pipeline.feature_cols].to_numpy()
+    for i, row in enumerate(df.to_dict("records")):
+        features, tag = pipeline.transform_row(row)
+        np.testing.assert_allclose(features, expected[i], rtol=1e-12, atol=1e-15)
+        assert tag == pytest.approx(batch["tag"].iloc[i], rel=1e-12)
@@ -0,0 +1,79 @@
+"""Segment statistics, robust z-scores and input checks of repeat_variance."""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "scripts"))
+
+from repeat_variance import (  # noqa: E402
+    MAD_SCALE, MEAN_AD_SCALE, MIN_FLAG_RUNS, check_job_level, group_statistics, load_runs,
+    repeat_variance, t_critical,
+)
+
+
+def test_segment_median_and_mad_odd_and_even_groups():
+    # group 0 has three runs, group 1 four, interleaved and unsorted
+    values = np.array([3.0, 4.0, 1.0, 1.0, 2.0, 3.0, 2.0])
+    group = np.array([0, 1, 0, 1, 0, 1, 1])
+    stats, robust_z, _ = group_statistics(values, group, 2)
+    for g in range(2):
+        x = values[group == g]
+        assert stats["median"][g] == np.median(x)
+        assert stats["mad"][g] == np.median(np.abs(x - np.median(x)))
+    np.testing.assert_array_equal(stats["n"], [3, 4])
+    np.testing.assert_allclose(stats["median"], [2.0, 2.5])
+    np.testing.assert_allclose(stats["mad"], [1.0, 1.0])
+    expected = MAD_SCALE * (values - stats["median"][group]) / stats["mad"][group]
+    np.testing.assert_allclose(robust_z, expected)
+
+
+def test_mad_zero_falls_back_to_mean_absolute_deviation():
+    values = np.array([5.0, 5.0, 5.0, 5.0, 9.0])
+    stats, robust_z, outlier = group_statistics(values, np.zeros(5, dtype=np.intp), 1)
+    assert stats["mad"][0] == 0.0
+    mean_ad = 4.0 / 5
+    np.testing.assert_allclose(robust_z, [0, 0, 0, 0, 4.0 / (MEAN_AD_SCALE * mean_ad)])
+    np.testing.assert_array_equal(outlier, [False, False, False, False, True])
+    assert stats["outliers"][0] == 1
+
+
+def test_small_groups_are_never_flagged():
+    # with a low threshold every run deviates enough; only the group of MIN_FLAG_RUNS is flagged
+    values = np.array([1.0, 1000.0, 1.0, 2.0, 10.0])
+    group = np.array([0, 0, 1, 1, 1])
+    stats, robust_z, outlier = group_statistics(values, group, 2, z_threshold=0.5)
+    assert stats["n"][0] < MIN_FLAG_RUNS <= stats["n"][1]
+    assert (np.abs(robust_z[:2]) > 0.5).all()
+    assert not outlier[:2].any()
+    np.testing.assert_array_equal(outlier[2:], [True, False, True])
+
+
+def test_t_critical_table_and_expansion():
+    t = t_critical([0, 1, 30, 31, 1000])
+    assert np.isnan(t[0])
+    np.testing.assert_allclose(t[1:3], [12.706, 2.042])
+    assert t[3] == pytest.approx(2.0395, abs=1e-3)
+    assert t[4] == pytest.approx(1.9623, abs=1e-3)
+
+
+def _runs(test_ids):
+    n = len(test_ids)
+    return pd.DataFrame({"test_id": test_ids, "api": ["POSIX"] * n,
+                         "transferSize": ["4K"] * n, "tag": np.arange(1.0, n + 1)})
+
+
+def test_check_job_level_rejects_rank_level_rows(tmp_path):
+    check_job_level(_runs(["test1", "test2", "unknown", "unknown"]))
+    ranks = _runs(["test1", "test1", "test2"])
+    with pytest.raises(ValueError, match="--aggregate job"):
+        check_job_level(ranks)
+    with pytest.raises(ValueError):
+        repeat_variance(ranks)
+    path = tmp_path / "rank_level.csv"
+    ranks.to_csv(path, index=False)
+    with pytest.raises(ValueError, match="rank_level.csv"):
+        load_runs([str(path)])